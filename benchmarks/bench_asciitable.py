@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the throughput of asciitable.draw with the renderer it replaced,
+which formatted, encoded and wrote one cell at a time.
+
+Usage:
+    python benchmarks/bench_asciitable.py [rows]
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+import datetime as dt
+import decimal
+from io import BytesIO
+import sys
+import time
+
+import mock
+from future.utils import string_types
+
+from ipydb import asciitable
+from ipydb.asciitable import FakedResult, isublists
+
+HEADINGS = ['id', 'name', 'price', 'created', 'notes', 'flag']
+TERMSIZE = (200, 50)
+
+
+def legacy_draw(cursor, out=sys.stdout, paginate=True, max_fieldsize=100):
+    """asciitable.draw as it was before it rendered a page at a time."""
+
+    def heading_line(sizes):
+        for size in sizes:
+            out.write(b'+' + b'-' * (size + 2))
+        out.write(b'+\n')
+
+    def draw_headings(headings, sizes):
+        heading_line(sizes)
+        for idx, size in enumerate(sizes):
+            fmt = '| %%-%is ' % size
+            out.write((fmt % headings[idx]).encode('utf8'))
+        out.write(b'|\n')
+        heading_line(sizes)
+
+    cols, lines = asciitable.termsize()
+    headings = cursor.keys()
+    sizes = list(map(lambda x: len(x), headings))
+    if paginate:
+        cursor = isublists(cursor, lines - 4)
+    for screenrows in cursor:
+        for row in screenrows:
+            if row is None:
+                break
+            for idx, value in enumerate(row):
+                if not isinstance(value, string_types):
+                    value = str(value)
+                size = max(sizes[idx], len(value))
+                sizes[idx] = min(size, max_fieldsize)
+        draw_headings(headings, sizes)
+        for rw in screenrows:
+            if rw is None:
+                break
+            for idx, size in enumerate(sizes):
+                fmt = '| %%-%is ' % size
+                value = rw[idx]
+                if not isinstance(value, string_types):
+                    value = str(value)
+                if len(value) > max_fieldsize:
+                    value = value[:max_fieldsize - 5] + '[...]'
+                value = value.replace('\n', '^')
+                value = value.replace('\r', '^').replace('\t', ' ')
+                value = fmt % value
+                out.write(value.encode('utf8'))
+            out.write(b'|\n')
+        if not paginate:
+            heading_line(sizes)
+            out.write(b'\n')
+
+
+def make_rows(n):
+    start = dt.datetime(2015, 1, 1)
+    return [(i, u'name %i' % i, decimal.Decimal(i) / 7,
+             start + dt.timedelta(minutes=i),
+             u'line one\nline two' if i % 10 == 0 else u'n' * (i % 150),
+             i % 3 == 0 or None)
+            for i in range(n)]
+
+
+def run(draw, rows):
+    out = BytesIO()
+    start = time.time()
+    draw(FakedResult(rows, HEADINGS), out=out)
+    return time.time() - start, out.getvalue()
+
+
+def main(nrows=200000):
+    rows = make_rows(nrows)
+    results = {}
+    with mock.patch('ipydb.asciitable.termsize', return_value=TERMSIZE):
+        for name, draw in (('legacy', legacy_draw),
+                           ('draw', asciitable.draw)):
+            seconds, output = run(draw, rows)
+            results[name] = (seconds, output)
+            print('%-8s %8.2fs %12.0f rows/s %8.1f MB/s' % (
+                name, seconds, nrows / seconds,
+                len(output) / seconds / 1024 / 1024))
+    if results['legacy'][1] != results['draw'][1]:
+        print('output differs!')
+        return 1
+    print('speedup  %.1fx' % (results['legacy'][0] / results['draw'][0]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the throughput of SqlPlugin.format_result_csv writing to a file
+(as %sql -o does) with the UnicodeWriter it used before, which wrote
+each row to a buffer, read it back, re-encoded it and wrote it out.
+
+Usage:
+    python benchmarks/bench_csv.py [rows]
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+import codecs
+import csv
+import datetime as dt
+import decimal
+import io
+import os
+import sys
+import tempfile
+import time
+
+from ipydb import export, plugin
+from ipydb.asciitable import FakedResult
+
+HEADINGS = ['id', 'name', 'price', 'created', 'notes', 'flag']
+REPEAT = 3  # the best time is reported
+
+
+class LegacyUnicodeWriter(object):
+    """utils.UnicodeWriter, as it ran on python 3: a round trip through
+    a buffer and an incremental encoder for every row."""
+
+    def __init__(self, f, dialect=csv.excel, encoding='utf-8', **kwds):
+        self.queue = io.StringIO()
+        self.writer = csv.writer(self.queue, dialect=dialect, **kwds)
+        self.stream = f
+        self.encoder = codecs.getincrementalencoder(encoding)()
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+        data = self.queue.getvalue()
+        data = self.encoder.encode(data)
+        self.stream.write(data)
+        self.queue.seek(0)
+        self.queue.truncate(0)
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+
+def legacy(rows, path):
+    with open(path, 'wb') as out:
+        writer = LegacyUnicodeWriter(out)
+        writer.writerow(HEADINGS)
+        writer.writerows(rows)
+
+
+def current(rows, path):
+    with io.open(path, 'w', newline='', encoding='utf-8',
+                 buffering=export.FILE_BUFFER) as out:
+        plugin.SqlPlugin.format_result_csv(
+            None, FakedResult(rows, HEADINGS), out=out)
+
+
+def make_rows(n):
+    start = dt.datetime(2015, 1, 1)
+    return [(i, u'name \xe9 %i' % i, decimal.Decimal(i) / 7,
+             start + dt.timedelta(minutes=i),
+             u'says "hi", twice' if i % 10 == 0 else u'n' * (i % 150),
+             i % 3 == 0 or None)
+            for i in range(n)]
+
+
+def main(nrows=200000):
+    rows = make_rows(nrows)
+    outputs = {}
+    times = {}
+    for name, func in (('legacy', legacy), ('csv', current)):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            for attempt in range(REPEAT):
+                start = time.time()
+                func(rows, path)
+                seconds = time.time() - start
+                times[name] = min(times.get(name, seconds), seconds)
+            with open(path, 'rb') as f:
+                outputs[name] = f.read()
+        finally:
+            os.remove(path)
+        print('%-8s %8.2fs %12.0f rows/s %8.1f MB/s' % (
+            name, times[name], nrows / times[name],
+            len(outputs[name]) / times[name] / 1024 / 1024))
+    if outputs['legacy'] != outputs['csv']:
+        print('output differs!')
+        return 1
+    print('speedup  %.1fx' % (times['legacy'] / times['csv']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the peak memory and time of building a DataFrame for %sql -P
+with dataframe.FrameBuilder, against fetchall() and
+DataFrame.from_records(), which build_dataframe used before, and of the
+Arrow-backed frames of %sql -P --arrow, converted from the cursor's rows
+or fetched through the ADBC sqlite driver. tracemalloc doesn't see
+memory allocated by pyarrow, so only their times are comparable.
+
+Usage:
+    python benchmarks/bench_dataframe.py [rows]
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import sqlalchemy as sa
+
+from ipydb import dataframe
+from ipydb.dataframe import AdbcResult, ArrowFrameBuilder, FrameBuilder
+
+TYPES = ['integer', 'string', 'float', 'datetime', 'integer']
+
+
+def make_engine(nrows, path):
+    # a file, which the ADBC driver can open too
+    engine = sa.create_engine('sqlite:///' + path)
+    engine.execute('create table t (id integer primary key, name text, '
+                   'price real, created datetime, qty integer)')
+    engine.execute(
+        'with recursive n(i) as (select 1 union all select i + 1 from n '
+        'where i < %i) insert into t select i, \'name \' || i, i * 1.5, '
+        'datetime(\'2015-01-01\', \'+\' || i || \' minutes\'), '
+        'case when i %% 10 = 0 then null else i %% 7 end from n' % nrows)
+    return engine
+
+
+def legacy(engine):
+    cursor = engine.execute('select * from t')
+    data = cursor.fetchall()
+    return pd.DataFrame.from_records(data, columns=cursor.keys())
+
+
+def chunked(engine):
+    return FrameBuilder(engine.execute('select * from t'),
+                        types=TYPES).build()
+
+
+def arrow(engine):
+    return ArrowFrameBuilder(engine.execute('select * from t'),
+                             types=TYPES).build()
+
+
+def adbc(engine):
+    result = AdbcResult(dataframe.adbc_connect(engine.url),
+                        'select * from t')
+    try:
+        return ArrowFrameBuilder(result, types=TYPES).build()
+    finally:
+        result.close()
+
+
+def measure(func, engine):
+    tracemalloc.start()
+    start = time.time()
+    frame = func(engine)
+    seconds = time.time() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, frame
+
+
+def main(nrows=500000):
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    engine = make_engine(nrows, path)
+    funcs = [('legacy', legacy), ('chunked', chunked)]
+    if dataframe._has_pyarrow:
+        funcs.append(('arrow', arrow))
+        connection = dataframe.adbc_connect(engine.url)
+        if connection is not None:
+            connection.close()
+            funcs.append(('adbc', adbc))
+    for name, func in funcs:
+        seconds, peak, frame = measure(func, engine)
+        print('%-8s %8.2fs  peak %7.1f MB  frame %7.1f MB' % (
+            name, seconds, peak / 1024.0 / 1024,
+            frame.memory_usage(deep=True).sum() / 1024.0 / 1024))
+        del frame
+    engine.dispose()
+    os.remove(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
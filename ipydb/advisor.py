@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""
+Suggest indexes from the query history.
+
+Statements in the history are parsed for the columns they filter,
+join and sort on. Columns which aren't already covered by an index in
+ipydb's cached schema metadata become candidate composite indexes,
+ranked by the total time spent running the statements which would use
+them. Only local data is used: the database isn't queried.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+import re
+
+import sqlparse
+
+from ipydb.explain import find_table, predicates, STRING, table_aliases
+
+# most columns to suggest in one index
+MAX_COLUMNS = 4
+EQUALITY = ('=', 'in', 'is')
+CLAUSE_END = r'(?=\b(?:inner|left|right|full|cross|natural|join|where|' \
+             r'group|order|limit|offset|having|union|fetch|for)\b|\)|$)'
+JOIN_ON = re.compile(r'\bon\s+(.*?)' + CLAUSE_END, re.I | re.S)
+JOIN_PAIR = re.compile(r'([\w$]+)\.([\w$]+)\s*=\s*([\w$]+)\.([\w$]+)')
+ORDER_BY = re.compile(r'\border\s+by\s+(.*?)'
+                      r'(?=\b(?:limit|offset|fetch|for)\b|\)|$)',
+                      re.I | re.S)
+COLUMN_REF = re.compile(r'^(?:([\w$]+)\.)?([\w$]+)(?:\s+(?:asc|desc))?'
+                        r'(?:\s+nulls\s+(?:first|last))?$', re.I)
+
+
+class IndexCandidate(object):
+    """A suggested index, with the statements which would use it."""
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns
+        self.total_ms = 0.0
+        self.count = 0
+        self.statements = []
+
+    @property
+    def name(self):
+        return 'ix_%s_%s' % (self.table, '_'.join(self.columns))
+
+    def create_statement(self):
+        return 'create index %s on %s (%s)' % (
+            self.name.lower(), self.table, ', '.join(self.columns))
+
+
+def resolve(db, aliases, qualifier, column):
+    """Return the model.Table which column belongs to, or None.
+
+    Args:
+        db: model.Database.
+        aliases: {alias: table name} from explain.table_aliases().
+        qualifier: table name or alias the column was qualified with.
+        column: column name.
+    """
+    if qualifier:
+        names = [aliases.get(qualifier.lower(), qualifier)]
+    else:
+        names = sorted(set(aliases.values()))
+    for name in names:
+        table = find_table(db, name)
+        if table is not None and column.lower() in set(
+                c.name.lower() for c in table.columns):
+            return table
+    return None
+
+
+def column_name(table, column):
+    """Return column as it is spelled in table's metadata."""
+    for col in table.columns:
+        if col.name.lower() == column.lower():
+            return col.name
+    return column  # pragma: nocover
+
+
+def used_columns(query, db):
+    """Return {table name: (table, [columns])} for the columns query
+    would want indexed, in the order they should appear in an index:
+    equality filters and join keys, then one range filter, then the
+    ORDER BY columns.
+    """
+    query = sqlparse.format(query, strip_comments=True)
+    aliases = table_aliases(query)
+    flat = STRING.sub("''", query)
+    usage = {}
+
+    def add(qualifier, column, kind):
+        table = resolve(db, aliases, qualifier, column)
+        if table is None:
+            return
+        entry = usage.setdefault(table.name, (table, {}))
+        columns = entry[1]
+        name = column_name(table, column)
+        if name not in columns:
+            columns[name] = (kind, len(columns))
+        elif kind < columns[name][0]:
+            columns[name] = (kind, columns[name][1])
+
+    for qualifier, column, operator in predicates(query):
+        add(qualifier, column, 0 if operator in EQUALITY else 1)
+    for clause in JOIN_ON.findall(flat):
+        for q1, c1, q2, c2 in JOIN_PAIR.findall(clause):
+            add(q1, c1, 0)
+            add(q2, c2, 0)
+    for clause in ORDER_BY.findall(flat):
+        for bit in clause.split(','):
+            match = COLUMN_REF.match(bit.strip())
+            if match:
+                add(match.group(1), match.group(2), 2)
+
+    ordered = {}
+    for name, (table, columns) in usage.items():
+        cols = sorted(columns, key=lambda c: columns[c])
+        # only the first range column can use the index, the rest of
+        # the range columns are dropped, unless they are also sorted on
+        ranges = [c for c in cols if columns[c][0] == 1]
+        cols = [c for c in cols if columns[c][0] != 1 or c == ranges[0]]
+        ordered[name] = (table, cols[:MAX_COLUMNS])
+    return ordered
+
+
+def is_covered(db, table, columns):
+    """Return True if an existing index, or the primary key, covers
+    columns, as far as the cached metadata can tell.
+
+    The metadata doesn't record the order of columns in an index, so an
+    index is taken to cover columns if it contains all of them.
+    """
+    wanted = set(c.lower() for c in columns)
+    pk = set(c.name.lower() for c in table.columns if c.primary_key)
+    if pk and wanted <= pk:
+        return True
+    for index in db.indexes(table.name):
+        if wanted <= set(c.name.lower() for c in index.columns):
+            return True
+    return False
+
+
+def advise(stats, db, limit=10):
+    """Return IndexCandidates, most valuable first.
+
+    Args:
+        stats: list of dicts from history.QueryHistory.stats().
+        db: model.Database with cached metadata.
+        limit: most candidates to return.
+    """
+    candidates = {}
+    for stat in stats:
+        if stat['total_ms'] <= 0:
+            continue
+        for name, (table, columns) in used_columns(stat['statement'],
+                                                   db).items():
+            if not columns or is_covered(db, table, columns):
+                continue
+            key = (table.name, tuple(columns))
+            candidate = candidates.get(key)
+            if candidate is None:
+                candidate = candidates[key] = IndexCandidate(table.name,
+                                                             columns)
+            candidate.total_ms += stat['total_ms']
+            candidate.count += stat['count']
+            candidate.statements.append(stat['statement'])
+    # an index on (a, b) also serves queries which only want (a)
+    for key, candidate in candidates.items():
+        for other in candidates.values():
+            if other is not candidate and other.table == candidate.table \
+                    and len(other.columns) > len(candidate.columns) and \
+                    other.columns[:len(candidate.columns)] == \
+                    candidate.columns:
+                other.total_ms += candidate.total_ms
+                other.count += candidate.count
+                candidate.total_ms = 0
+                break
+    ranked = sorted((c for c in candidates.values() if c.total_ms > 0),
+                    key=lambda c: c.total_ms, reverse=True)
+    return ranked[:limit]
@@ -4,6 +4,7 @@ install_aliases()
 
 """Draw ascii tables."""
 import itertools
+import re
 import sys
 
 from future.utils import string_types
@@ -25,6 +26,29 @@ class FakedResult(object):
         return self.headings
 
 
+class Row(tuple):
+    """A result row which PivotResultSet can use, like SqlAlchemy's."""
+    __slots__ = ()
+    _keys = []
+
+    def keys(self):
+        return self._keys
+
+    def values(self):
+        return list(self)
+
+    def __getattr__(self, name):
+        try:
+            return self[self._keys.index(name)]
+        except ValueError:
+            raise AttributeError(name)
+
+
+def row_class(headings):
+    """Return a subclass of Row whose keys() are headings."""
+    return type('Row', (Row,), {'__slots__': (), '_keys': list(headings)})
+
+
 class PivotResultSet(object):
     """Pivot a result set into an iterable of (fieldname, value)."""
 
@@ -36,7 +60,7 @@ class PivotResultSet(object):
         # is this a bad thing? probably not?
         # r.items() throws exceptions from SA if there are ambiguous
         # columns in the select statement.
-        return (zip(r.keys(), r.values()) for r in self.rs)
+        return (list(zip(r.keys(), r.values())) for r in self.rs)
 
     def keys(self):
         return ['Field', 'Value']
@@ -46,6 +70,66 @@ def isublists(l, n):
     return itertools.zip_longest(*[iter(l)] * n)
 
 
+# bytes to collect before writing to out, after the first page
+WRITE_BUFFER = 64 * 1024
+# rows read to choose column widths before a streamed table is drawn
+SAMPLE_ROWS = 200
+# rows formatted at a time when streaming
+BATCH_ROWS = 1000
+# widest str() of values of types without a declared length
+TYPE_WIDTHS = {
+    'bigint': 20, 'int8': 20, 'integer': 11, 'int': 11, 'int4': 11,
+    'mediumint': 8, 'smallint': 6, 'int2': 6, 'tinyint': 4,
+    'boolean': 5, 'bool': 5, 'date': 10, 'time': 15,
+    'datetime': 26, 'timestamp': 26,
+}
+SIZED_TYPE = re.compile(r'(char|binary|numeric|decimal|number)[^(]*'
+                        r'\(\s*(\d+)')
+
+
+def type_width(typ):
+    """Return the most characters a value of the declared SQL type typ
+    can take to display, or None if it can't be told from the type.
+
+    eg. 40 for VARCHAR(40), 11 for INTEGER.
+    """
+    typ = str(typ).lower().strip()
+    match = SIZED_TYPE.search(typ)
+    if match:
+        width = int(match.group(2))
+        if match.group(1) in ('numeric', 'decimal', 'number'):
+            width += 2  # sign and decimal point
+        return width
+    head = typ.split('(')[0].split()
+    if not head:
+        return None
+    width = TYPE_WIDTHS.get(head[0])
+    if width and 'with time zone' in typ:
+        width += 6  # +10:00
+    return width
+
+
+def cell_values(rows, sizes):
+    """Return rows with each value converted to a string which can be
+    drawn in a table cell: truncated to the size of its column and with
+    line breaks and tabs replaced."""
+    cells = []
+    for row in rows:
+        values = []
+        for value, size in zip(row, sizes):
+            if not isinstance(value, string_types):
+                value = str(value)
+            if len(value) > size:
+                value = value[:size - 5] + '[...]' if size > 5 \
+                    else value[:size]
+            if '\n' in value or '\r' in value or '\t' in value:
+                value = value.replace('\n', '^').replace('\r', '^') \
+                    .replace('\t', ' ')
+            values.append(value)
+        cells.append(values)
+    return cells
+
+
 def draw(cursor, out=sys.stdout, paginate=True, max_fieldsize=100):
     """Render an result set as an ascii-table.
 
@@ -53,60 +137,108 @@ def draw(cursor, out=sys.stdout, paginate=True, max_fieldsize=100):
     Assumes that we can determine the current terminal height and
     width via the termsize module.
 
+    Each page of rows is converted to strings once, drawn using one
+    format string per page, and written to `out` in large chunks.
+
     Args:
         cursor: An iterable of rows. Each row is a list or tuple
                 with index access to each cell. The cursor
                 has a list/tuple of headings via cursor.keys().
         out: File-like object.
     """
-
-    def heading_line(sizes):
-        for size in sizes:
-            out.write(b'+' + b'-' * (size + 2))
-        out.write(b'+\n')
-
-    def draw_headings(headings, sizes):
-        heading_line(sizes)
-        for idx, size in enumerate(sizes):
-            fmt = '| %%-%is ' % size
-            out.write((fmt % headings[idx]).encode('utf8'))
-        out.write(b'|\n')
-        heading_line(sizes)
-
     cols, lines = termsize()
     headings = cursor.keys()
-    sizes = list(map(lambda x: len(x), headings))
+    sizes = [len(heading) for heading in headings]
     if paginate:
         cursor = isublists(cursor, lines - 4)
         # else we assume cursor arrive here pre-paginated
+    limits = [max_fieldsize] * len(headings)
+    buf = []
+    buffered = 0
+    first = True
     for screenrows in cursor:
+        rows = []
         for row in screenrows:
             if row is None:
-                break
-            for idx, value in enumerate(row):
-                if not isinstance(value, string_types):
-                    value = str(value)
-                size = max(sizes[idx], len(value))
-                sizes[idx] = min(size, max_fieldsize)
-        draw_headings(headings, sizes)
-        for rw in screenrows:
-            if rw is None:
                 break  # from isublists impl
-            for idx, size in enumerate(sizes):
-                fmt = '| %%-%is ' % size
-                value = rw[idx]
-                if not isinstance(value, string_types):
-                    value = str(value)
-                if len(value) > max_fieldsize:
-                    value = value[:max_fieldsize - 5] + '[...]'
-                value = value.replace('\n', '^')
-                value = value.replace('\r', '^').replace('\t', ' ')
-                try:
-                    value = fmt % value
-                except UnicodeDecodeError:
-                    value = fmt % value.decode('utf8')
-                out.write(value.encode('utf8'))
-            out.write(b'|\n')
+            rows.append(row)
+        cells = cell_values(rows, limits)
+        for idx, column in enumerate(zip(*cells)):
+            sizes[idx] = min(max(sizes[idx], max(map(len, column))),
+                             max_fieldsize)
+        rule = ''.join('+' + '-' * (size + 2) for size in sizes) + '+\n'
+        fmt = ''.join('| %%-%is ' % size for size in sizes) + '|\n'
+        page = [rule, fmt % tuple(headings), rule]
+        page.extend(fmt % tuple(values) for values in cells)
         if not paginate:
-            heading_line(sizes)
-            out.write(b'\n')
+            page.append(rule)
+            page.append('\n')
+        chunk = ''.join(page).encode('utf8')
+        buf.append(chunk)
+        buffered += len(chunk)
+        if first or buffered >= WRITE_BUFFER:
+            # the first page is written straight away so that the pager
+            # can show it while the rest are fetched
+            out.write(b''.join(buf))
+            buf = []
+            buffered = 0
+            first = False
+    if buf:
+        out.write(b''.join(buf))
+
+
+def draw_stream(cursor, out=sys.stdout, widths=None, sample_size=None,
+                max_fieldsize=100):
+    """Render a result set as one ascii-table with fixed column widths.
+
+    draw() measures each page, so column widths change from page to page
+    and nothing is shown until a page has been read. Here widths are
+    chosen once, from the first sample_size rows and, if there are more
+    rows than that, from widths. Then the rest of the rows are drawn as
+    they arrive. Values which are too wide for their column are
+    truncated.
+
+    Args:
+        cursor: An iterable of rows, see draw().
+        out: File-like object.
+        widths: list with the widest value expected in each column, eg.
+                from its declared type, or None where it isn't known.
+        sample_size: number of rows to measure, default SAMPLE_ROWS.
+        max_fieldsize: widest column.
+    """
+    if sample_size is None:
+        sample_size = SAMPLE_ROWS
+    headings = cursor.keys()
+    rows = iter(cursor)
+    limits = [max_fieldsize] * len(headings)
+    sample = cell_values(itertools.islice(rows, sample_size), limits)
+    sizes = [len(heading) for heading in headings]
+    for idx, column in enumerate(zip(*sample)):
+        sizes[idx] = max(sizes[idx], max(map(len, column)))
+    if len(sample) == sample_size:
+        # there are more rows to come, make room for their values
+        for idx, width in enumerate(widths or []):
+            if width:
+                sizes[idx] = max(sizes[idx], width)
+    sizes = [min(size, max_fieldsize) for size in sizes]
+    rule = ''.join('+' + '-' * (size + 2) for size in sizes) + '+\n'
+    fmt = ''.join('| %%-%is ' % size for size in sizes) + '|\n'
+    page = [rule, fmt % tuple(headings), rule]
+    page.extend(fmt % tuple(values) for values in sample)
+    out.write(''.join(page).encode('utf8'))
+    buf = []
+    buffered = 0
+    while True:
+        cells = cell_values(itertools.islice(rows, BATCH_ROWS), sizes)
+        if not cells:
+            break
+        chunk = ''.join(fmt % tuple(values) for values in cells) \
+            .encode('utf8')
+        buf.append(chunk)
+        buffered += len(chunk)
+        if buffered >= WRITE_BUFFER:
+            out.write(b''.join(buf))
+            buf = []
+            buffered = 0
+    buf.append(rule.encode('utf8'))
+    out.write(b''.join(buf))
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keep the last result shown in a temporary sqlite file.
+
+Rows are written to the file in batches as they are drawn, so that the
+result can be paged through, sorted and searched afterwards (see
+%page, %sort and %grep) without running the statement again, and
+without holding the rows in memory:
+
+    buf = ResultBuffer(cursor.keys())
+    for row in BufferingResult(cursor, buf):
+        draw(row)
+    buf.sort('name')
+    rows = buf.fetch(offset=100, limit=50)
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+import os
+import re
+import sqlite3
+import tempfile
+
+# rows written to the file at a time
+BATCH_ROWS = 1000
+# export types (see export.sql_type()) sorted as numbers
+NUMERIC_TYPES = ('integer', 'float', 'decimal')
+# values which sqlite stores as they are, anything else is stored as str()
+SQLITE_TYPES = (int, float, str, bytes, type(None))
+
+
+def sqlite_value(value):
+    if isinstance(value, SQLITE_TYPES):
+        return value
+    return str(value)
+
+
+class ResultBuffer(object):
+    """Rows of a result set in a temporary sqlite file, viewed in the
+    order set by sort() and filtered by grep()."""
+
+    def __init__(self, headings, types=None, directory=None):
+        """Constructor.
+
+        Args:
+            headings: column names.
+            types: export type of each column (see export.sql_type()),
+                   used to sort numbers which sqlite can't store, eg.
+                   Decimals, as numbers.
+            directory: where to create the file, default: the system's
+                       temporary directory.
+        """
+        self.headings = list(headings)
+        self.types = types or [None] * len(self.headings)
+        fd, self.path = tempfile.mkstemp(prefix='ipydb-', suffix='.sqlite',
+                                         dir=directory)
+        os.close(fd)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('pragma journal_mode = off')
+        self.db.execute('pragma synchronous = off')
+        self.db.execute('create table result (%s)' % ', '.join(
+            'c%i' % idx for idx in range(len(self.headings))))
+        self.insert = 'insert into result values (%s)' % ', '.join(
+            '?' * len(self.headings))
+        self.rows = 0
+        self.complete = False
+        self.order = None  # (column index, descending)
+        self.pattern = None
+
+    def append(self, rows):
+        """Write a batch of rows."""
+        self.db.executemany(self.insert, (
+            [sqlite_value(value) for value in row] for row in rows))
+        self.rows += len(rows)
+
+    def finish(self):
+        """Call once every row of the result has been written."""
+        self.db.commit()
+        self.complete = True
+
+    def column(self, name):
+        """Return the index of the column called name, ignoring case.
+
+        Raises:
+            KeyError: if there is no such column.
+        """
+        for idx, heading in enumerate(self.headings):
+            if str(heading).lower() == name.lower():
+                return idx
+        raise KeyError('No column named %s, try one of: %s' % (
+            name, ', '.join(str(h) for h in self.headings)))
+
+    def sort(self, name=None, descending=False):
+        """View the rows sorted by column name, or in their original
+        order if name is None."""
+        if name is None:
+            self.order = None
+        else:
+            self.order = (self.column(name), descending)
+
+    def grep(self, pattern=None, ignore_case=False):
+        """View only the rows with a value which matches the regular
+        expression pattern, or every row if pattern is None.
+
+        Raises:
+            re.error: if pattern isn't a valid regular expression.
+        """
+        if pattern is None:
+            self.pattern = None
+            return
+        self.pattern = re.compile(pattern, re.I if ignore_case else 0)
+        search = self.pattern.search
+
+        def matches(*values):
+            for value in values:
+                if value is not None and search(str(value)):
+                    return True
+            return False
+        self.db.create_function('matches', -1, matches)
+
+    def view_sql(self, select):
+        sql = 'select %s from result' % select
+        if self.pattern is not None:
+            sql += ' where matches(%s)' % ', '.join(
+                'c%i' % idx for idx in range(len(self.headings)))
+        return sql
+
+    def count(self):
+        """Return the number of rows in the view."""
+        if self.pattern is None:
+            return self.rows
+        return self.db.execute(self.view_sql('count(*)')).fetchone()[0]
+
+    def fetch(self, offset=0, limit=None):
+        """Return an iterator over rows of the view.
+
+        Args:
+            offset: number of rows to skip.
+            limit: most rows to return, default: all of them.
+        """
+        sql = self.view_sql('*')
+        if self.order is not None:
+            idx, descending = self.order
+            key = 'c%i' % idx
+            if self.types[idx] and \
+                    self.types[idx].startswith(NUMERIC_TYPES):
+                key = 'cast(%s as real)' % key
+            sql += ' order by %s %s, rowid' % (
+                key, 'desc' if descending else 'asc')
+        else:
+            sql += ' order by rowid'
+        sql += ' limit %i offset %i' % (
+            -1 if limit is None else limit, offset)
+        return self.db.execute(sql)
+
+    def close(self):
+        """Close and delete the file."""
+        if self.db is None:
+            return
+        self.db.close()
+        self.db = None
+        try:
+            os.remove(self.path)
+        except OSError:  # pragma: nocover
+            pass
+
+
+class BufferingResult(object):
+    """Wraps a result set, writing its rows to a ResultBuffer as they
+    are read."""
+
+    def __init__(self, result, buffer):
+        self.result = result
+        self.buffer = buffer
+
+    def __getattr__(self, name):
+        return getattr(self.result, name)
+
+    def keys(self):
+        return self.result.keys()
+
+    def __iter__(self):
+        batch = []
+        try:
+            for row in self.result:
+                batch.append(row)
+                if len(batch) == BATCH_ROWS:
+                    self.buffer.append(batch)
+                    batch = []
+                yield row
+            self.buffer.append(batch)
+            batch = []
+            self.buffer.finish()
+        finally:
+            if batch:  # the consumer stopped early
+                self.buffer.append(batch)
+                self.buffer.db.commit()
+
+    def fetchall(self):
+        return list(self)
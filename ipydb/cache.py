@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+"""
+An in-memory cache of SELECT results.
+
+Results are stored pickled, up to a total byte budget, and evicted
+least recently used first or when they are older than a TTL. Cached
+results are dropped when the session runs DML or DDL against a table
+which they reference.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from collections import OrderedDict
+import pickle
+import re
+import threading
+import time
+
+from ipydb.asciitable import row_class
+
+STRINGS = re.compile(r"'(?:''|[^'])*'")
+WORDS = re.compile(r'[A-Za-z_][\w$]*')
+# table modified by a DML statement
+DML_TARGET = re.compile(
+    r'^\s*(?:(?:insert|replace|merge)\s+(?:\w+\s+)*?into|delete\s+from|'
+    r'update(?:\s+only)?)\s+([\w$."`\[\]]+)', re.I)
+
+# rows sampled to estimate the pickled size of a result
+SAMPLE_ROWS = 100
+
+
+def referenced_names(sql):
+    """Return the set of lower case words in sql, outside of strings.
+
+    This is a superset of the tables which sql references.
+    """
+    return set(w.lower() for w in WORDS.findall(STRINGS.sub('', sql)))
+
+
+def modified_table(sql):
+    """Return the lower case name of the table a DML statement changes,
+    without schema or quotes, or None if it can't be determined."""
+    match = DML_TARGET.match(sql)
+    if not match:
+        return None
+    return match.group(1).split('.')[-1].strip('"`[]').lower()
+
+
+class CacheEntry(object):
+
+    def __init__(self, data, names, rowcount):
+        self.data = data
+        self.names = names
+        self.rowcount = rowcount
+        self.created = time.time()
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+
+class CachedResult(object):
+    """A cached result set, which looks like an SqlAlchemy ResultProxy."""
+
+    returns_rows = True
+
+    def __init__(self, headings, rows):
+        self.headings = headings
+        self.rows = rows
+        self.rowcount = len(rows)
+        self._pos = 0
+
+    def keys(self):
+        return self.headings
+
+    def __iter__(self):
+        while self._pos < len(self.rows):
+            self._pos += 1
+            yield self.rows[self._pos - 1]
+
+    def fetchone(self):
+        for row in self:
+            return row
+        return None
+
+    def fetchmany(self, size=1):
+        rows = self.rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        return list(self)
+
+    def close(self):
+        pass
+
+
+class CachingResult(object):
+    """Wraps a ResultProxy, storing its rows in a ResultCache once they
+    have all been read. Results which turn out to be too big for the
+    cache are streamed without being kept.
+    """
+
+    def __init__(self, cache, key, names, result):
+        self.cache = cache
+        self.key = key
+        self.names = names
+        self.result = result
+        self.rows = []
+        self.max_rows = None
+        self.caching = True
+
+    def __getattr__(self, name):
+        return getattr(self.result, name)
+
+    def keys(self):
+        return self.result.keys()
+
+    def __iter__(self):
+        for row in self.result:
+            if self.caching:
+                self.remember(row)
+            yield row
+        self.finish()
+
+    def finish(self):
+        """Store the rows, once they have all been read."""
+        if self.caching:
+            self.caching = False
+            self.cache.put(self.key, list(self.result.keys()), self.rows,
+                           self.names)
+            self.rows = []
+
+    def remember(self, row):
+        self.rows.append(tuple(row))
+        if len(self.rows) == SAMPLE_ROWS and self.max_rows is None:
+            sample = len(pickle.dumps(self.rows, pickle.HIGHEST_PROTOCOL))
+            self.max_rows = self.cache.max_bytes * SAMPLE_ROWS // sample
+        if self.max_rows is not None and len(self.rows) > self.max_rows:
+            self.caching = False
+            self.rows = []
+
+    def fetchone(self):
+        row = self.result.fetchone()
+        if row is None:
+            self.finish()
+        elif self.caching:
+            self.remember(row)
+        return row
+
+    def fetchmany(self, size=None):
+        if size is None:
+            rows = self.result.fetchmany()
+        else:
+            rows = self.result.fetchmany(size)
+        if not rows:
+            self.finish()
+        elif self.caching:
+            for row in rows:
+                self.remember(row)
+        return rows
+
+    def fetchall(self):
+        return list(self)
+
+
+class ResultCache(object):
+    """LRU cache of SELECT results, limited by size and age.
+
+    Usage:
+        cache = ResultCache(max_bytes=64 * 1024 * 1024, ttl=300)
+        result = cache.get(key)
+        if result is None:
+            result = cache.wrap(key, sql, engine.execute(sql))
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=300):
+        """Constructor.
+
+        Args:
+            max_bytes: total size of the pickled results to keep.
+            ttl: seconds before a result expires, None for never.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return a CachedResult for key, or None."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and \
+                    time.time() - entry.created > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.pop(key)
+            self.entries[key] = entry  # most recently used
+        headings, rows = pickle.loads(entry.data)
+        cls = row_class(headings)
+        return CachedResult(headings, [cls(row) for row in rows])
+
+    def wrap(self, key, sql, result):
+        """Return result, wrapped so that it is cached once read."""
+        if not result.returns_rows:
+            return result
+        return CachingResult(self, key, referenced_names(sql), result)
+
+    def put(self, key, headings, rows, names):
+        data = pickle.dumps((headings, rows), pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = CacheEntry(data, names, len(rows))
+            self.nbytes += len(data)
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.nbytes -= entry.nbytes
+
+    def invalidate(self, table=None):
+        """Drop results which reference table, or all results."""
+        with self._lock:
+            if table is None:
+                keys = list(self.entries)
+            else:
+                table = table.lower()
+                keys = [key for key, entry in self.entries.items()
+                        if table in entry.names]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def invalidate_for(self, sql, command):
+        """Drop the results which statement sql may have changed.
+
+        Args:
+            sql: an SQL statement which has been run.
+            command: sql's first word in lower case.
+        """
+        if command == 'select' or not self.entries:
+            return
+        table = modified_table(sql)
+        if table is not None:
+            self.invalidate(table)
+        else:
+            self.invalidate()  # DDL or something we don't understand
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self):
+        """Return a dict of cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
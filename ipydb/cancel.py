@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cancel running SQL statements on the server when the user hits Ctrl-C.
+
+While a DB-API driver is blocked in C code waiting for the server,
+python can't raise KeyboardInterrupt, so Ctrl-C does nothing until the
+statement finishes. StatementGuard works around this with a watchdog
+thread which is woken by signal.set_wakeup_fd() as soon as SIGINT
+arrives. The watchdog then asks the server to cancel the statement,
+using whatever mechanism the dialect supports.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+
+import sqlalchemy as sa
+
+log = logging.getLogger(__name__)
+
+
+class StatementCancelled(Exception):
+    """Raised when the user cancelled a statement with Ctrl-C."""
+
+
+def cancel_sqlite(engine, dbapi_conn, cursor):
+    dbapi_conn.interrupt()
+
+
+def cancel_postgresql(engine, dbapi_conn, cursor):
+    pid = dbapi_conn.get_backend_pid()
+    with engine.connect() as side:
+        side.execute(sa.text('select pg_cancel_backend(:pid)'), pid=pid)
+
+
+def cancel_mysql(engine, dbapi_conn, cursor):
+    thread_id = dbapi_conn.thread_id()
+    with engine.connect() as side:
+        side.execute('KILL QUERY %d' % int(thread_id))
+
+
+def cancel_oracle(engine, dbapi_conn, cursor):
+    dbapi_conn.cancel()
+
+
+# dialect name -> function(engine, dbapi_connection, dbapi_cursor)
+CANCELLERS = {
+    'sqlite': cancel_sqlite,
+    'postgresql': cancel_postgresql,
+    'mysql': cancel_mysql,
+    'oracle': cancel_oracle,
+}
+
+
+def in_main_thread():
+    return isinstance(threading.current_thread(), threading._MainThread)
+
+
+class StatementGuard(object):
+    """Context manager: cancel statements run on engine if SIGINT arrives.
+
+    Usage:
+        guard = StatementGuard(engine)
+        with guard:
+            engine.execute(something_slow)
+
+    The guard only arms itself in the main thread (signals are only
+    delivered there) and for real SqlAlchemy engines. Once armed, the
+    statement that is currently executing is recorded via the
+    `before_cursor_execute` event. After a cancellation, guard.cancelled
+    is True and the interrupted statement will have raised either
+    KeyboardInterrupt or a driver error, depending on which got
+    there first.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.armed = False
+        self.cancelled = False
+        self.current = None  # (dbapi connection, dbapi cursor)
+        self._owner = None
+        self._thread = None
+        self._old_wakeup_fd = -1
+
+    def track(self, conn, cursor, statement, parameters, context,
+              executemany):
+        """before_cursor_execute listener."""
+        if threading.current_thread() is self._owner:
+            self.current = (conn.connection.connection, cursor)
+
+    def __enter__(self):
+        if not isinstance(self.engine, sa.engine.Engine) or \
+                not in_main_thread():
+            return self
+        self._rsock, self._wsock = socket.socketpair()
+        self._wsock.setblocking(False)
+        try:
+            self._old_wakeup_fd = signal.set_wakeup_fd(self._wsock.fileno())
+        except ValueError:  # pragma: nocover
+            self._close_sockets()
+            return self
+        self._owner = threading.current_thread()
+        sa.event.listen(self.engine, 'before_cursor_execute', self.track)
+        self._thread = threading.Thread(target=self._watch)
+        self._thread.daemon = True
+        self._thread.start()
+        self.armed = True
+        return self
+
+    def __exit__(self, ty, val, tb):
+        if not self.armed:
+            return False
+        signal.set_wakeup_fd(self._old_wakeup_fd)
+        sa.event.remove(self.engine, 'before_cursor_execute', self.track)
+        self._wsock.close()  # wakes the watchdog with EOF
+        self._thread.join()
+        self._rsock.close()
+        self.armed = False
+        self.current = None
+        return False
+
+    def _close_sockets(self):
+        self._rsock.close()
+        self._wsock.close()
+
+    def _watch(self):
+        """Runs in the watchdog thread until the guard is exited."""
+        while True:
+            data = self._rsock.recv(64)
+            if not data:
+                return
+            if self._old_wakeup_fd != -1:
+                # pass signals on to whoever was listening before us
+                try:
+                    os.write(self._old_wakeup_fd, data)
+                except OSError:
+                    pass
+            if signal.SIGINT in bytearray(data) and not self.cancelled:
+                self.cancel()
+
+    def cancel(self):
+        """Ask the server to cancel the currently executing statement."""
+        self.cancelled = True
+        if self.current is None:
+            return
+        dbapi_conn, cursor = self.current
+        canceller = CANCELLERS.get(self.engine.dialect.name)
+        if canceller is None:
+            log.debug('No way to cancel statements for dialect %s',
+                      self.engine.dialect.name)
+            return
+        try:
+            canceller(self.engine, dbapi_conn, cursor)
+        except Exception:
+            log.warning('Failed to cancel statement', exc_info=True)
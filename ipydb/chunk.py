@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+"""
+Run large UPDATE and DELETE statements in batches of key ranges.
+
+A statement like:
+
+    delete from events where created < '2015-01-01'
+
+is run as a series of statements, each in its own transaction:
+
+    delete from events where (created < '2015-01-01')
+        and id >= 1 and id < 10001
+    delete from events where (created < '2015-01-01')
+        and id >= 10001 and id < 20001
+    ...
+
+so that locks are only held, and undo/WAL only accumulates, for one
+batch at a time.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+import re
+import sys
+import time
+
+import sqlparse
+from sqlparse import sql as S
+from sqlparse import tokens as T
+
+# target table of an update or delete statement
+TARGET = re.compile(r'^\s*(?:delete\s+from|update(?:\s+only)?)\s+'
+                    r'([\w$.]+|"[^"]+"|`[^`]+`|\[[^\]]+\])', re.I)
+# keywords which end a WHERE clause, or which it goes before
+AFTER_WHERE = ('ORDER BY', 'LIMIT', 'RETURNING')
+
+
+def target_table(query):
+    """Return the name of the table changed by an UPDATE or DELETE.
+
+    Returns:
+        table name as written in query, or None.
+    """
+    match = TARGET.match(query)
+    return match.group(1) if match else None
+
+
+def unquote(name):
+    return name.strip('"`[]')
+
+
+def primary_key(table):
+    """Return the name of table's primary key column.
+
+    Args:
+        table: model.Table or None.
+    Returns:
+        column name, or None if table doesn't have exactly one primary
+        key column.
+    """
+    if table is None:
+        return None
+    keys = [c.name for c in table.columns if c.primary_key]
+    return keys[0] if len(keys) == 1 else None
+
+
+def chunk_statement(query, column):
+    """Add a range condition on column to the WHERE clause of query.
+
+    Args:
+        query: an UPDATE or DELETE statement.
+        column: the column to split the statement on.
+    Returns:
+        function(lo, hi) which returns query, restricted to rows where
+        lo <= column < hi.
+    """
+    stmt = sqlparse.parse(query.strip().rstrip(';'))[0]
+    head, tail = [], []
+    where = None
+    for tok in stmt.tokens:
+        if where is None and isinstance(tok, S.Where):
+            where = sqlparse.format(str(tok), strip_comments=True).strip()
+            where = where[len('where'):].strip()
+        elif where is None and tok.ttype in T.Keyword and \
+                tok.normalized in AFTER_WHERE:
+            where = ''
+            tail.append(tok)
+        elif where is None:
+            head.append(tok)
+        else:
+            tail.append(tok)
+    head = ''.join(str(tok) for tok in head).rstrip()
+    tail = ''.join(str(tok) for tok in tail).strip()
+
+    def statement(lo, hi):
+        cond = '%s >= %d and %s < %d' % (column, lo, column, hi)
+        if where:
+            cond = '(%s) and %s' % (where, cond)
+        return ' '.join(bit for bit in (head, 'where', cond, tail) if bit)
+    return statement
+
+
+class ChunkedStatement(object):
+    """Runs an UPDATE or DELETE in batches of key ranges.
+
+    Usage:
+        chunked = ChunkedStatement(engine, query, 'id', 10000)
+        chunked.run()
+        print(chunked.summary())
+
+    If run() raises, chunked.next_start is the start of the first batch
+    which was not committed, pass it to run() to resume.
+    """
+
+    def __init__(self, engine, query, column, chunk_size, sleep=0,
+                 report_interval=10, out=None):
+        """Constructor.
+
+        Args:
+            engine: SqlAlchemy engine to run statements on.
+            query: an UPDATE or DELETE statement.
+            column: integer column to split the statement on, usually
+                    the primary key.
+            chunk_size: number of key values per batch.
+            sleep: seconds to pause between batches.
+            report_interval: print progress every N seconds, 0 for never.
+            out: file-like object for progress, default: sys.stdout.
+        """
+        self.engine = engine
+        self.query = query
+        self.table = target_table(query)
+        self.column = column
+        self.chunk_size = chunk_size
+        self.sleep = sleep
+        self.report_interval = report_interval
+        self.out = out
+        self.statement = chunk_statement(query, column)
+        self.rows = 0
+        self.batches = 0
+        self.total_batches = 0
+        self.next_start = None
+        self.start = self.last_report = time.time()
+
+    def bounds(self):
+        """Return the (min, max) value of column, or None if no rows."""
+        key = self.column.split('.')[-1]
+        lo, hi = self.engine.execute('select min(%s), max(%s) from %s' % (
+            key, key, self.table)).fetchone()
+        if lo is None:
+            return None
+        try:
+            return int(lo), int(hi)
+        except (TypeError, ValueError):
+            raise ValueError('Can only chunk by an integer column, '
+                             '%s is %r' % (self.column, lo))
+
+    def run(self, start=None, guard=None):
+        """Run every batch, committing each one.
+
+        Args:
+            start: first key value to change, default: min(column).
+            guard: context manager to run each batch in, eg. a
+                   cancel.StatementGuard.
+        """
+        bounds = self.bounds()
+        if bounds is None:
+            return
+        lo, hi = bounds
+        if start is not None:
+            lo = start
+        self.total_batches = max(0, (hi - lo) // self.chunk_size + 1)
+        for batch_start in range(lo, hi + 1, self.chunk_size):
+            self.next_start = batch_start
+            sql = self.statement(batch_start, batch_start + self.chunk_size)
+            if guard is None:
+                result = self.execute(sql)
+            else:
+                with guard:
+                    result = self.execute(sql)
+            self.rows += max(result.rowcount, 0)
+            self.batches += 1
+            self.next_start = None
+            self.report()
+            if self.sleep and batch_start + self.chunk_size <= hi:
+                self.next_start = batch_start + self.chunk_size
+                time.sleep(self.sleep)
+                self.next_start = None
+
+    def execute(self, sql):
+        with self.engine.begin() as conn:
+            return conn.execute(sql)
+
+    def report(self):
+        if not self.report_interval:
+            return
+        now = time.time()
+        if now - self.last_report >= self.report_interval:
+            self.last_report = now
+            print(self.summary(), file=self.out or sys.stdout)
+
+    def summary(self):
+        elapsed = max(time.time() - self.start, 1e-6)
+        return "%i/%i batches, %i row%s affected in %.1fs: %.1f rows/s" % (
+            self.batches, self.total_batches, self.rows,
+            's' if self.rows != 1 else '', elapsed, self.rows / elapsed)
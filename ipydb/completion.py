@@ -13,6 +13,7 @@ from sqlalchemy.sql.compiler import RESERVED_WORDS
 
 from ipydb.engine import getconfigs
 from ipydb.magic import SQL_ALIASES
+from ipydb.metrics import registry
 
 log = logging.getLogger(__name__)
 reassignment = re.compile(r'^\w+\s*=\s*%((\w+).*)')
@@ -110,6 +111,7 @@ class IpydbCompleter(object):
             'fks': self.table_name,
             'describe': self.table_name,
             'sql': self.sql_statement,
+            'explain': self.sql_statement,
             'runsql': lambda _: None  # delegate to ipython for file match
         }
         self.commands_completers.update(
@@ -135,7 +137,11 @@ class IpydbCompleter(object):
         func = self.commands_completers.get(key)
         if func is None:
             return None
-        return func(ev)
+        name = getattr(func, '__name__', key)
+        if name == '<lambda>':
+            name = key
+        with registry.timed('completion_ms', completer=name):
+            return func(ev)
 
     def connection_nickname(self, ev):
         """Return completions for %connect."""
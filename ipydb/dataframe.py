@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+
+"""
+Build pandas DataFrames from result sets a batch of rows at a time.
+
+Each batch is converted to one array per column, using the reflected
+column types where they are known, so that only one batch of row tuples
+is held in memory at a time, rather than the whole result as well as
+the frame made from it:
+
+    builder = FrameBuilder(cursor, types=['integer', None])
+    frame = builder.build()
+
+or, to process a result which doesn't fit in memory:
+
+    for frame in FrameBuilder(cursor):
+        ...
+
+ArrowFrameBuilder builds DataFrames backed by pyarrow arrays instead,
+from batches read straight from the database by an ADBC driver where
+one is installed for it (see adbc_result()), or else converted from the
+rows of the cursor a batch at a time.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+import importlib
+import itertools
+
+from ipydb import export
+
+# pandas as a extra requirement
+_has_pandas = False
+try:
+    import numpy as np
+    import pandas as pd
+    _has_pandas = True
+except ImportError:
+    pass
+
+# pyarrow as a extra requirement
+_has_pyarrow = False
+try:
+    import pyarrow as pa
+    _has_pyarrow = True
+except ImportError:
+    pass
+
+# rows converted at a time
+BATCH_ROWS = 10000
+
+
+def url_string(url):
+    """Return a sqlalchemy URL as a string, with its password."""
+    if hasattr(url, 'render_as_string'):
+        return url.render_as_string(hide_password=False)
+    return str(url)
+
+
+def sqlite_uri(url):
+    # a second connection to :memory: would see another database
+    return url.database or None
+
+
+def postgresql_uri(url):
+    return 'postgresql://' + url_string(url).split('://', 1)[1]
+
+
+# sqlalchemy dialect name -> (ADBC DB-API module, function returning the
+# driver's uri for a sqlalchemy URL, or None if it can't be used)
+ADBC_DRIVERS = {
+    'sqlite': ('adbc_driver_sqlite.dbapi', sqlite_uri),
+    'postgresql': ('adbc_driver_postgresql.dbapi', postgresql_uri),
+}
+
+
+def adbc_connect(url):
+    """Return an ADBC DB-API connection to the database at url, or None
+    if there is no ADBC driver installed for it.
+
+    Args:
+        url: sqlalchemy URL.
+    """
+    name = url.get_backend_name()
+    if not _has_pyarrow or name not in ADBC_DRIVERS:
+        return None
+    module, get_uri = ADBC_DRIVERS[name]
+    uri = get_uri(url)
+    if uri is None:
+        return None
+    try:
+        dbapi = importlib.import_module(module)
+    except ImportError:
+        return None
+    return dbapi.connect(uri, autocommit=True)
+
+
+class AdbcResult(object):
+    """The result of a query run through an ADBC driver, which can be
+    passed to ArrowFrameBuilder in place of a cursor."""
+
+    returns_rows = True
+
+    def __init__(self, connection, query):
+        """Run query.
+
+        Args:
+            connection: ADBC DB-API connection, see adbc_connect(). It is
+                        closed along with the result.
+            query: SQL statement.
+        """
+        self.connection = connection
+        self.adbc_cursor = connection.cursor()
+        try:
+            self.adbc_cursor.execute(query)
+            self.reader = self.adbc_cursor.fetch_record_batch()
+        except Exception:
+            self.close()
+            raise
+        self.schema = self.reader.schema
+
+    def keys(self):
+        return self.schema.names
+
+    def record_batches(self):
+        return iter(self.reader)
+
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.adbc_cursor.close()
+        finally:
+            self.connection.close()
+            self.connection = None
+
+
+def column_array(values, typ):
+    """Return values, one column of a batch, as an array for a DataFrame.
+
+    Args:
+        values: list of values.
+        typ: export type of the column, see export.sql_type(). Columns
+             whose type isn't known, or which can't be converted to it,
+             are left for pandas to infer, as DataFrame.from_records
+             does.
+    """
+    try:
+        if typ == 'integer':
+            if any(v is None for v in values):
+                return pd.array(values, dtype='Int64')
+            return np.array(values, dtype=np.int64)
+        if typ == 'float':
+            return np.array([np.nan if v is None else v for v in values],
+                            dtype=np.float64)
+        if typ == 'boolean':
+            if any(v is None for v in values):
+                return pd.array(values, dtype='boolean')
+            return np.array(values, dtype=bool)
+        if typ == 'datetime':
+            return pd.to_datetime(values)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return values
+
+
+def concat_arrays(arrays):
+    """Return the arrays of one column, from column_array(), as one."""
+    if len(arrays) == 1:
+        return arrays[0]
+    if all(isinstance(array, list) for array in arrays):
+        return list(itertools.chain.from_iterable(arrays))
+    if all(isinstance(array, np.ndarray) and array.dtype == arrays[0].dtype
+           for array in arrays):
+        return np.concatenate(arrays)
+    # eg. a batch which couldn't be converted to the column's type
+    return pd.concat([pd.Series(array) for array in arrays],
+                     ignore_index=True)
+
+
+class FrameBuilder(object):
+    """Turns a result set into DataFrames, batch_size rows at a time.
+
+    Iterate over a FrameBuilder for a DataFrame per batch, or call build()
+    for one DataFrame. Either stops early once max_rows rows, or frames
+    using max_bytes of memory, have been built, and sets truncated if
+    the result had more rows.
+    """
+
+    def __init__(self, cursor, types=None, batch_size=BATCH_ROWS,
+                 max_rows=None, max_bytes=None):
+        """Constructor.
+
+        Args:
+            cursor: iterable of rows with a keys() method.
+            types: export type of each column, see export.sql_type().
+            batch_size: rows per batch.
+            max_rows: most rows to build frames from.
+            max_bytes: stop once the frames use this much memory.
+        """
+        self.cursor = cursor
+        self.columns = list(cursor.keys())
+        self.types = types or [None] * len(self.columns)
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.nbytes = 0
+        self.truncated = False
+
+    def arrays(self, batch):
+        """Return a list of rows as one array per column."""
+        # indexing is several times faster than zip(*batch) over
+        # sqlalchemy's rows
+        return [column_array([row[idx] for row in batch], typ)
+                for idx, typ in enumerate(self.types)]
+
+    def to_frame(self, arrays):
+        """Return a DataFrame of a list of column arrays."""
+        # keyed by position, as column names can repeat
+        frame = pd.DataFrame(dict(enumerate(arrays)))
+        frame.columns = self.columns
+        return frame
+
+    def frame(self, batch):
+        """Return a DataFrame for a list of rows."""
+        return self.to_frame(self.arrays(batch))
+
+    def fetcher(self):
+        """Return a function fetch(size), which returns a list of up to
+        size more rows of the cursor."""
+        if hasattr(self.cursor, 'fetchmany'):
+            # a ResultProxy fetches each row it iterates over separately
+            return lambda size: list(self.cursor.fetchmany(size))
+        rows = iter(self.cursor)
+        return lambda size: list(itertools.islice(rows, size))
+
+    def batches(self):
+        """Yield the arrays of each batch of rows, see arrays(), until a
+        limit is reached."""
+        fetch = self.fetcher()
+        while True:
+            size = self.batch_size
+            if self.max_rows is not None:
+                size = min(size, self.max_rows - self.rows)
+            if size <= 0 or (self.max_bytes is not None and
+                             self.nbytes >= self.max_bytes):
+                # the limit was reached, is there more?
+                self.truncated = bool(fetch(1))
+                return
+            batch = fetch(size)
+            if not batch:
+                return
+            arrays = self.arrays(batch)
+            self.rows += len(batch)
+            del batch
+            yield arrays
+
+    def __iter__(self):
+        for arrays in self.batches():
+            frame = self.to_frame(arrays)
+            if self.max_bytes is not None:
+                self.nbytes += int(frame.memory_usage(deep=True).sum())
+            yield frame
+
+    def build(self):
+        """Return one DataFrame with every row."""
+        if self.max_bytes is not None:
+            # the size of each batch is measured from its frame
+            frames = list(self)
+            if not frames:
+                return self.frame([])
+            if len(frames) == 1:
+                return frames[0]
+            return pd.concat(frames, ignore_index=True)
+        pieces = [[] for _ in self.columns]
+        for arrays in self.batches():
+            for piece, array in zip(pieces, arrays):
+                piece.append(array)
+        if not self.rows:
+            return self.frame([])
+        return self.to_frame([concat_arrays(piece) for piece in pieces])
+
+
+class ArrowFrameBuilder(FrameBuilder):
+    """A FrameBuilder whose DataFrames are backed by pyarrow arrays.
+
+    Batches come from cursor.record_batches() if it has that method, eg.
+    an AdbcResult, otherwise rows of the cursor are converted to Arrow
+    arrays, using the reflected column types, by export.ArrowConverter.
+    That takes about as long as building a FrameBuilder's frames, so only
+    results read through ADBC are built faster. build() converts all of
+    the batches to pandas at once, so the result isn't copied again by
+    pd.concat().
+    """
+
+    def __init__(self, cursor, types=None, batch_size=BATCH_ROWS,
+                 max_rows=None, max_bytes=None):
+        super(ArrowFrameBuilder, self).__init__(
+            cursor, types, batch_size, max_rows, max_bytes)
+        self.schema = None
+        self.converter = None
+
+    def converted_batches(self):
+        converter = self.converter = export.ArrowConverter(self.columns,
+                                                           self.types)
+        fetch = self.fetcher()
+        while True:
+            size = self.batch_size
+            if self.max_rows is not None:
+                # one row is enough to tell whether the result has more
+                size = max(1, min(size, self.max_rows - self.rows))
+            batch = fetch(size)
+            if not batch:
+                break
+            record = converter.batch(batch)
+            del batch
+            self.schema = record.schema
+            yield record
+        if self.schema is None:
+            self.schema = converter.empty_schema()
+
+    def conform(self, batch):
+        """Return batch with the reflected column types, where its
+        columns can be cast to them, eg. sqlite's dates are strings."""
+        if self.schema is None:
+            fields = []
+            for field, column, name in zip(batch.schema, batch.columns,
+                                           self.types):
+                typ = export.arrow_type(name)
+                if typ is not None and typ != field.type:
+                    try:
+                        column.cast(typ)
+                        field = field.with_type(typ)
+                    except (pa.ArrowException, TypeError, ValueError):
+                        pass
+                fields.append(field)
+            self.schema = pa.schema(fields)
+        if batch.schema.equals(self.schema):
+            return batch
+        return pa.RecordBatch.from_arrays(
+            [column.cast(field.type) for column, field
+             in zip(batch.columns, self.schema)], schema=self.schema)
+
+    def record_batches(self):
+        """Yield pyarrow RecordBatches of the result, up to the limits.
+        """
+        if hasattr(self.cursor, 'record_batches'):
+            source = (self.conform(batch) for batch
+                      in self.cursor.record_batches())
+        else:
+            source = self.converted_batches()
+        for batch in source:
+            if not batch.num_rows:
+                continue
+            if (self.max_rows is not None and self.rows >= self.max_rows) \
+                    or (self.max_bytes is not None and
+                        self.nbytes >= self.max_bytes):
+                self.truncated = True
+                return
+            if self.max_rows is not None and \
+                    self.rows + batch.num_rows > self.max_rows:
+                batch = batch.slice(0, self.max_rows - self.rows)
+                self.truncated = True
+            self.rows += batch.num_rows
+            self.nbytes += batch.nbytes
+            yield batch
+            if self.truncated:
+                return
+        if self.schema is None:  # an ADBC result with no rows
+            self.conform(pa.RecordBatch.from_pylist(
+                [], schema=self.cursor.schema))
+
+    def to_pandas(self, batches):
+        table = pa.Table.from_batches(batches, schema=self.schema)
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def __iter__(self):
+        for batch in self.record_batches():
+            yield self.to_pandas([batch])
+
+    def build(self):
+        """Return one DataFrame with every row."""
+        batches = list(self.record_batches())
+        return self.to_pandas(batches)
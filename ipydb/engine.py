@@ -7,11 +7,42 @@ install_aliases()
 
 from urllib import parse
 from configparser import ConfigParser, DuplicateSectionError
+import threading
 
+from future.utils import string_types
 import sqlalchemy as sa
 
 from ipydb import CONFIG_FILE
 
+# ~/.db-connections keys which configure the engine's connection pool,
+# mapped to a function which converts the value from a string.
+POOL_OPTIONS = {
+    'pool_size': int,
+    'max_overflow': int,
+    'pool_recycle': int,
+    'pool_timeout': int,
+    'pool_pre_ping': sa.util.asbool,
+}
+
+# ~/.db-connections keys which are set as attributes on every DB-API
+# cursor, for drivers which support them.
+CURSOR_OPTIONS = ('arraysize', 'prefetchrows')
+
+# connect_args whose values are dotted paths to python objects.
+IMPORTED_CONNECT_ARGS = ('cursorclass',)
+
+# Default performance settings for each drivername, these are
+# overridden by settings in ~/.db-connections.
+DRIVER_PROFILES = {
+    # use server-side cursors by default (does this work with myISAM?)
+    'mysql': {'connect_args': {'cursorclass': 'MySQLdb.cursors.SSCursor'}},
+}
+
+# Engines are shared between interactive queries and schema reflection
+# so that they share a connection pool. Keyed by engine_key(url).
+_engines = {}
+_engines_lock = threading.Lock()
+
 
 def getconfigparser():
     cp = ConfigParser()
@@ -34,7 +65,8 @@ def getconfigs():
 
 
 def get_nicknames():
-    return sorted(getconfigs().keys())
+    default, configs = getconfigs()
+    return sorted(configs.keys())
 
 
 def from_config(configname=None):
@@ -51,24 +83,136 @@ def from_config(configname=None):
             'Config name not found. Try one of {%s}' % (get_nicknames()))
     else:
         config = configs[configname]
-        connect_args = {}
+        options = engine_options(config)
+        connect_args = options.pop('connect_args', {})
         engine = from_url(make_connection_url(config),
-                          connect_args=connect_args)
+                          connect_args=connect_args, **options)
     return engine
 
 
-def from_url(url, connect_args={}):
-    """Connect to a database using an SqlAlchemy URL.
+def engine_options(config):
+    """Return keyword arguments for create_engine() found in config.
+
+    Recognised keys are:
+        pool_size, max_overflow, ...: see POOL_OPTIONS.
+        arraysize, prefetchrows: set on each DB-API cursor.
+        stream_results: fetch results using server side cursors.
+        execution_options.NAME: default for execution option NAME,
+            eg. execution_options.isolation_level = READ COMMITTED.
+            execution_options.compiled_cache sets the size of the
+            compiled statement cache.
+        connect_args.NAME: keyword argument NAME for the DB-API
+            driver's connect(), eg. connect_args.compress = true
+
+    Args:
+        config: dict-like object, a section from ~/.db-connections.
+    Returns:
+        dict of options, eg. {'pool_size': 5, 'connect_args': {...}}
+    """
+    options = {}
+    cursor_options = {}
+    execution_options = {}
+    connect_args = {}
+    for key, value in config.items():
+        if value is None or value == '':
+            continue
+        if key in POOL_OPTIONS:
+            options[key] = POOL_OPTIONS[key](value)
+        elif key in CURSOR_OPTIONS:
+            cursor_options[key] = int(value)
+        elif key == 'stream_results':
+            execution_options[key] = sa.util.asbool(value)
+        elif key.startswith('execution_options.'):
+            execution_options[key.split('.', 1)[1]] = config_value(value)
+        elif key.startswith('connect_args.'):
+            connect_args[key.split('.', 1)[1]] = config_value(value)
+    if cursor_options:
+        options['cursor_options'] = cursor_options
+    if execution_options:
+        options['execution_options'] = execution_options
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def config_value(value):
+    """Convert a string from ~/.db-connections to a bool, int or str."""
+    if value.lower() in ('true', 'false'):
+        return sa.util.asbool(value)
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def import_object(path):
+    """Import and return an object from its dotted path."""
+    modname, name = path.rsplit('.', 1)
+    module = __import__(modname, fromlist=[name])
+    return getattr(module, name)
+
+
+def engine_key(url):
+    """Return url as a string with its password masked."""
+    url = sa.engine.url.make_url(str(url))
+    if url.password:
+        url.password = 'xxx'
+    return str(url)
+
+
+def from_url(url, connect_args={}, **options):
+    """Return a shared engine for an SqlAlchemy URL.
+
+    Engines are cached by url (without password) so that all of ipydb
+    shares a single connection pool for each database. The cached engine
+    is replaced if the password, connect_args or options have changed.
 
     Args:
         url: An SqlAlchemy-style DB connection URL.
         connect_args: extra argument to be passed to the underlying
                       DB-API driver.
+        options: extra keyword arguments for create_engine(),
+                 see engine_options().
     Returns:
-        True if connection was successful.
+        An SqlAlchemy engine.
+    """
+    url = sa.engine.url.make_url(str(url))
+    key = engine_key(url)
+    settings = (str(url), repr(sorted(connect_args.items())),
+                repr(sorted(options.items())))
+    with _engines_lock:
+        cached = _engines.get(key)
+        if cached is not None and cached[0] == settings:
+            return cached[1]
+        engine = create_engine(url, connect_args=connect_args, **options)
+        _engines[key] = (settings, engine)
+    if cached is not None:
+        cached[1].dispose()
+    return engine
+
+
+def dispose_all():
+    """Close all pooled connections and forget all shared engines."""
+    with _engines_lock:
+        engines = [engine for settings, engine in _engines.values()]
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def create_engine(url, connect_args={}, **options):
+    """Create a new SqlAlchemy engine, with driver specific tweaks.
+
+    Prefer from_url(), which shares engines.
+
+    Args:
+        url: An SqlAlchemy-style DB connection URL.
+        connect_args: extra argument to be passed to the underlying
+                      DB-API driver, merged over DRIVER_PROFILES.
+        options: keyword arguments for sa.create_engine(), plus
+                 cursor_options: a dict of DB-API cursor attributes.
     """
-    url_string = url
-    url = sa.engine.url.make_url(str(url_string))
+    url = sa.engine.url.make_url(url)
     if url.drivername == 'oracle':
         # not sure why we need this horrible _cxmakedsn hack -
         # I think there's some weirdness
@@ -81,11 +225,27 @@ def from_url(url, connect_args={}):
                 return cx_Oracle._cxmakedsn(*args, **kw).replace(
                     'SID', 'SERVICE_NAME')
             cx_Oracle.makedsn = newmakedsn
-    elif url.drivername == 'mysql':
-        import MySQLdb.cursors
-        # use server-side cursors by default (does this work with myISAM?)
-        connect_args = {'cursorclass': MySQLdb.cursors.SSCursor}
-    engine = sa.engine.create_engine(url, connect_args=connect_args)
+    profile = DRIVER_PROFILES.get(url.drivername, {})
+    connect_args = dict(profile.get('connect_args', {}), **connect_args)
+    for name in IMPORTED_CONNECT_ARGS:
+        if isinstance(connect_args.get(name), string_types):
+            connect_args[name] = import_object(connect_args[name])
+    cursor_options = options.pop('cursor_options', None)
+    execution_options = dict(options.pop('execution_options', {}))
+    if isinstance(execution_options.get('compiled_cache'), int):
+        execution_options['compiled_cache'] = sa.util.LRUCache(
+            execution_options['compiled_cache'])
+    if execution_options:
+        options['execution_options'] = execution_options
+    engine = sa.engine.create_engine(url, connect_args=connect_args,
+                                     **options)
+    if cursor_options:
+        def set_cursor_options(conn, cursor, statement, parameters,
+                               context, executemany):
+            for name, value in cursor_options.items():
+                if hasattr(cursor, name):
+                    setattr(cursor, name, value)
+        sa.event.listen(engine, 'before_cursor_execute', set_cursor_options)
     return engine
 
 
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+"""
+Show the query plan for an SQL statement, and warn about plans which
+look expensive.
+
+Plans come from the dialect's own EXPLAIN:
+
+    sqlite: EXPLAIN QUERY PLAN
+    postgresql: EXPLAIN (FORMAT JSON)
+    mysql: EXPLAIN
+
+and are checked against ipydb's cached metadata for full table scans
+and for WHERE clause predicates on columns which aren't indexed.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+import json
+import re
+import time
+
+from future.utils import string_types
+import sqlparse
+from sqlparse import sql as S
+
+# full scans of tables estimated to have at least this many rows are
+# warned about. Tables without an estimate are always warned about.
+LARGE_TABLE_ROWS = 10000
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?([\w$]+)(?!.*\bINDEX\b)')
+# [table.]column <operator> in a WHERE clause
+PREDICATE = re.compile(
+    r'(?:([\w$]+)\.)?([\w$]+)\s*(=|<>|!=|<=|>=|<|>|\bnot\s+like\b|'
+    r'\blike\b|\bnot\s+in\b|\bin\b|\bbetween\b|\bis\b)', re.I)
+STRING = re.compile(r"'(?:''|[^'])*'")
+TABLE_REF = re.compile(r'\b(?:from|join|update|into)\s+([\w$.]+)'
+                       r'(?:\s+(?:as\s+)?([\w$]+))?', re.I)
+NOT_ALIASES = set('''where join inner left right full outer cross on using
+    group order limit having union set values natural straight_join
+    window offset fetch for returning'''.split())
+
+
+class ExplainError(Exception):
+    """Raised when a database's plans can't be explained."""
+
+
+class PlanNode(object):
+    """One step of a query plan."""
+
+    def __init__(self, label, table=None, full_scan=False, rows=None):
+        self.label = label
+        self.table = table
+        self.full_scan = full_scan
+        self.rows = rows
+        self.children = []
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            for node in child.walk():
+                yield node
+
+    def lines(self, depth=0):
+        """Return the plan below and including this node, one line per
+        node, indented to show the tree."""
+        prefix = '  ' * (depth - 1) + '-> ' if depth else ''
+        lines = [prefix + self.label]
+        for child in self.children:
+            lines.extend(child.lines(depth + 1))
+        return lines
+
+
+class Plan(object):
+    """A query plan: a list of root PlanNodes, plus any notes, eg. the
+    actual run time when the statement was analyzed."""
+
+    def __init__(self, roots=None, notes=None):
+        self.roots = roots or []
+        self.notes = notes or []
+
+    def nodes(self):
+        for root in self.roots:
+            for node in root.walk():
+                yield node
+
+    def lines(self):
+        lines = []
+        for root in self.roots:
+            lines.extend(root.lines())
+        return lines + self.notes
+
+
+def explain_sqlite(conn, query, analyze=False):
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + query).fetchall()
+    nodes = {0: PlanNode('QUERY PLAN')}
+    for row in rows:
+        node_id, parent, detail = row[0], row[1], row[-1]
+        match = SQLITE_SCAN.match(detail)
+        node = PlanNode(detail, table=match.group(1) if match else None,
+                        full_scan=bool(match))
+        nodes[node_id] = node
+        nodes.get(parent, nodes[0]).children.append(node)
+    plan = Plan(nodes[0].children)
+    if analyze:
+        plan.notes.append(run_in_savepoint(conn, query))
+    return plan
+
+
+def run_in_savepoint(conn, query):
+    """Run query on sqlite and roll back any changes it made.
+
+    pysqlite doesn't begin a transaction before DDL, so a DROP TABLE would
+    be committed as it ran, even inside conn.begin(). An explicit
+    SAVEPOINT starts one if need be.
+
+    Returns:
+        a note of how long query took, and the rows it returned or
+        changed.
+    """
+    # without a transaction SqlAlchemy would commit after DDL and DML
+    trans = None if conn.in_transaction() else conn.begin()
+    conn.execute('SAVEPOINT ipydb_analyze')
+    try:
+        start = time.time()
+        result = conn.execute(query)
+        nrows = len(result.fetchall()) if result.returns_rows \
+            else result.rowcount
+        return 'Actual: %.3f ms, %i rows' % (
+            (time.time() - start) * 1000, nrows)
+    finally:
+        conn.execute('ROLLBACK TO SAVEPOINT ipydb_analyze')
+        conn.execute('RELEASE SAVEPOINT ipydb_analyze')
+        if trans is not None:
+            trans.rollback()
+
+
+def postgres_node(data):
+    """Return a PlanNode for one node of a postgres JSON plan."""
+    label = data['Node Type']
+    if 'Relation Name' in data:
+        label += ' on %s' % data['Relation Name']
+        if data.get('Alias', data['Relation Name']) != data['Relation Name']:
+            label += ' %s' % data['Alias']
+    if 'Index Name' in data:
+        label += ' using %s' % data['Index Name']
+    label += ' (cost=%s..%s rows=%s)' % (
+        data.get('Startup Cost'), data.get('Total Cost'),
+        data.get('Plan Rows'))
+    if 'Actual Total Time' in data:
+        label += ' (actual time=%s..%s rows=%s loops=%s)' % (
+            data['Actual Startup Time'], data['Actual Total Time'],
+            data['Actual Rows'], data['Actual Loops'])
+    for key in ('Index Cond', 'Filter', 'Hash Cond', 'Join Filter'):
+        if key in data:
+            label += ' %s: %s' % (key, data[key])
+    node = PlanNode(label, table=data.get('Relation Name'),
+                    full_scan=data['Node Type'] == 'Seq Scan',
+                    rows=data.get('Plan Rows'))
+    for child in data.get('Plans', []):
+        node.children.append(postgres_node(child))
+    return node
+
+
+def explain_postgresql(conn, query, analyze=False):
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    data = conn.execute('EXPLAIN (%s) %s' % (options, query)).scalar()
+    if isinstance(data, string_types):
+        data = json.loads(data)
+    plan = Plan([postgres_node(data[0]['Plan'])])
+    for key in ('Planning Time', 'Execution Time'):
+        if key in data[0]:
+            plan.notes.append('%s: %s ms' % (key, data[0][key]))
+    return plan
+
+
+def explain_mysql(conn, query, analyze=False):
+    if analyze:
+        # MySQL 8.0.18+, the plan is already an indented tree
+        text = conn.execute('EXPLAIN ANALYZE ' + query).scalar()
+        return Plan([PlanNode(line) for line in text.splitlines()])
+    result = conn.execute('EXPLAIN ' + query)
+    keys = [k.lower() for k in result.keys()]
+    roots = []
+    for row in result:
+        row = dict(zip(keys, row))
+        label = '%s %s: %s access' % (row.get('select_type'),
+                                      row.get('table'), row.get('type'))
+        if row.get('key'):
+            label += ' using %s' % row['key']
+        label += ' (rows=%s)' % row.get('rows')
+        if row.get('extra'):
+            label += ' %s' % row['extra']
+        roots.append(PlanNode(label, table=row.get('table'),
+                              full_scan=row.get('type') == 'ALL',
+                              rows=row.get('rows')))
+    return Plan(roots)
+
+
+EXPLAINERS = {
+    'sqlite': explain_sqlite,
+    'postgresql': explain_postgresql,
+    'mysql': explain_mysql,
+}
+
+
+def explain(conn, query, analyze=False):
+    """Return the Plan for query.
+
+    Args:
+        conn: SqlAlchemy connection to explain query on.
+        query: SQL statement.
+        analyze: run the statement too, and include real timings. On
+                 sqlite any changes it makes are rolled back; elsewhere
+                 the caller should run it in a transaction and roll
+                 that back.
+    Raises:
+        ExplainError: if conn's dialect isn't supported.
+    """
+    query = query.strip().rstrip(';')
+    func = EXPLAINERS.get(conn.dialect.name)
+    if func is None:
+        raise ExplainError(
+            "%%explain doesn't support %s, only %s" % (
+                conn.dialect.name, ', '.join(sorted(EXPLAINERS))))
+    return func(conn, query, analyze)
+
+
+def table_aliases(query):
+    """Return {alias or table name: table name} for tables in query."""
+    aliases = {}
+    for match in TABLE_REF.finditer(query):
+        table = match.group(1).split('.')[-1]
+        aliases[table.lower()] = table
+        alias = match.group(2)
+        if alias and alias.lower() not in NOT_ALIASES:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def where_clauses(query):
+    """Return the text of each WHERE clause in query."""
+    clauses = []
+
+    def visit(token):
+        if isinstance(token, S.Where):
+            clauses.append(str(token))
+        if token.is_group:
+            for tok in token.tokens:
+                visit(tok)
+    for stmt in sqlparse.parse(sqlparse.format(query, strip_comments=True)):
+        visit(stmt)
+    return clauses
+
+
+def predicates(query):
+    """Return [(table alias or None, column, operator)] for comparisons
+    in WHERE clauses. Operators are lower case, eg. '=', 'like', 'in'."""
+    found = []
+    for clause in where_clauses(query):
+        clause = STRING.sub("''", clause)
+        for match in PREDICATE.finditer(clause):
+            qualifier, column, operator = match.groups()
+            if column.lower() in NOT_ALIASES or column.lower() in (
+                    'and', 'or', 'not', 'null') or column.isdigit():
+                continue
+            found.append((qualifier, column,
+                          ' '.join(operator.lower().split())))
+    return found
+
+
+def predicate_columns(query):
+    """Return [(table alias or None, column)] compared in WHERE clauses.
+    """
+    return [(qualifier, column)
+            for qualifier, column, _ in predicates(query)]
+
+
+def indexed_columns(db, table):
+    """Return the lower case names of the columns of a model.Table which
+    are in an index or its primary key."""
+    names = set(c.name.lower() for c in table.columns if c.primary_key)
+    for index in db.indexes(table.name):
+        names.update(c.name.lower() for c in index.columns)
+    return names
+
+
+def find_table(db, name):
+    for tablename in db.tables:
+        if tablename.lower() == name.lower():
+            return db.tables[tablename]
+    return None
+
+
+def warnings(plan, query, db):
+    """Return warnings about plan.
+
+    Args:
+        plan: a Plan for query.
+        query: the SQL statement.
+        db: model.Database with cached metadata for the database.
+    """
+    found = []
+    aliases = table_aliases(query)
+    for node in plan.nodes():
+        if node.full_scan and node.table and (
+                node.rows is None or node.rows >= LARGE_TABLE_ROWS):
+            found.append('Full scan of %s%s' % (
+                aliases.get(node.table.lower(), node.table),
+                ' (~%s rows)' % node.rows if node.rows is not None else ''))
+    tables = set(aliases.values())
+    seen = set()
+    for qualifier, column in predicate_columns(query):
+        if qualifier:
+            candidates = [aliases.get(qualifier.lower(), qualifier)]
+        else:
+            candidates = tables
+        for name in candidates:
+            table = find_table(db, name)
+            if table is None or column.lower() not in set(
+                    c.name.lower() for c in table.columns):
+                continue
+            key = (table.name, column.lower())
+            if key not in seen and \
+                    column.lower() not in indexed_columns(db, table):
+                seen.add(key)
+                found.append('No index on %s.%s, which is used in a '
+                             'WHERE clause' % (table.name, column))
+    return found
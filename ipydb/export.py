@@ -0,0 +1,626 @@
+# -*- coding: utf-8 -*-
+
+"""
+Write result sets to files, in a format chosen by the file's extension:
+
+    .csv: comma separated values (the default)
+    .tsv: tab separated values
+    .jsonl: JSON Lines, one object per row
+    .parquet: Apache Parquet (needs pyarrow)
+    .arrow: Arrow IPC file (needs pyarrow)
+    .feather: Feather v2, an lz4 compressed Arrow IPC file (needs pyarrow)
+
+Rows are read from the cursor and written in batches, so memory use
+depends on the batch size rather than on the size of the result. Typed
+formats take their column types from the reflected column types, then
+from the DB-API cursor description, then from the values in the first
+batch.
+
+More formats can be added with register().
+
+Files are compressed on a background thread when their name ends with
+.gz, .bz2, .xz or .zst (which needs zstandard), eg. out.csv.gz.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from future.standard_library import install_aliases
+install_aliases()
+
+import base64
+import bz2
+import collections
+import datetime as dt
+import decimal
+import io
+import itertools
+import json
+import lzma
+from queue import Queue
+import re
+import threading
+import zlib
+
+from ipydb.utils import CsvWriter
+
+# pyarrow as an extra requirement
+_has_pyarrow = False
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _has_pyarrow = True
+except ImportError:
+    pass
+
+# zstandard as an extra requirement
+_has_zstd = False
+try:
+    import zstandard
+    _has_zstd = True
+except ImportError:
+    pass
+
+# rows written at a time
+BATCH_ROWS = 10000
+# write buffer for output files
+FILE_BUFFER = 1024 * 1024
+# most digits in an Arrow decimal128
+MAX_DECIMAL_DIGITS = 38
+# FILE_BUFFER sized chunks waiting to be compressed, before writes block
+COMPRESS_QUEUE = 8
+
+# reflected column type -> type used by typed formats. Types which
+# aren't matched are taken from the values.
+SQL_TYPES = [
+    (re.compile(r'BOOL', re.I), 'boolean'),
+    (re.compile(r'^(?:UNSIGNED\s+)?(?:BIG|SMALL|TINY|MEDIUM)?'
+                r'(?:INT|INTEGER|SERIAL)\d*\b', re.I), 'integer'),
+    (re.compile(r'(?:NUMERIC|DECIMAL|NUMBER)\s*\(\s*(\d+)\s*'
+                r'(?:,\s*(\d+)\s*)?\)', re.I), 'decimal'),
+    (re.compile(r'FLOAT|DOUBLE|REAL', re.I), 'float'),
+    (re.compile(r'TIMESTAMP|DATETIME', re.I), 'datetime'),
+    (re.compile(r'DATE', re.I), 'date'),
+    (re.compile(r'TIME', re.I), 'time'),
+    (re.compile(r'BLOB|BINARY|BYTEA|RAW|IMAGE', re.I), 'binary'),
+    (re.compile(r'CHAR|TEXT|CLOB|STRING|UUID|JSON|XML|ENUM', re.I),
+     'string'),
+]
+
+
+class ExportError(Exception):
+    """Raised when a result can't be written in the requested format."""
+
+
+def sql_type(typename):
+    """Return the export type for a reflected column type, eg.
+    'integer' for 'BIGINT' or 'decimal(10,2)' for 'NUMERIC(10, 2)', or
+    None if it should be taken from the values."""
+    for regex, name in SQL_TYPES:
+        match = regex.search(typename or '')
+        if match:
+            if name == 'decimal':
+                precision, scale = match.group(1), match.group(2) or '0'
+                if scale == '0' and int(precision) <= 18:
+                    return 'integer'
+                return 'decimal(%s,%s)' % (precision, scale)
+            return name
+    return None
+
+
+def dbapi_type(type_code, dbapi):
+    """Return the export type for a cursor.description type_code, or
+    None. Only strings and binary are told apart: DB-API's NUMBER and
+    DATETIME cover several types each."""
+    if type_code is None or dbapi is None:
+        return None
+    for attr, name in (('STRING', 'string'), ('BINARY', 'binary')):
+        typeobj = getattr(dbapi, attr, None)
+        try:
+            if typeobj is not None and type_code == typeobj:
+                return name
+        except Exception:
+            pass
+    return None
+
+
+def json_default(value):
+    if isinstance(value, (dt.date, dt.time, dt.datetime)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    return str(value)  # Decimal, UUID, ...
+
+
+class Exporter(object):
+    """Writes a result set to a file, a batch of rows at a time.
+
+    Subclasses implement write_batch(), and set binary if they write
+    bytes rather than text. Options which a format doesn't use are
+    ignored, so that callers can pass eg. CSV options to any format.
+    """
+
+    binary = False
+    requires = None  # package needed to write the format
+    extra = None  # ipydb's extra requirement which installs it
+    available = True  # False if requires can't be imported
+
+    def __init__(self, f, columns, types=None, **options):
+        """Constructor.
+
+        Args:
+            f: file to write to, opened in binary mode if binary is set,
+               else in text mode.
+            columns: column names.
+            types: an export type for each column (see sql_type()),
+                   or None where it isn't known.
+        """
+        self.f = f
+        self.columns = columns
+        self.types = types or [None] * len(columns)
+
+    def write_batch(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        """Finish the file, after the last batch."""
+
+
+class CsvExporter(Exporter):
+
+    delimiter = ','
+
+    def __init__(self, f, columns, types=None, quoting='minimal', null='',
+                 **options):
+        super(CsvExporter, self).__init__(f, columns, types)
+        self.writer = CsvWriter(f, delimiter=self.delimiter,
+                                quoting=quoting, null=null)
+        self.writer.writerow(columns)
+
+    def write_batch(self, rows):
+        self.writer.writerows(rows)
+
+
+class TsvExporter(CsvExporter):
+
+    delimiter = '\t'
+
+
+class JsonLinesExporter(Exporter):
+
+    def write_batch(self, rows):
+        columns = self.columns
+        self.f.write(u''.join(
+            json.dumps(dict(zip(columns, row)), default=json_default,
+                       ensure_ascii=False) + u'\n' for row in rows))
+
+
+def arrow_type(name):
+    """Return the pyarrow type for an export type, or None."""
+    if name is None:
+        return None
+    if name.startswith('decimal'):
+        precision, scale = [int(n) for n in name[8:-1].split(',')]
+        if precision > MAX_DECIMAL_DIGITS:
+            return pa.string()
+        return pa.decimal128(precision, scale)
+    return {
+        'boolean': pa.bool_(),
+        'integer': pa.int64(),
+        'float': pa.float64(),
+        'datetime': pa.timestamp('us'),
+        'date': pa.date32(),
+        'time': pa.time64('us'),
+        'binary': pa.binary(),
+        'string': pa.string(),
+    }[name]
+
+
+def decimal_value(value, scale):
+    """Return a float as a Decimal with scale digits after the point."""
+    context = decimal.Context(prec=MAX_DECIMAL_DIGITS)
+    return context.create_decimal(repr(value)).quantize(
+        decimal.Decimal(1).scaleb(-scale), context=context)
+
+
+def to_array(values, typ):
+    """Return values as a pyarrow array of typ, converting them if the
+    driver returned another type, eg. sqlite's dates are strings."""
+    if pa.types.is_decimal(typ):
+        # eg. sqlite returns NUMERIC(10, 2) values as floats
+        values = [decimal_value(v, typ.scale) if isinstance(v, float)
+                  else v for v in values]
+    try:
+        return pa.array(values, type=typ)
+    except (pa.ArrowException, TypeError, ValueError):
+        return pa.array(values).cast(typ)
+
+
+def lenient_array(values, typ):
+    """to_array(), for values which can't all be converted to typ.
+
+    Values are converted to strings for string columns, anything else
+    which can't be converted is replaced with null.
+
+    Returns:
+        tuple (array, number of values replaced with null).
+    """
+    if pa.types.is_string(typ):
+        return pa.array([None if v is None else str(v) for v in values],
+                        type=typ), 0
+    arrays = []
+    lost = 0
+    for value in values:
+        try:
+            arrays.append(to_array([value], typ))
+        except (pa.ArrowException, TypeError, ValueError, ArithmeticError):
+            arrays.append(pa.nulls(1, typ))
+            lost += 1
+    return pa.concat_arrays(arrays), lost
+
+
+class ArrowConverter(object):
+    """Converts batches of rows to pyarrow RecordBatches.
+
+    The schema is fixed by the first batch: each column gets its
+    declared type if the first batch's values can be converted to it,
+    otherwise the type pyarrow infers from them. Values in later batches
+    which can't be converted to their column's type are replaced with
+    null, and counted in lost, rather than failing part way through a
+    file.
+    """
+
+    def __init__(self, columns, types=None):
+        self.columns = list(columns)
+        self.types = types or [None] * len(self.columns)
+        self.schema = None
+        self.lost = collections.OrderedDict()  # column -> values nulled
+
+    def first_arrays(self, values):
+        """Return arrays for the first batch, using the declared type of
+        each column if its values can be converted to it."""
+        arrays = []
+        for column, name in zip(values, self.types):
+            typ = arrow_type(name)
+            array = None
+            if typ is not None:
+                try:
+                    array = to_array(column, typ)
+                except (pa.ArrowException, TypeError, ValueError,
+                        ArithmeticError):
+                    pass
+            if array is None:
+                try:
+                    array = pa.array(column)
+                except (pa.ArrowException, TypeError, ValueError):
+                    # mixed types, eg. in a sqlite column
+                    array = pa.array([None if v is None else str(v)
+                                      for v in column])
+                if pa.types.is_null(array.type):
+                    array = array.cast(pa.string())
+            arrays.append(array)
+        return arrays
+
+    def batch(self, rows):
+        """Return a RecordBatch for a non-empty list of rows."""
+        values = [list(column) for column in zip(*rows)]
+        if self.schema is None:
+            arrays = self.first_arrays(values)
+            self.schema = pa.schema([
+                (name, array.type)
+                for name, array in zip(self.columns, arrays)])
+            return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        arrays = []
+        for column, field in zip(values, self.schema):
+            try:
+                array = to_array(column, field.type)
+            except (pa.ArrowException, TypeError, ValueError,
+                    ArithmeticError):
+                array, lost = lenient_array(column, field.type)
+                if lost:
+                    self.lost[field.name] = \
+                        self.lost.get(field.name, 0) + lost
+            arrays.append(array)
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def lost_message(self):
+        """Return a warning about the values in lost, or None."""
+        if not self.lost:
+            return None
+        return '%s written as nulls, as they didn\'t match the type of ' \
+            'the first rows' % ', '.join(
+                '%i %s values' % (count, name)
+                for name, count in self.lost.items())
+
+    def empty_schema(self):
+        """Return the schema for a result with no rows."""
+        return pa.schema([
+            (name, arrow_type(typ) or pa.string())
+            for name, typ in zip(self.columns, self.types)])
+
+
+class ArrowExporter(Exporter):
+    """Writes an Arrow IPC file. The schema is fixed by the first batch.
+    """
+
+    binary = True
+    requires = 'pyarrow'
+    extra = 'arrow'
+    available = _has_pyarrow
+    compression = None
+
+    def __init__(self, f, columns, types=None, **options):
+        super(ArrowExporter, self).__init__(f, columns, types)
+        self.converter = ArrowConverter(self.columns, self.types)
+        self.schema = None
+        self.writer = None
+
+    def write_batch(self, rows):
+        batch = self.converter.batch(rows)
+        if self.writer is None:
+            self.schema = batch.schema
+            self.writer = self.open_writer()
+        self.write(batch)
+
+    def open_writer(self):
+        options = None
+        if self.compression and pa.Codec.is_available(self.compression):
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        return pa.ipc.new_file(self.f, self.schema, options=options)
+
+    def write(self, batch):
+        self.writer.write_batch(batch)
+
+    def close(self):
+        if self.writer is None:  # no rows
+            self.schema = self.converter.empty_schema()
+            self.writer = self.open_writer()
+        self.writer.close()
+        message = self.converter.lost_message()
+        if message:
+            raise ExportError('Warning: %s' % message)
+
+
+class FeatherExporter(ArrowExporter):
+
+    compression = 'lz4'
+
+
+class ParquetExporter(ArrowExporter):
+
+    def open_writer(self):
+        return pq.ParquetWriter(self.f, self.schema, compression='snappy')
+
+    def write(self, batch):
+        self.writer.write_table(pa.Table.from_batches([batch]))
+
+
+# format name -> Exporter class
+FORMATS = {}
+# file extension -> format name
+EXTENSIONS = {}
+
+
+def register(name, exporter, extensions=()):
+    """Add an export format.
+
+    Args:
+        name: format name, eg. 'parquet'.
+        exporter: Exporter subclass.
+        extensions: file extensions which select the format, eg.
+                    ['.parquet', '.pq'].
+    """
+    FORMATS[name] = exporter
+    for extension in extensions:
+        EXTENSIONS[extension.lower()] = name
+
+
+register('csv', CsvExporter, ['.csv'])
+register('tsv', TsvExporter, ['.tsv', '.tab'])
+register('jsonl', JsonLinesExporter, ['.jsonl', '.ndjson'])
+register('parquet', ParquetExporter, ['.parquet', '.pq'])
+register('arrow', ArrowExporter, ['.arrow', '.ipc'])
+register('feather', FeatherExporter, ['.feather'])
+
+
+def gzip_compressor(level):
+    # wbits=31: a gzip header and trailer around the deflate stream
+    return zlib.compressobj(6 if level is None else level, zlib.DEFLATED,
+                            31)
+
+
+def bz2_compressor(level):
+    return bz2.BZ2Compressor(9 if level is None else level)
+
+
+def xz_compressor(level):
+    return lzma.LZMACompressor(preset=level)
+
+
+def zstd_compressor(level):
+    if not _has_zstd:
+        raise ExportError("Writing .zst files needs zstandard. Please use "
+                          "`pip install zstandard` to add support for it.")
+    return zstandard.ZstdCompressor(
+        level=3 if level is None else level).compressobj()
+
+
+# file extension -> function(level) returning an object with
+# compress(bytes) and flush() methods, like zlib's
+COMPRESSORS = {
+    '.gz': gzip_compressor,
+    '.bz2': bz2_compressor,
+    '.xz': xz_compressor,
+    '.zst': zstd_compressor,
+}
+# file extension -> (lowest, highest) compression level
+COMPRESS_LEVELS = {
+    '.gz': (0, 9),
+    '.bz2': (1, 9),
+    '.xz': (0, 9),
+    '.zst': (1, 22),
+}
+
+
+def compression_for(path):
+    """Return the compressed file extension path ends with, or None."""
+    for extension in COMPRESSORS:
+        if path.lower().endswith(extension):
+            return extension
+    return None
+
+
+class CompressedWriter(io.RawIOBase):
+    """A binary file which compresses what is written to it, on a
+    background thread, and writes that to another file.
+
+    Writes are queued, so compression overlaps with whatever produces
+    the data, eg. fetching rows. The queue is bounded: writes block
+    while it is full.
+    """
+
+    def __init__(self, f, compressor, queue_size=COMPRESS_QUEUE):
+        """Constructor.
+
+        Args:
+            f: binary file to write compressed data to, it is closed when
+               this is closed.
+            compressor: object with compress(bytes) and flush() methods.
+            queue_size: number of writes to queue.
+        """
+        super(CompressedWriter, self).__init__()
+        self.f = f
+        self.compressor = compressor
+        self.queue = Queue(maxsize=queue_size)
+        self.error = None
+        self._thread = threading.Thread(target=self._compress)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _compress(self):
+        """Compress queued data, runs in the background thread."""
+        while True:
+            data = self.queue.get()
+            if self.error is not None:
+                pass  # keep draining the queue so writers don't block
+            elif data is None:
+                try:
+                    self.f.write(self.compressor.flush())
+                except Exception as e:
+                    self.error = e
+            else:
+                try:
+                    self.f.write(self.compressor.compress(data))
+                except Exception as e:
+                    self.error = e
+            if data is None:
+                return
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.check()
+        data = bytes(data)
+        self.queue.put(data)
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            super(CompressedWriter, self).close()
+            self.queue.put(None)
+            self._thread.join()
+            self.check()
+        finally:
+            self.f.close()
+
+
+def format_for(path):
+    """Return the name of the format for path's extension, ignoring
+    any compressed file extension, or None."""
+    path = path.lower()
+    compression = compression_for(path)
+    if compression:
+        path = path[:-len(compression)]
+    for extension in sorted(EXTENSIONS, key=len, reverse=True):
+        if path.endswith(extension):
+            return EXTENSIONS[extension]
+    return None
+
+
+def batches(cursor, size):
+    rows = iter(cursor)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def open_output(path, binary, compresslevel=None):
+    """Open path for writing, compressed if its extension is in
+    COMPRESSORS.
+
+    Raises:
+        ExportError: if compresslevel is out of range for the compressor.
+    """
+    compression = compression_for(path)
+    if compression is not None and compresslevel is not None:
+        lowest, highest = COMPRESS_LEVELS[compression]
+        if not lowest <= compresslevel <= highest:
+            raise ExportError(
+                'Compression level for %s files must be from %i to %i, '
+                'not %i' % (compression, lowest, highest, compresslevel))
+    if compression is None:
+        if binary:
+            return io.open(path, 'wb', buffering=FILE_BUFFER)
+        return io.open(path, 'w', newline='', encoding='utf-8',
+                       buffering=FILE_BUFFER)
+    compressor = COMPRESSORS[compression](compresslevel)
+    f = io.BufferedWriter(CompressedWriter(io.open(path, 'wb'), compressor),
+                          buffer_size=FILE_BUFFER)
+    if binary:
+        return f
+    return io.TextIOWrapper(f, encoding='utf-8', newline='')
+
+
+def export(cursor, path, fmt=None, types=None, batch_size=BATCH_ROWS,
+           compresslevel=None, **options):
+    """Write a result set to path.
+
+    Args:
+        cursor: iterable of rows with a keys() method, eg. a ResultProxy.
+        path: file to write.
+        fmt: format name, default: from path's extension, or csv.
+        types: export type of each column, see sql_type().
+        batch_size: number of rows to read and write at a time.
+        compresslevel: for compressed files, default: the compressor's
+                       default (6 for gzip and xz, 9 for bz2, 3 for zstd).
+        options: passed to the Exporter, eg. quoting='all' for CSV.
+    Raises:
+        ExportError: if fmt isn't known or can't be written, or, once the
+                     file has been written, if a typed format had to
+                     write values which didn't fit their column's type
+                     as nulls.
+    """
+    fmt = fmt or format_for(path) or 'csv'
+    if fmt not in FORMATS:
+        raise ExportError('Unknown export format: %s, try one of: %s' % (
+            fmt, ', '.join(sorted(FORMATS))))
+    exporter_class = FORMATS[fmt]
+    if not exporter_class.available:
+        raise ExportError(
+            "Writing %s files needs %s. Please use `pip install "
+            "'ipydb[%s]'` to add support for it." % (
+                fmt, exporter_class.requires, exporter_class.extra))
+    columns = list(cursor.keys())
+    with open_output(path, exporter_class.binary, compresslevel) as f:
+        exporter = exporter_class(f, columns, types, **options)
+        for batch in batches(cursor, batch_size):
+            exporter.write_batch(batch)
+        exporter.close()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+"""
+Run one SQL statement against many databases at once.
+
+Databases are chosen by globbing over the connection nicknames in
+~/.db-connections. Rows are streamed back from all of them into a
+single result set, with an extra _source column holding the nickname
+each row came from.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+from future.standard_library import install_aliases
+install_aliases()
+
+import fnmatch
+from multiprocessing.pool import ThreadPool
+from queue import Queue, Full
+import time
+
+from ipydb import engine, trace
+from ipydb.asciitable import Row, row_class
+
+SOURCE_COLUMN = '_source'
+
+
+def matching_nicknames(patterns):
+    """Return the sorted nicknames which match any of patterns.
+
+    Args:
+        patterns: comma separated globs, eg. 'shard*,reporting'.
+    """
+    nicknames = engine.get_nicknames()
+    matches = set()
+    for pattern in patterns.split(','):
+        matches.update(fnmatch.filter(nicknames, pattern.strip()))
+    return sorted(matches)
+
+
+class SourceStats(object):
+    """Latency, row count and error for one database."""
+
+    def __init__(self, nickname):
+        self.nickname = nickname
+        self.seconds = None
+        self.rows = 0
+        self.rowcount = None
+        self.error = None
+
+
+class FanOutResult(object):
+    """Cursor-like result of running a statement on many databases.
+
+    Iterating yields rows as they arrive from any database, with the
+    source nickname as their first value. After iteration finishes,
+    sources holds a SourceStats for each database.
+
+    Usage:
+        result = FanOutResult(['shard1', 'shard2'], 'select ...')
+        for row in result:
+            print(row)
+        print(result.summary())
+    """
+
+    def __init__(self, nicknames, query, params=None, multiparams=None,
+                 workers=8, buffer_rows=10000):
+        """Constructor, starts running query straight away.
+
+        Args:
+            nicknames: connection nicknames from ~/.db-connections.
+            query: SQL statement to run on each database.
+            params: dictionary of bind parameters.
+            multiparams: collection of dictionaries of bind parameters.
+            workers: number of databases to query at once.
+            buffer_rows: maximum rows to buffer before waiting for them
+                         to be consumed.
+        """
+        self.nicknames = list(nicknames)
+        self.query = query
+        self.params = params or {}
+        self.multiparams = multiparams or []
+        self.sources = dict((n, SourceStats(n)) for n in self.nicknames)
+        self.headings = None
+        self.returns_rows = False
+        self.closed = False
+        self._row_class = Row
+        self._queue = Queue(maxsize=buffer_rows)
+        self._pending = len(self.nicknames)
+        self._buffer = []
+        self._pool = ThreadPool(max(1, min(workers, len(self.nicknames))))
+        for nickname in self.nicknames:
+            self._pool.apply_async(self.run_one, (nickname,))
+        self._pool.close()
+
+    def put(self, item):
+        """Queue item for the consumer, unless the result was closed."""
+        while not self.closed:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                pass
+        return False
+
+    def run_one(self, nickname):
+        """Run the query on one database, runs in a worker thread."""
+        start = time.time()
+        stats = self.sources[nickname]
+        try:
+            eng = engine.from_config(nickname)
+            with eng.connect() as conn, trace.subsystem('fanout'):
+                result = conn.execute(self.query, *self.multiparams,
+                                      **self.params)
+                if result.returns_rows:
+                    if self.put(('keys', nickname, list(result.keys()))):
+                        for row in result:
+                            if not self.put(('row', nickname, tuple(row))):
+                                break
+                else:
+                    stats.rowcount = result.rowcount
+        except Exception as e:
+            stats.error = str(e).strip().split('\n')[0]
+        stats.seconds = time.time() - start
+        self.put(('done', nickname, None))
+
+    def _next_item(self):
+        """Return the next queued item, or None when all are done."""
+        while self._pending:
+            kind, nickname, value = self._queue.get()
+            stats = self.sources[nickname]
+            if kind == 'done':
+                self._pending -= 1
+            elif kind == 'keys':
+                if self.headings is None:
+                    self.headings = [SOURCE_COLUMN] + value
+                    self.returns_rows = True
+                    self._row_class = row_class(self.headings)
+                elif [SOURCE_COLUMN] + value != self.headings:
+                    stats.error = 'columns differ: %s' % ', '.join(value)
+            elif stats.error is None:
+                stats.rows += 1
+                return self._row_class((nickname,) + value)
+        return None
+
+    def keys(self):
+        """Return column headings, waiting for the first result if need be.
+        """
+        while self.headings is None and self._pending:
+            row = self._next_item()
+            if row is not None:
+                self._buffer.append(row)
+        return self.headings or [SOURCE_COLUMN]
+
+    @property
+    def rowcount(self):
+        """Total rows affected by DML, across all databases."""
+        return sum(s.rowcount or 0 for s in self.sources.values())
+
+    def __iter__(self):
+        try:
+            while self._buffer:
+                yield self._buffer.pop(0)
+            while True:
+                row = self._next_item()
+                if row is None:
+                    break
+                yield row
+        finally:
+            if self._pending:
+                self.close()
+            else:
+                self._pool.join()
+
+    def fetchall(self):
+        return list(self)
+
+    def close(self):
+        """Stop streaming rows, statements which are running finish in
+        the background."""
+        self.closed = True
+
+    def summary(self):
+        """Return a table of latency, rows and errors for each database.
+        """
+        lines = []
+        failed = 0
+        for nickname in self.nicknames:
+            stats = self.sources[nickname]
+            if stats.seconds is None:
+                status = 'cancelled'
+            elif stats.error:
+                failed += 1
+                status = 'FAILED: %s' % stats.error
+            elif stats.rowcount is not None:
+                status = '%i row%s affected' % (
+                    stats.rowcount, 's' if stats.rowcount != 1 else '')
+            else:
+                status = '%i row%s' % (stats.rows,
+                                       's' if stats.rows != 1 else '')
+            seconds = '' if stats.seconds is None else \
+                '%.3fs' % stats.seconds
+            lines.append('%-20s %9s  %s' % (nickname, seconds, status))
+        lines.append('%i of %i databases failed' % (failed,
+                                                    len(self.nicknames)))
+        return '\n'.join(lines)
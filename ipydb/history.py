@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+
+"""
+A persistent history of the statements run with ipydb, with timings.
+
+Statements are saved to an sqlite database in the ipydb directory of
+the IPython profile. Writes happen on a background thread, so saving
+history never slows down running a statement.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+from future.standard_library import install_aliases
+install_aliases()
+
+import datetime as dt
+import hashlib
+import logging
+import os
+from queue import Queue, Empty, Full
+import threading
+import time
+
+import sqlalchemy as sa
+try:
+    from IPython.paths import locate_profile
+except ImportError:
+    # IPython 3 support
+    from IPython.utils.path import locate_profile
+
+from ipydb import trace
+from ipydb.utils import normalize_sql, parameterize_sql
+
+log = logging.getLogger(__name__)
+
+HISTORY_FILE = 'history.sqlite'
+# statements waiting to be written, further statements are dropped
+MAX_QUEUED = 10000
+# statements kept, older ones are deleted as new ones are saved
+MAX_ROWS = 100000
+
+metadata = sa.MetaData()
+history_table = sa.Table(
+    'query_history', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('started', sa.DateTime, index=True),
+    sa.Column('connection', sa.String, index=True),
+    sa.Column('fingerprint', sa.String(16), index=True),
+    sa.Column('statement', sa.Text),
+    sa.Column('execute_ms', sa.Float),
+    sa.Column('fetch_ms', sa.Float),
+    sa.Column('render_ms', sa.Float),
+    sa.Column('rows', sa.Integer),
+    sa.Column('cached', sa.Boolean, default=False),
+    sa.Column('error', sa.Text, nullable=True),
+)
+
+
+def fingerprint(sql):
+    """Return a short hash of sql, ignoring formatting and literals."""
+    template = parameterize_sql(sql).encode('utf-8')
+    return hashlib.sha1(template).hexdigest()[:16]
+
+
+def history_path():
+    path = os.path.join(locate_profile(), 'ipydb')
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return os.path.join(path, HISTORY_FILE)
+
+
+def format_ms(ms):
+    """Format a duration in milliseconds, eg. 120ms or 3.4s."""
+    if ms < 1000:
+        return '%ims' % round(ms)
+    return '%.1fs' % (ms / 1000.0)
+
+
+def format_count(n):
+    """Format a row count, eg. 950, 3.4k or 1.2M."""
+    if n < 1000:
+        return '%i' % n
+    if n < 1000000:
+        return '%.1fk' % (n / 1000.0)
+    return '%.1fM' % (n / 1000000.0)
+
+
+def percentile(values, pct):
+    """Return the pct percentile of sorted values (nearest rank)."""
+    if not values:
+        return None
+    # rounding halves up, as QueryHistory.stats() does in SQL
+    return values[int(pct / 100.0 * (len(values) - 1) + 0.5)]
+
+
+class HistoryEntry(object):
+    """Timings for one statement, filled in as it runs."""
+
+    def __init__(self, connection, statement):
+        self.started = dt.datetime.now()
+        self.connection = connection
+        self.statement = statement
+        self.execute_ms = 0.0
+        self.fetch_ms = 0.0
+        self.render_ms = 0.0
+        self.rows = None
+        self.fetched = False
+        self.cached = False
+        self.error = None
+
+    def as_row(self):
+        return {
+            'started': self.started,
+            'connection': self.connection,
+            'fingerprint': fingerprint(self.statement),
+            'statement': normalize_sql(self.statement),
+            'execute_ms': self.execute_ms,
+            'fetch_ms': self.fetch_ms,
+            'render_ms': self.render_ms,
+            'rows': self.rows,
+            'cached': self.cached,
+            'error': self.error,
+        }
+
+    def summary(self):
+        """Return a one line summary of where the time went, eg.
+        exec 120ms \u00b7 fetch 3.4s/1.2M rows \u00b7 render 800ms"""
+        rows = self.rows or 0
+        plural = 's' if rows != 1 else ''
+        bits = ['exec %s' % format_ms(self.execute_ms)]
+        if self.error:
+            bits.append('failed')
+        elif self.fetched:
+            bits.append('%s %s/%s row%s' % (
+                'cached' if self.cached else 'fetch',
+                format_ms(self.fetch_ms), format_count(rows), plural))
+            bits.append('render %s' % format_ms(self.render_ms))
+        elif self.rows is not None:
+            bits.append('%s row%s affected' % (format_count(rows), plural))
+        return u' \u00b7 '.join(bits)
+
+
+class TimedResult(object):
+    """Wraps a result set, timing how long its rows take to fetch, and
+    how long the consumer spends on them (ie. rendering).
+
+    The entry is passed to on_done once the rows have all been read, or
+    when finish() is called. Set defer_finish if the consumer still has
+    work to do after reading the last row, then call stop() when that
+    work is done and finish() when the entry should be reported.
+    """
+
+    def __init__(self, result, entry, on_done):
+        self.result = result
+        self.entry = entry
+        self.on_done = on_done
+        self.defer_finish = False
+        self.done = False
+        self.started = None
+        self.stopped = False
+        self.fetch = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.result, name)
+
+    def keys(self):
+        return self.result.keys()
+
+    def __iter__(self):
+        self.started = time.time()
+        self.entry.rows = 0
+        self.entry.fetched = True
+        it = iter(self.result)
+        try:
+            while True:
+                before = time.time()
+                try:
+                    row = next(it)
+                except StopIteration:
+                    break
+                finally:
+                    self.fetch += time.time() - before
+                self.entry.rows += 1
+                yield row
+        finally:
+            if not self.defer_finish:
+                self.finish()
+
+    def fetchmany(self, size=None):
+        if self.started is None:
+            self.started = time.time()
+            self.entry.rows = 0
+            self.entry.fetched = True
+        before = time.time()
+        if size is None:
+            rows = self.result.fetchmany()
+        else:
+            rows = self.result.fetchmany(size)
+        self.fetch += time.time() - before
+        self.entry.rows += len(rows)
+        if not rows and not self.defer_finish:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        return list(self)
+
+    def stop(self):
+        """Stop timing, time since the last row was read is rendering."""
+        if self.stopped or self.started is None:
+            return
+        self.stopped = True
+        self.entry.fetch_ms = self.fetch * 1000
+        self.entry.render_ms = \
+            (time.time() - self.started - self.fetch) * 1000
+
+    def finish(self):
+        if self.done:
+            return
+        self.done = True
+        self.stop()
+        self.on_done(self.entry)
+
+
+class QueryHistory(object):
+    """Saves HistoryEntrys in a background thread, and queries them.
+
+    Usage:
+        history = QueryHistory()
+        history.record(entry)
+        for row in history.slowest():
+            ...
+    """
+
+    def __init__(self, path=None, max_rows=MAX_ROWS):
+        """Constructor.
+
+        Args:
+            path: sqlite file to store history in, default: history.sqlite
+                  in the ipydb directory of the IPython profile.
+            max_rows: most statements to keep, or None to keep them all.
+        """
+        self.path = path
+        self.max_rows = max_rows
+        self.engine = None
+        self.queue = Queue(maxsize=MAX_QUEUED)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get_engine(self):
+        if self.engine is None:
+            from ipydb.engine import from_url
+            path = self.path or history_path()
+            self.engine = from_url('sqlite:///%s' % path)
+            trace.label_engine(self.engine, 'history')
+            metadata.create_all(self.engine)
+        return self.engine
+
+    def record(self, entry):
+        """Queue entry to be saved, without blocking. Statements beyond
+        the newest max_rows are deleted when it is."""
+        try:
+            self.queue.put_nowait(entry)
+        except Full:
+            self.dropped += 1
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _write(self):
+        """Save queued entries, runs in the writer thread."""
+        while True:
+            entries = [self.queue.get()]
+            while True:
+                try:
+                    entries.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            try:
+                with self.get_engine().begin() as conn:
+                    conn.execute(history_table.insert(),
+                                 [e.as_row() for e in entries])
+                    if self.max_rows is not None:
+                        self.prune(conn)
+            except Exception:
+                log.warning('Failed to save query history', exc_info=True)
+            finally:
+                for entry in entries:
+                    self.queue.task_done()
+
+    def prune(self, conn):
+        """Delete all but the newest max_rows statements."""
+        last_id = sa.select([sa.func.max(history_table.c.id)]).as_scalar()
+        conn.execute(history_table.delete().where(
+            history_table.c.id <= last_id - self.max_rows))
+
+    def flush(self):
+        """Wait for queued entries to be saved."""
+        self.queue.join()
+
+    def filtered(self, query, connection=None, since=None):
+        """Return query, limited to the history of connection since the
+        datetime since."""
+        if connection:
+            query = query.where(history_table.c.connection == connection)
+        if since:
+            query = query.where(history_table.c.started >= since)
+        return query
+
+    def select(self, connection=None, since=None, limit=None):
+        """Return history rows, most recent first."""
+        self.flush()
+        query = self.filtered(
+            history_table.select().order_by(history_table.c.id.desc()),
+            connection, since)
+        if limit is not None:
+            query = query.limit(limit)
+        return self.get_engine().execute(query).fetchall()
+
+    def recent(self, limit=20, connection=None, since=None):
+        """Return the most recently run statements."""
+        return self.select(connection, since, limit)
+
+    def stats(self, connection=None, since=None):
+        """Return latency statistics for each distinct statement.
+
+        The rows are grouped by the database, with percentile()'s nearest
+        rank found by a window function, so only one row per statement is
+        read.
+
+        Returns:
+            list of dicts with keys: fingerprint, statement, count,
+            errors, total_ms, p50_ms, p95_ms, max_ms, last_run.
+        """
+        self.flush()
+        h = history_table
+        fp = h.c.fingerprint
+        latency = (sa.func.coalesce(h.c.execute_ms, 0) +
+                   sa.func.coalesce(h.c.fetch_ms, 0))
+        # successful runs which went to the database
+        ranked = self.filtered(sa.select([
+            fp, latency.label('latency'),
+            (sa.func.row_number().over(partition_by=fp, order_by=latency) -
+             1).label('rank'),
+            sa.func.count().over(partition_by=fp).label('n'),
+        ]).where(h.c.error.is_(None)).where(
+            sa.func.coalesce(h.c.cached, False) == False),  # noqa: E712
+            connection, since).alias('ranked')
+
+        def nearest(pct):
+            index = sa.cast(pct / 100.0 * (ranked.c.n - 1) + 0.5,
+                            sa.Integer)
+            return sa.func.max(sa.case([(ranked.c.rank == index,
+                                         ranked.c.latency)]))
+        latencies = sa.select([
+            ranked.c.fingerprint,
+            sa.func.sum(ranked.c.latency).label('total_ms'),
+            nearest(50).label('p50_ms'),
+            nearest(95).label('p95_ms'),
+            sa.func.max(ranked.c.latency).label('max_ms'),
+        ]).group_by(ranked.c.fingerprint).alias('latencies')
+        counts = self.filtered(sa.select([
+            fp, sa.func.count().label('count'),
+            sa.func.count(h.c.error).label('errors'),
+            sa.func.max(h.c.id).label('last_id'),
+        ]), connection, since).group_by(fp).alias('counts')
+        query = sa.select([
+            counts.c.fingerprint, h.c.statement, counts.c.count,
+            counts.c.errors, latencies.c.total_ms, latencies.c.p50_ms,
+            latencies.c.p95_ms, latencies.c.max_ms,
+            h.c.started.label('last_run'),
+        ]).select_from(counts.join(h, h.c.id == counts.c.last_id).outerjoin(
+            latencies, latencies.c.fingerprint == counts.c.fingerprint))
+        stats = []
+        for row in self.get_engine().execute(query):
+            stat = dict(row.items())
+            stat['total_ms'] = stat['total_ms'] or 0
+            stats.append(stat)
+        return stats
+
+    def slowest(self, limit=20, connection=None, since=None):
+        """Return stats() for the statements with the highest p95."""
+        stats = self.stats(connection, since)
+        stats.sort(key=lambda s: s['p95_ms'] or 0, reverse=True)
+        return stats[:limit]
+
+    def most_frequent(self, limit=20, connection=None, since=None):
+        """Return stats() for the most often run statements."""
+        stats = self.stats(connection, since)
+        stats.sort(key=lambda s: s['count'], reverse=True)
+        return stats[:limit]
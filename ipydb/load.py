@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bulk load CSV files and pandas DataFrames into database tables.
+
+Rows are streamed in batches, so memory use depends on the batch size
+rather than on the size of the input. Where the database has a bulk
+load command of its own it is used instead of INSERT statements:
+
+    postgresql: COPY ... FROM STDIN
+    mysql: LOAD DATA LOCAL INFILE (CSV files only)
+    sqlite: one transaction with PRAGMA synchronous=OFF
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+import csv
+import decimal
+import io
+import re
+import sys
+import time
+
+import sqlalchemy as sa
+
+
+def numeric(value):
+    """Check that value is a number, but keep it as an exact string."""
+    decimal.Decimal(value)
+    return value
+
+
+# reflected column type -> function converting a CSV field to that type.
+# Types which aren't matched (dates, strings, ...) are passed through as
+# strings and left to the database to convert.
+TYPE_CONVERTERS = [
+    (re.compile(r'BOOL', re.I), sa.util.asbool),
+    (re.compile(r'^(?:UNSIGNED\s+)?(?:BIG|SMALL|TINY|MEDIUM)?'
+                r'(?:INT|INTEGER|SERIAL)\d*\b', re.I), int),
+    (re.compile(r'NUMERIC|DECIMAL|NUMBER', re.I), numeric),
+    (re.compile(r'FLOAT|DOUBLE|REAL', re.I), float),
+]
+
+
+class LoadError(Exception):
+    """Raised when the input doesn't match the target table."""
+
+
+def converter(typename):
+    """Return a function which converts a CSV field to typename.
+
+    Args:
+        typename: a column type as reflected by ipydb, eg. 'INTEGER'.
+    Returns:
+        function(str) -> value. Empty strings are converted to None.
+    """
+    func = None
+    for regex, conv in TYPE_CONVERTERS:
+        if regex.search(typename or ''):
+            func = conv
+            break
+
+    def convert(value):
+        if value == '':
+            return None
+        if func is None:
+            return value
+        return func(value)
+    convert.typename = typename
+    return convert
+
+
+def check_columns(table, columns):
+    """Check that columns exist in the reflected table.
+
+    Args:
+        table: model.Table, or None if the table hasn't been reflected.
+        columns: list of column names from the input.
+    Raises:
+        LoadError: if any column is not in the table.
+    """
+    if table is None:
+        return
+    known = set(c.name.lower() for c in table.columns)
+    unknown = [c for c in columns if c.lower() not in known]
+    if unknown:
+        raise LoadError('Table %s has no column%s named: %s' % (
+            table.name, 's' if len(unknown) > 1 else '',
+            ', '.join(unknown)))
+
+
+def column_converters(table, columns):
+    """Return a converter() for each of columns in table."""
+    types = {}
+    if table is not None:
+        types = dict((c.name.lower(), c.type) for c in table.columns)
+    return [converter(types.get(c.lower())) for c in columns]
+
+
+class RowProgress(object):
+    """Tracks (and periodically reports) rows loaded per second."""
+
+    def __init__(self, report_interval=10, out=None):
+        self.report_interval = report_interval
+        self.out = out
+        self.rows = 0
+        self.start = time.time()
+        self.last_report = self.start
+
+    def update(self, nrows):
+        self.rows += nrows
+        if self.report_interval:
+            now = time.time()
+            if now - self.last_report >= self.report_interval:
+                self.last_report = now
+                print(self.summary(), file=self.out or sys.stdout)
+
+    def summary(self):
+        elapsed = max(time.time() - self.start, 1e-6)
+        return "%i rows in %.1fs: %.1f rows/s" % (
+            self.rows, elapsed, self.rows / elapsed)
+
+
+class BulkLoader(object):
+    """Loads rows into a table, using the fastest method available.
+
+    Usage:
+        loader = BulkLoader(engine, 'person', model_table)
+        loader.load_csv('people.csv')
+        print(loader.progress.summary())
+    """
+
+    def __init__(self, engine, tablename, table=None, conn=None,
+                 batch_size=1000, commit_every=None, fast=True,
+                 report_interval=10, out=None):
+        """Constructor.
+
+        Args:
+            engine: SqlAlchemy engine to load into.
+            tablename: name of the target table, optionally schema.table.
+            table: reflected model.Table used to check columns and
+                   convert CSV fields, or None.
+            conn: connection with an active transaction to load in. This
+                  transaction is left for the caller to commit. By
+                  default rows are loaded and committed on a new
+                  connection.
+            batch_size: number of rows per executemany() or COPY.
+            commit_every: commit after every N rows, default: once at
+                          the end. Ignored if conn is given.
+            fast: use the dialect's bulk load command if there is one.
+            report_interval: print progress every N seconds, 0 for never.
+            out: file-like object for progress, default: sys.stdout.
+        """
+        self.engine = engine
+        self.tablename = tablename
+        self.table = table
+        self.conn = conn
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.fast = fast
+        self.dialect = engine.dialect.name
+        self.progress = RowProgress(report_interval, out)
+        self._trans = None
+
+    def quote(self, name):
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def quoted_table(self):
+        return '.'.join(self.quote(bit) for bit in self.tablename.split('.'))
+
+    def insert(self, columns):
+        """Return an INSERT statement for columns."""
+        bits = self.tablename.split('.')
+        schema = bits[0] if len(bits) > 1 else None
+        tbl = sa.table(bits[-1], *[sa.column(c) for c in columns],
+                       schema=schema)
+        return tbl.insert()
+
+    def load_csv(self, path, delimiter=',', header=True, columns=None,
+                 encoding='utf-8'):
+        """Load a CSV file.
+
+        Args:
+            path: path to the CSV file.
+            delimiter: field delimiter.
+            header: the first line of the file contains column names.
+            columns: list of column names, overrides the header.
+            encoding: the file's encoding.
+        """
+        with io.open(path, newline='', encoding=encoding) as fin:
+            if header:
+                names = next(csv.reader([fin.readline()],
+                                        delimiter=delimiter), [])
+                columns = columns or [name.strip() for name in names]
+            if not columns:
+                raise LoadError('Column names are required when the file '
+                                'has no header')
+            check_columns(self.table, columns)
+            if self.fast and self.dialect == 'postgresql':
+                self.run(self.copy_postgresql, fin, columns, delimiter)
+            elif self.fast and self.dialect == 'mysql':
+                self.run(self.load_data_mysql, path, columns, delimiter,
+                         header, encoding)
+            else:
+                converters = column_converters(self.table, columns)
+                rows = self.convert(
+                    csv.reader(fin, delimiter=delimiter), converters,
+                    1 if header else 0)
+                self.run(self.insert_rows, rows, columns)
+
+    def load_dataframe(self, df):
+        """Load a pandas DataFrame, its index is not loaded."""
+        columns = [str(c) for c in df.columns]
+        check_columns(self.table, columns)
+
+        def rows():
+            for start in range(0, len(df), self.batch_size):
+                chunk = df.iloc[start:start + self.batch_size]
+                # NaN -> None and numpy scalars -> python objects
+                chunk = chunk.astype(object).where(chunk.notnull(), None)
+                for row in chunk.itertuples(index=False, name=None):
+                    yield row
+        if self.fast and self.dialect == 'postgresql':
+            self.run(self.copy_rows_postgresql, rows(), columns)
+        else:
+            self.run(self.insert_rows, rows(), columns)
+
+    def convert(self, reader, converters, offset=0):
+        """Yield rows from a csv.reader with each field converted."""
+        for row in reader:
+            if len(row) != len(converters):
+                if not row:
+                    continue
+                raise LoadError('line %i: expected %i fields, found %i' % (
+                    reader.line_num + offset, len(converters), len(row)))
+            try:
+                yield [conv(value) for conv, value in zip(converters, row)]
+            except (ValueError, decimal.InvalidOperation):
+                for conv, value in zip(converters, row):
+                    try:
+                        conv(value)
+                    except (ValueError, decimal.InvalidOperation):
+                        raise LoadError('line %i: %r is not a valid %s' % (
+                            reader.line_num + offset, value, conv.typename))
+                raise  # pragma: nocover
+
+    def run(self, method, *args):
+        """Call method(conn, *args) in a transaction."""
+        if self.conn is not None:
+            method(self.conn, *args)
+            return
+        with self.engine.connect() as conn:
+            if self.dialect == 'sqlite':
+                # one transaction, without waiting for fsync()
+                self.commit_every = None
+                sync = conn.execute('pragma synchronous').scalar()
+                conn.execute('pragma synchronous = off')
+            self._trans = conn.begin()
+            try:
+                method(conn, *args)
+                self._trans.commit()
+            except BaseException:
+                self._trans.rollback()
+                raise
+            finally:
+                if self.dialect == 'sqlite':
+                    conn.execute('pragma synchronous = %i' % sync)
+
+    def batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def loaded(self, conn, nrows):
+        """Record that nrows were loaded, committing if necessary."""
+        before = self.progress.rows
+        self.progress.update(nrows)
+        if (self.commit_every and self.conn is None and
+                before // self.commit_every !=
+                self.progress.rows // self.commit_every):
+            self._trans.commit()
+            self._trans = conn.begin()
+
+    def insert_rows(self, conn, rows, columns):
+        """Load rows with batched executemany() INSERTs."""
+        insert = self.insert(columns)
+        for batch in self.batches(rows):
+            conn.execute(insert, [dict(zip(columns, row)) for row in batch])
+            self.loaded(conn, len(batch))
+
+    def copy_sql(self, columns, delimiter=','):
+        return "COPY %s (%s) FROM STDIN WITH CSV DELIMITER '%s'" % (
+            self.quoted_table(), ', '.join(self.quote(c) for c in columns),
+            delimiter.replace("'", "''"))
+
+    def copy_postgresql(self, conn, fin, columns, delimiter):
+        """Stream the rest of fin to the server with COPY."""
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(self.copy_sql(columns, delimiter), fin,
+                               size=1024 * 1024)
+            self.loaded(conn, cursor.rowcount)
+        finally:
+            cursor.close()
+
+    def copy_rows_postgresql(self, conn, rows, columns):
+        """Load rows with one COPY per batch."""
+        sql = self.copy_sql(columns)
+        cursor = conn.connection.cursor()
+        try:
+            for batch in self.batches(rows):
+                buf = io.StringIO()
+                csv.writer(buf, lineterminator='\n').writerows(batch)
+                buf.seek(0)
+                cursor.copy_expert(sql, buf)
+                self.loaded(conn, len(batch))
+        finally:
+            cursor.close()
+
+    def load_data_mysql(self, conn, path, columns, delimiter, header,
+                        encoding):
+        """Load a CSV file with LOAD DATA LOCAL INFILE.
+
+        The connection needs local_infile enabled, eg. with
+        connect_args.local_infile = 1 in ~/.db-connections.
+        """
+        with io.open(path, 'rb') as fin:
+            newline = '\\r\\n' if fin.readline().endswith(b'\r\n') else '\\n'
+        # empty fields are NULL, as they are for the other dialects
+        variables = ['@v%i' % i for i in range(len(columns))]
+        sets = ['%s = NULLIF(%s, \'\')' % (self.quote(c), v)
+                for c, v in zip(columns, variables)]
+        charset = re.sub(r'\W', '', encoding.lower())
+        if charset == 'utf8':
+            charset = 'utf8mb4'
+        sql = ("LOAD DATA LOCAL INFILE :path INTO TABLE %s CHARACTER SET %s "
+               "FIELDS TERMINATED BY :delimiter OPTIONALLY ENCLOSED BY '\"' "
+               "ESCAPED BY '' LINES TERMINATED BY '%s' %s(%s) SET %s" % (
+                   self.quoted_table(), charset, newline,
+                   'IGNORE 1 LINES ' if header else '',
+                   ', '.join(variables), ', '.join(sets)))
+        result = conn.execute(sa.text(sql), path=path, delimiter=delimiter)
+        self.loaded(conn, result.rowcount)
@@ -17,6 +17,8 @@ from IPython.utils.process import arg_split
 
 import sqlparse
 from ipydb.asciitable import PivotResultSet
+from ipydb import trace
+from ipydb.utils import parse_size
 
 SQL_ALIASES = 'select insert update delete create alter drop'.split()
 
@@ -117,7 +119,8 @@ class SqlMagics(Magics):
 
     @magic_arguments()
     @argument('-r', '--return', dest='ret', action='store_true',
-              help='Return a resultset instead of printing the results')
+              help='Return a ResultSet, which keeps the rows as they are '
+                   'read, instead of printing the results')
     @argument('-p', '--pivot', dest='single', action='store_true',
               help='View in "single record" mode')
     @argument('-m', '--multiparams', dest='multiparams', default=None,
@@ -127,9 +130,63 @@ class SqlMagics(Magics):
     @argument('-f', '--format', action='store_true',
               help='pretty-print sql statement and exit')
     @argument('-o', '--output', action='store', dest='file',
-              help='Write sql output as CSV to the given file')
+              help='Write sql output to the given file: as CSV, or in the '
+                   'format named by its extension, one of .tsv, .jsonl, '
+                   '.parquet, .arrow or .feather. Add .gz, .bz2, .xz or '
+                   '.zst to compress it')
+    @argument('--compress-level', action='store', type=int, default=None,
+              metavar='LEVEL',
+              help='Compression level for .gz, .bz2, .xz (0-9, 1-9, 0-9) '
+                   'or .zst (1-22) files')
+    @argument('--tsv', action='store_true',
+              help='Write tab separated values, default for *.tsv files')
+    @argument('--quoting', action='store', default='minimal',
+              choices=['minimal', 'all', 'nonnumeric', 'none'],
+              help='How to quote CSV/TSV fields, default: minimal')
+    @argument('--null', action='store', default='', metavar='STRING',
+              help='Write NULLs in CSV/TSV output as STRING, '
+                   'default: an empty field')
+    @argument('-s', '--stream', action='store_true',
+              help='Draw one table, with column widths fixed from the '
+                   'first rows, showing rows as they arrive')
+    @argument('-v', '--view', action='store_true',
+              help='Scroll through the results in a full screen viewer, '
+                   'which only fetches the rows which are looked at')
     @argument('-P', '--pandas', action='store_true',
               help='Return data as pandas DataFrame')
+    @argument('--chunks', action='store_true',
+              help='With -P, return an iterator of DataFrames, one for '
+                   'each batch of rows')
+    @argument('--arrow', action='store_true',
+              help='With -P, return DataFrames backed by pyarrow arrays, '
+                   'fetched through an ADBC driver if one is installed '
+                   'for the database. Without one, building them is no '
+                   'faster than -P alone')
+    @argument('--max-rows', action='store', type=int, default=None,
+              metavar='N', help='With -P, stop after N rows')
+    @argument('--max-bytes', action='store', type=parse_size, default=None,
+              metavar='SIZE', help='With -P, stop once the DataFrame uses '
+                                   'SIZE of memory, eg. 500M or 2G. '
+                                   'Checked after each batch of rows')
+    @argument('--nocache', action='store_true',
+              help="Don't use the result cache, see %%sqlcache")
+    @argument('--refresh', action='store_true',
+              help="Re-run the statement and replace its cached result")
+    @argument('--on', action='store', default=None, metavar='NICKNAMES',
+              help='Run on every database whose nickname matches these '
+                   'comma separated globs, eg. --on "shard*"')
+    @argument('--workers', action='store', type=int, default=8,
+              metavar='N', help='Number of databases to query at once '
+                                'with --on')
+    @argument('--chunk-by', action='store', default=None, metavar='COLUMN',
+              help='Run an update or delete in batches of COLUMN ranges, '
+                   'default: the primary key')
+    @argument('--chunk-size', action='store', type=int, default=None,
+              metavar='N', help='Number of COLUMN values per batch')
+    @argument('--chunk-start', action='store', type=int, default=None,
+              metavar='N', help='Resume a chunked statement at COLUMN=N')
+    @argument('--chunk-sleep', action='store', type=float, default=None,
+              metavar='SECONDS', help='Pause between batches')
     @argument('sql_statement',  help='The SQL statement to run', nargs="*")
     
     @line_cell_magic
@@ -150,11 +207,32 @@ class SqlMagics(Magics):
                     id < 10
 
         Returning a result set:
-            To return a database cursor, use the -r option:
+            To return the rows, use the -r option. They are fetched as
+            they are read, and kept, so that they can be read again:
 
             results = %sql -r select first_name from employees
             for row in results:
                 do_things_with(row.first_name)
+            results[:10]
+            results.render()
+            results.to_csv('employees.csv')
+            df = results.to_dataframe()
+
+        Running on many databases:
+            Use --on to run a statement on every database whose
+            ~/.db-connections nickname matches a glob. Rows from all of
+            them are combined, with an extra _source column, followed by
+            the latency and any error for each database:
+
+            %sql --on 'shard*' select count(*) from orders
+
+        Batched updates and deletes:
+            Large updates and deletes can be run in batches of primary
+            key ranges, each committed in its own transaction, so that
+            locks aren't held for the whole statement:
+
+            %sql --chunk-size 10000 delete from events where day < '2015'
+            %sql --chunk-by id --chunk-sleep 0.5 update events set x = 1
 
         Shortcut Aliases to %sql:
             ipydb defines some 'short-cut' aliases which call %sql.
@@ -188,34 +266,237 @@ class SqlMagics(Magics):
             params = self.shell.user_ns.get(args.params, {})
         if args.multiparams:
             multiparams = self.shell.user_ns.get(args.multiparams, [])
-        cursor = self.ipydb.execute(sql, params=params,
-                                    multiparams=multiparams)
+        if not args.pandas and (args.chunks or args.arrow or any(
+                option is not None for option in (args.max_rows,
+                                                  args.max_bytes))):
+            print('--max-rows, --max-bytes, --chunks and --arrow only '
+                  'apply to DataFrames, use them with -P')
+            return
+        if any(option is not None for option in (
+                args.chunk_by, args.chunk_size, args.chunk_start,
+                args.chunk_sleep)):
+            self.ipydb.execute_chunked(
+                sql, chunk_by=args.chunk_by,
+                chunk_size=args.chunk_size or 10000,
+                start=args.chunk_start, sleep=args.chunk_sleep or 0)
+            return
+        if args.pandas and args.arrow and not (args.on or params or
+                                               multiparams):
+            frame = self.ipydb.adbc_dataframe(
+                sql, max_rows=args.max_rows, max_bytes=args.max_bytes,
+                chunks=args.chunks)
+            if frame is not None:
+                if not args.chunks:
+                    self.print_timings()
+                return frame
+        if args.on:
+            cursor = self.ipydb.execute_on(args.on, sql, params=params,
+                                           multiparams=multiparams,
+                                           workers=args.workers)
+        else:
+            cursor = self.ipydb.execute(sql, params=params,
+                                        multiparams=multiparams,
+                                        cache=not args.nocache,
+                                        refresh=args.refresh)
         
         if not cursor:
             return None
+        if args.on:
+            cursor.keys()  # wait for the first result
         if not cursor.returns_rows:
             s = 's' if cursor.rowcount != 1 else ''
             print("%i row%s affected" % (cursor.rowcount, s))
 
         if args.pandas:
-            return self.ipydb.build_dataframe(cursor)
+            frame = self.ipydb.build_dataframe(
+                cursor, query=sql, max_rows=args.max_rows,
+                max_bytes=args.max_bytes, chunks=args.chunks,
+                arrow=args.arrow)
+            if args.chunks:
+                return frame  # nothing has been fetched yet
+            if args.on:
+                print(cursor.summary())
+            else:
+                self.print_timings()
+            return frame
         if args.ret:
+            if cursor.returns_rows:
+                return self.ipydb.result_set(cursor, sql)
             return cursor
         if cursor and cursor.returns_rows:
+            output = {'quoting': args.quoting, 'null': args.null}
+            if args.tsv:
+                output['sqlformat'] = 'tsv'
+            if args.compress_level is not None:
+                output['compresslevel'] = args.compress_level
             if args.single:
                 self.ipydb.render_result(
-                    PivotResultSet(cursor), paginate=False, filepath=args.file)
+                    PivotResultSet(cursor), paginate=False, filepath=args.file,
+                    **output)
+            elif args.view and not args.file:
+                self.ipydb.view_result(cursor, query=sql)
             else:
                 self.ipydb.render_result(
-                    cursor, paginate=not bool(args.file), filepath=args.file)
+                    cursor, paginate=not bool(args.file), filepath=args.file,
+                    stream=args.stream, query=sql, **output)
+        if args.on:
+            print(cursor.summary())
+        else:
+            self.print_timings()
     sql.__description__ = 'Run an sql statement against ' 
 
-            
+    @magic_arguments()
+    @argument('-n', '--limit', action='store', type=int, default=10,
+              metavar='N', help='Suggest at most N indexes, default: 10')
+    @argument('-d', '--days', action='store', type=float, default=None,
+              metavar='N', help='Only use statements from the last N days')
+    @argument('-m', '--min-ms', action='store', type=float, default=0,
+              metavar='MS',
+              help='Ignore statements with a p95 latency below MS')
+    @line_magic
+    def index_advice(self, param=''):
+        """Suggest indexes for the current database from %sqlhistory.
+
+        Columns used in WHERE, JOIN ... ON and ORDER BY clauses of past
+        statements are compared with the indexes in ipydb's cached schema
+        metadata. Missing indexes are ranked by the total time spent
+        running the statements which would use them. The database itself
+        isn't queried.
+
+        Examples:
+            %index_advice
+            %index_advice --days 7 --min-ms 100
+        """
+        args = parse_argstring(self.index_advice, param)
+        self.ipydb.index_advice(args.limit, days=args.days,
+                                min_ms=args.min_ms)
+
+    @magic_arguments()
+    @argument('-a', '--analyze', action='store_true',
+              help='Run the statement and show real timings. Changes it '
+                   'makes are rolled back.')
+    @argument('sql', nargs='*', type=str, help='SQL statement to explain')
+    @line_cell_magic
+    def explain(self, args='', cell=None):
+        """Show the query plan for an SQL statement.
+
+        The plan comes from EXPLAIN QUERY PLAN on sqlite, EXPLAIN (FORMAT
+        JSON) on postgres and EXPLAIN on mysql. Full scans of large tables,
+        and WHERE clause predicates on columns which aren't in any index,
+        are warned about.
+
+        Examples:
+            %explain select * from person where name = 'Bob'
+            %explain --analyze delete from person where id < 10
+        """
+        args = parse_argstring(self.explain, args)
+        sql = ' '.join(args.sql)
+        if cell is not None:
+            sql += '\n' + cell
+        if not sql.strip():
+            print('Usage: %explain [--analyze] SQL')
+            return
+        self.ipydb.explain(sql, analyze=args.analyze)
+
+    @magic_arguments()
+    @argument('-s', '--slowest', dest='view', action='store_const',
+              const='slowest', default='recent',
+              help='Show the statements with the highest p95 latency')
+    @argument('-f', '--frequent', dest='view', action='store_const',
+              const='frequent', help='Show the most often run statements')
+    @argument('-n', '--limit', action='store', type=int, default=20,
+              metavar='N', help='Show N statements, default: 20')
+    @argument('-a', '--all', dest='all_connections', action='store_true',
+              help='Include statements run on every database')
+    @argument('-d', '--days', action='store', type=float, default=None,
+              metavar='N', help='Only include the last N days')
+    @line_magic
+    def sqlhistory(self, param=''):
+        """Show the history of statements run with %sql, with timings.
+
+        By default, the most recent statements run on the current
+        database are shown. Statements which only differ in their
+        literal values are grouped together for --slowest and
+        --frequent, which show p50 and p95 latency (execute + fetch)
+        for each group.
+
+        Examples:
+            %sqlhistory
+            %sqlhistory --slowest --days 7
+            %sqlhistory --frequent --all -n 50
+        """
+        args = parse_argstring(self.sqlhistory, param)
+        self.ipydb.show_history(args.view, limit=args.limit,
+                                all_connections=args.all_connections,
+                                days=args.days)
+
+    @magic_arguments()
+    @argument('-t', '--ttl', action='store', type=float, default=None,
+              metavar='SECONDS', help='Expire cached results after SECONDS')
+    @argument('-s', '--size', action='store', type=float, default=None,
+              metavar='MB', help='Maximum size of the cache in megabytes')
+    @argument('action', nargs='?', default='stats',
+              choices=['on', 'off', 'clear', 'stats'],
+              help='Turn the cache on or off, clear it or show statistics')
+    @line_magic
+    def sqlcache(self, param=''):
+        """Cache the results of SELECT statements run with %sql.
+
+        Repeated SELECTs (eg. to view a result with -p, then save it with
+        -o) are answered from memory. Cached results are dropped after
+        --ttl seconds, when the cache is bigger than --size, or when this
+        session changes a table which they reference. Changes made by
+        other sessions are only seen once results expire, or with
+        %sql --refresh.
+
+        Examples:
+            %sqlcache on
+            %sqlcache --ttl 600 --size 256 on
+            %sqlcache stats
+        """
+        args = parse_argstring(self.sqlcache, param)
+        cache = self.ipydb.result_cache
+        if args.ttl is not None:
+            cache.ttl = args.ttl or None
+        if args.size is not None:
+            cache.max_bytes = int(args.size * 1024 * 1024)
+        if args.action == 'on':
+            self.ipydb.cache_results = True
+        elif args.action == 'off':
+            self.ipydb.cache_results = False
+            cache.clear()
+        elif args.action == 'clear':
+            cache.clear()
+        print("Result cache: %s" % (
+            'on' if self.ipydb.cache_results else 'off'))
+        if args.action == 'stats':
+            stats = cache.stats()
+            print("%(entries)i results, %(bytes)i of %(max_bytes)i bytes, "
+                  "ttl: %(ttl)ss" % stats)
+            print("%(hits)i hits, %(misses)i misses (%(hit_rate).0f%%), "
+                  "%(evictions)i evictions, %(invalidations)i "
+                  "invalidations" % dict(stats, hit_rate=stats['hit_rate'] *
+                                         100))
+
     @magic_arguments()
     @argument('-d', '--delimiter', action='store', default='/',
-              help='Statement delimiter. Must be on a new line by itself')
+              help='Statement delimiter. Must be on a new line by itself, '
+                   'unless it is ;')
     @argument('-i', '--interactive', action='store_true', default=False,
               help='Interactive mode - show and prompt each SQL statement')
+    @argument('-c', '--commit-every', action='store', type=int,
+              default=None, metavar='N',
+              help='Commit after every N statements')
+    @argument('--continue-on-error', action='store_true', default=False,
+              help='Keep running statements after an error')
+    @argument('-e', '--error-log', action='store', default=None,
+              metavar='FILE', help='Append failed statements to FILE')
+    @argument('-s', '--start', action='store', type=int, default=0,
+              metavar='N',
+              help='Skip the first N statements, eg. to resume a script')
+    @argument('-p', '--parallel', action='store', type=int, default=None,
+              metavar='N',
+              help='Run up to N statements at once on pooled connections')
     @argument('file', action='store', help='SQL script file')
     @line_magic
     def runsql(self, param=''):
@@ -223,16 +504,109 @@ class SqlMagics(Magics):
 
         SQL statements in the input file are expected to be delimited
         by '/' by itself on a new line. This can be overidden with the
-        -d option.
+        -d option. With -d ';' statements are split on semicolons which
+        are not inside strings, comments or BEGIN...END blocks.
+
+        The file is read one statement at a time, so very large dump
+        files can be run. Throughput is reported as the script runs.
+
+        With --parallel N, up to N statements run at once, each in its
+        own transaction. Put a line containing only:
+
+            -- @barrier
+
+        between statements to make the statements after it wait for
+        every statement before it to finish.
+
+        Examples:
+            %runsql -d ';' --commit-every 1000 dump.sql
+            %runsql -d ';' --continue-on-error -e errors.sql dump.sql
+            %runsql -d ';' --start 15000 dump.sql
+            %runsql -d ';' --parallel 8 create_indexes.sql
         """
         args = parse_argstring(self.runsql, param)
         self.ipydb.run_sql_script(
             args.file,
             interactive=args.interactive,
-            delimiter=args.delimiter)
+            delimiter=args.delimiter,
+            commit_every=args.commit_every,
+            continue_on_error=args.continue_on_error,
+            error_log=args.error_log,
+            start=args.start,
+            parallel=args.parallel)
     runsql.__description__ = 'Run delimited SQL ' \
         'statements from a file'
 
+    @magic_arguments()
+    @argument('-d', '--delimiter', action='store', default=',',
+              help='CSV field delimiter, default: ","')
+    @argument('--no-header', dest='header', action='store_false',
+              default=True, help='The file has no header line')
+    @argument('-C', '--columns', action='store', default=None,
+              help='Comma separated column names, overrides the header')
+    @argument('-b', '--batch-size', action='store', type=int, default=1000,
+              metavar='N', help='Insert N rows per batch')
+    @argument('-c', '--commit-every', action='store', type=int,
+              default=None, metavar='N', help='Commit after every N rows')
+    @argument('--no-fast', dest='fast', action='store_false', default=True,
+              help="Use batched INSERTs, not the database's bulk loader")
+    @argument('file', action='store', help='CSV file')
+    @argument('table', action='store', help='Table to load into')
+    @line_magic
+    def load_csv(self, param=''):
+        """Bulk load a CSV file into a table.
+
+        The file is streamed, so it can be larger than available memory.
+        Columns are matched by name against the header line and fields
+        are converted to the types of the table's columns. Postgres
+        uses COPY and MySQL uses LOAD DATA LOCAL INFILE (which needs
+        connect_args.local_infile = 1 in ~/.db-connections).
+
+        Examples:
+            %load_csv people.csv person
+            %load_csv -d '|' --commit-every 100000 big.psv person
+        """
+        args = parse_argstring(self.load_csv, param)
+        columns = None
+        if args.columns:
+            columns = [c.strip() for c in args.columns.split(',')]
+        self.ipydb.load_csv(
+            args.file, args.table, delimiter=args.delimiter,
+            header=args.header, columns=columns,
+            batch_size=args.batch_size, commit_every=args.commit_every,
+            fast=args.fast)
+    load_csv.__description__ = 'Bulk load a CSV file into a table'
+
+    @magic_arguments()
+    @argument('-b', '--batch-size', action='store', type=int, default=1000,
+              metavar='N', help='Insert N rows per batch')
+    @argument('-c', '--commit-every', action='store', type=int,
+              default=None, metavar='N', help='Commit after every N rows')
+    @argument('--no-fast', dest='fast', action='store_false', default=True,
+              help="Use batched INSERTs, not the database's bulk loader")
+    @argument('dataframe', action='store',
+              help='Name of a pandas DataFrame variable')
+    @argument('table', action='store', help='Table to load into')
+    @line_magic
+    def load_df(self, param=''):
+        """Bulk load a pandas DataFrame into a table.
+
+        The DataFrame's columns must exist in the table, its index is
+        not loaded.
+
+        Example:
+            %load_df df person
+        """
+        args = parse_argstring(self.load_df, param)
+        if args.dataframe not in self.shell.user_ns:
+            print("No variable named %s" % args.dataframe)
+            return
+        self.ipydb.load_dataframe(
+            self.shell.user_ns[args.dataframe], args.table,
+            batch_size=args.batch_size, commit_every=args.commit_every,
+            fast=args.fast)
+    load_df.__description__ = 'Bulk load a pandas DataFrame into a table'
+
     @line_magic
     def tables(self, param=''):
         """Show a list of tables for the current db connection.
@@ -299,6 +673,162 @@ class SqlMagics(Magics):
         logging.getLogger('sqlalchemy.engine').setLevel(level)
         print('SQL logging %s' % ('on' if self.ipydb.show_sql else 'off'))
 
+    @magic_arguments()
+    @argument('-j', '--json', dest='fmt', action='store_const', const='json',
+              default='table', help='Print metrics as JSON')
+    @argument('-p', '--prometheus', dest='fmt', action='store_const',
+              const='prometheus',
+              help='Print metrics in the Prometheus text format')
+    @argument('-r', '--reset', action='store_true',
+              help='Reset every metric after printing them')
+    @argument('-o', '--output', action='store', metavar='FILE',
+              help='Write metrics to FILE')
+    @line_magic
+    def ipydb_stats(self, param=''):
+        """Show counters and latency histograms for ipydb's internals:
+        schema reflection, metadata reads and writes, tab completion,
+        query execute/fetch/render times and pager writes.
+
+        Histogram percentiles are the upper bound of the bucket holding
+        the percentile, so they are approximate.
+
+        Examples:
+            %ipydb_stats
+            %ipydb_stats --prometheus -o /var/lib/node_exporter/ipydb.prom
+            %ipydb_stats --json --reset
+        """
+        args = parse_argstring(self.ipydb_stats, param)
+        self.ipydb.show_stats(args.fmt, reset=args.reset,
+                              filepath=args.output)
+
+    @magic_arguments()
+    @argument('-n', '--limit', action='store', type=int, default=50,
+              metavar='N', help='Show the last N statements, default: 50')
+    @argument('-s', '--subsystem', action='store', default=None,
+              help='Only show statements from SUBSYSTEM, eg. reflection')
+    @argument('--summary', action='store_true',
+              help='Show statement counts and time for each subsystem')
+    @argument('--size', action='store', type=int, default=None,
+              metavar='N', help='Keep the last N statements')
+    @argument('action', nargs='?', default='show',
+              choices=['on', 'off', 'clear', 'show'])
+    @line_magic
+    def sqltrace(self, param=''):
+        """Trace every statement ipydb runs against a database.
+
+        While tracing is on, each DB-API statement is recorded with its
+        duration, rowcount and the subsystem that ran it: query (%sql and
+        friends), reflection, metadata (ipydb's schema cache), history,
+        load or fanout. Only the most recent statements are kept.
+
+        Examples:
+            %sqltrace on
+            %sqltrace --summary
+            %sqltrace -s reflection -n 100
+            %sqltrace off
+        """
+        args = parse_argstring(self.sqltrace, param)
+        if args.size:
+            trace.tracer.resize(args.size)
+        if args.action == 'on':
+            trace.tracer.start()
+            print('Statement tracing on, keeping the last %i statements' %
+                  trace.tracer.maxlen)
+        elif args.action == 'off':
+            trace.tracer.stop()
+            print('Statement tracing off')
+        elif args.action == 'clear':
+            trace.tracer.clear()
+        else:
+            self.ipydb.show_trace(args.limit, subsystem=args.subsystem,
+                                  summary=args.summary)
+
+    @magic_arguments()
+    @argument('number', nargs='?', type=int, default=1,
+              help='Page number, default: 1')
+    @line_magic
+    def page(self, param=''):
+        """Show a page of the last result, without running it again.
+
+        The rows of the last result drawn by %sql are kept in a temporary
+        file, see %sqlbuffer. Pages hold as many rows as fit in the
+        terminal, and follow the last %sort and %grep.
+
+        Examples:
+            %page 3
+        """
+        args = parse_argstring(self.page, param)
+        self.ipydb.show_page(args.number)
+
+    @magic_arguments()
+    @argument('-d', '--desc', action='store_true',
+              help='Sort in descending order')
+    @argument('column', nargs='?', default=None,
+              help='Column to sort by, default: the original order')
+    @line_magic
+    def sort(self, param=''):
+        """Show the last result sorted by a column, without running it
+        again.
+
+        Examples:
+            %sort total
+            %sort --desc invoicedate
+        """
+        args = parse_argstring(self.sort, param)
+        self.ipydb.sort_result(args.column, descending=args.desc)
+
+    @magic_arguments()
+    @argument('-i', '--ignore-case', action='store_true',
+              help='Match regardless of case')
+    @argument('pattern', nargs='?', default=None,
+              help='Regular expression, default: show every row')
+    @line_magic
+    def grep(self, param=''):
+        """Show the rows of the last result with a value matching a
+        regular expression, without running it again.
+
+        Examples:
+            %grep -i 'berlin|paris'
+            %grep ^2009-01
+        """
+        args = parse_argstring(self.grep, param)
+        self.ipydb.grep_result(args.pattern, ignore_case=args.ignore_case)
+
+    @line_magic
+    def view(self, param=''):
+        """Scroll through the last result in a full screen viewer,
+        without running it again.
+
+        Rows are read from the last result's buffer (see %sqlbuffer),
+        sorted and filtered by %sort and %grep. Use j/k or the arrow keys
+        to scroll, space and b to page, h/l to scroll wide tables left and
+        right, g and G to go to the first or last row, and q to quit.
+        """
+        self.ipydb.view_last_result()
+
+    @line_magic
+    def sqlbuffer(self, param=''):
+        """Toggle keeping the rows of the last result drawn by %sql in a
+        temporary file, for %page, %sort, %grep and %view. Off until
+        one of them is first used."""
+        self.ipydb.buffer_results = not self.ipydb.buffer_results
+        if not self.ipydb.buffer_results:
+            self.ipydb.close_result_buffer()
+        print('Result buffering %s' % ('on' if self.ipydb.buffer_results
+                                       else 'off'))
+
+    @line_magic
+    def showtimings(self, param=''):
+        """Toggle printing how long each %sql statement spent executing,
+        fetching rows and rendering them."""
+        self.ipydb.show_timings = not self.ipydb.show_timings
+        print('Query timings %s' % ('on' if self.ipydb.show_timings
+                                    else 'off'))
+
+    def print_timings(self):
+        if self.ipydb.show_timings and self.ipydb.last_query is not None:
+            print(self.ipydb.last_query.summary())
+
     @line_magic
     def references(self, param=""):
         """Shows a list of all foreign keys that reference the given field.
@@ -18,7 +18,6 @@ import multiprocessing
 from multiprocessing.pool import ThreadPool
 import os
 
-import sqlalchemy as sa
 from sqlalchemy import orm
 from sqlalchemy.engine.url import URL
 try:
@@ -27,6 +26,8 @@ except ImportError:
     # IPython 3 support
     from IPython.utils.path import locate_profile
 
+from ipydb.engine import from_url
+from ipydb import trace
 from ipydb.utils import timer
 from . import model as m
 from . import persist
@@ -55,7 +56,9 @@ def get_metadata_engine(other_engine):
         os.makedirs(path)
     dbfilename = get_db_filename(other_engine)
     dburl = u'sqlite:////%s' % os.path.join(path, dbfilename)
-    return dbfilename, sa.create_engine(dburl)
+    sa_engine = from_url(dburl)
+    trace.label_engine(sa_engine, 'metadata')
+    return dbfilename, sa_engine
 
 
 def get_db_filename(engine):
@@ -111,7 +114,8 @@ class MetaDataAccessor(object):
 
     def read_expunge(self, ipydb_engine):
         with session_scope(ipydb_engine) as session, \
-                timer('Read-Expunge', log=log):
+                timer('Read-Expunge', log=log,
+                      metric='persist_read_ms'):
             db = persist.read(session)
             session.expunge_all()  # unhook SA
         return db
@@ -134,7 +138,7 @@ class MetaDataAccessor(object):
             self.databases[db_key] = db
             if noisy:
                 print("ipydb is fetching database metadata")
-            self.spawn_reflection_thread(db_key, db, engine.url)
+            self.spawn_reflection_thread(db_key, db, engine)
             return db
         if db.age > MAX_CACHE_AGE:
             log.debug('Cache expired age:%s reading from sqlite', db.age)
@@ -148,33 +152,40 @@ class MetaDataAccessor(object):
                 # return whatever we have
                 if noisy:
                     print("ipydb is fetching database metadata")
-                self.spawn_reflection_thread(db_key, db, engine.url)
+                self.spawn_reflection_thread(db_key, db, engine)
         return db
 
-    def spawn_reflection_thread(self, db_key, db, dburl_to_reflect):
+    def spawn_reflection_thread(self, db_key, db, target_engine):
         if not self.debug:
             self.pool.apply_async(self.reflect_db,
-                                  (db_key, db, dburl_to_reflect))
+                                  (db_key, db, target_engine))
         else:
-            self.reflect_db(db_key, db, dburl_to_reflect)
+            self.reflect_db(db_key, db, target_engine)
 
-    def reflect_db(self, db_key, db, dburl_to_reflect):
-        """runs in a new thread"""
+    def reflect_db(self, db_key, db, target_engine):
+        """runs in a new thread.
+
+        target_engine is the user's engine, so reflection shares its
+        connection pool rather than logging in again.
+        """
         db.reflecting = True
-        target_engine = sa.create_engine(dburl_to_reflect)
         db_key, ipydb_engine = get_metadata_engine(target_engine)
         db.sa_metadata.bind = target_engine
-        with timer('sa reflect', log=log):
+        with timer('sa reflect', log=log, metric='reflection_ms',
+                   phase='reflect'), trace.subsystem('reflection'):
             db.sa_metadata.reflect()
-        with timer('drop-recreate schema', log=log):
+        with timer('drop-recreate schema', log=log,
+                   metric='reflection_ms', phase='recreate_schema'):
             delete_schema(ipydb_engine)
             create_schema(ipydb_engine)
-        with timer('Persist sa data', log=log):
+        with timer('Persist sa data', log=log,
+                   metric='persist_write_ms'):
             persist.write_sa_metadata(ipydb_engine, db.sa_metadata)
         # make sure that everything was eager loaded, and update
         # db metadata from other thread XXX: dicey
         with session_scope(ipydb_engine) as session:
-            with timer('read-expunge after write', log=log):
+            with timer('read-expunge after write', log=log,
+                       metric='persist_read_ms'):
                 database = persist.read(session)
                 db.update_tables(database.tables.values())
                 db.sa_metadata = database.sa_metadata
@@ -111,7 +111,7 @@ class Database(object):
 
     def fields_referencing(self, tbl, column=None):
         if tbl not in self.tables:
-            raise StopIteration()
+            return
         for c in self.tables[tbl].columns:
             for r in c.referenced_by:
                 if column is None or column == r.referenced_column.name:
@@ -119,7 +119,7 @@ class Database(object):
 
     def foreign_keys(self, tbl):
         if tbl not in self.tables:
-            raise StopIteration()
+            return
         for c in self.tables[tbl].columns:
             if c.referenced_column:
                 yield ForeignKey(tbl, (c.name,),
@@ -146,7 +146,7 @@ class Database(object):
 
     def indexes(self, tbl):
         if tbl not in self.tables:
-            raise StopIteration()
+            return
         for index in self.tables[tbl].indexes:
             yield index
 
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+Counters and latency histograms for ipydb's internals.
+
+Metrics are kept in memory in a process wide registry:
+
+    from ipydb.metrics import registry
+    with registry.timed('reflection_ms', phase='reflect'):
+        ...
+    registry.counter('queries').inc()
+
+and can be exported as JSON or in the Prometheus text format.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+import json
+import threading
+import time
+
+# upper bounds, in milliseconds, of histogram buckets
+BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+           30000, 60000, float('inf'))
+PREFIX = 'ipydb_'
+
+
+def format_labels(labels, extra=None):
+    """Return labels as a prometheus label set, eg. {phase="reflect"}."""
+    items = sorted(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in items)
+
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else '%g' % bound
+
+
+class Counter(object):
+    """A count which only goes up."""
+
+    kind = 'counter'
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def as_dict(self):
+        return {'name': self.name, 'labels': self.labels,
+                'type': self.kind, 'value': self.value}
+
+    def prometheus(self):
+        return ['%s%s%s %s' % (PREFIX, self.name, format_labels(self.labels),
+                               self.value)]
+
+
+class Histogram(object):
+    """Latencies in milliseconds, counted in BUCKETS."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, ms):
+        with self._lock:
+            self.count += 1
+            self.total += ms
+            if self.min is None or ms < self.min:
+                self.min = ms
+            if self.max is None or ms > self.max:
+                self.max = ms
+            for idx, bound in enumerate(BUCKETS):
+                if ms <= bound:
+                    self.buckets[idx] += 1
+                    break
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, pct):
+        """Return the upper bound of the bucket holding the pct
+        percentile, or max if that is smaller."""
+        if not self.count:
+            return None
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for idx, bound in enumerate(BUCKETS):
+            seen += self.buckets[idx]
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max  # pragma: nocover
+
+    def as_dict(self):
+        return {'name': self.name, 'labels': self.labels,
+                'type': self.kind, 'count': self.count,
+                'sum': self.total, 'min': self.min, 'max': self.max,
+                'mean': self.mean, 'p50': self.percentile(50),
+                'p95': self.percentile(95),
+                'buckets': dict((format_bound(bound), n) for bound, n
+                                in zip(BUCKETS, self.buckets))}
+
+    def prometheus(self):
+        name = PREFIX + self.name
+        lines = []
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            lines.append('%s_bucket%s %i' % (
+                name, format_labels(self.labels, ('le', format_bound(bound))),
+                seen))
+        labels = format_labels(self.labels)
+        lines.append('%s_sum%s %r' % (name, labels, self.total))
+        lines.append('%s_count%s %i' % (name, labels, self.count))
+        return lines
+
+
+class timed(object):
+    """Context manager which observes its duration in a Histogram."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, ty, val, tb):
+        self.histogram.observe((time.time() - self.start) * 1000)
+        return False
+
+
+class Registry(object):
+    """Holds every metric, keyed by name and labels.
+
+    Usage:
+        registry = Registry()
+        registry.counter('queries').inc()
+        registry.histogram('completion_ms', completer='sql').observe(3.2)
+        print(registry.prometheus())
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def get(self, cls, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.setdefault(key, cls(name, labels))
+        if not isinstance(metric, cls):
+            raise ValueError('%s is a %s' % (name, metric.kind))
+        return metric
+
+    def counter(self, name, **labels):
+        return self.get(Counter, name, labels)
+
+    def histogram(self, name, **labels):
+        return self.get(Histogram, name, labels)
+
+    def timed(self, name, **labels):
+        """Return a context manager which times itself in histogram name.
+        """
+        return timed(self.histogram(name, **labels))
+
+    def collect(self):
+        """Return every metric, sorted by name and labels."""
+        return [self.metrics[key] for key in sorted(self.metrics)]
+
+    def reset(self):
+        with self._lock:
+            self.metrics.clear()
+
+    def as_dict(self):
+        return {'metrics': [metric.as_dict() for metric in self.collect()]}
+
+    def json(self):
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def prometheus(self):
+        """Return every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        typed = set()
+        for metric in self.collect():
+            if metric.name not in typed:
+                typed.add(metric.name)
+                lines.append('# TYPE %s%s %s' % (PREFIX, metric.name,
+                                                 metric.kind))
+            lines.extend(metric.prometheus())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
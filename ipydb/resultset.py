@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+"""
+A result set which can be read more than once, returned by %sql -r.
+
+Rows are fetched from the cursor only as they are needed, and kept a
+chunk at a time, one compact column per chunk: integers and floats in
+arrays, other values in tuples. Chunks beyond a memory budget are
+pickled to a temporary file, and read back when they are needed again,
+so a ResultSet can be iterated, sliced, rendered and exported as often
+as you like without running the statement again:
+
+    rs = %sql -r select * from invoice
+    rs[10:20]
+    rs.render()
+    rs.to_csv('invoice.csv')
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+from array import array
+import collections
+import itertools
+import pickle
+import sys
+import tempfile
+
+from ipydb import asciitable
+from ipydb import dataframe
+from ipydb import export
+from ipydb.asciitable import PivotResultSet, row_class
+
+# rows fetched and stored at a time
+CHUNK_ROWS = 1000
+# memory to keep chunks in, before they are written to a temporary file
+MAX_BYTES = 64 * 1024 * 1024
+# values of a column sampled to estimate its size
+SAMPLE_VALUES = 50
+
+# a chunk which has been written to the spill file
+Spilled = collections.namedtuple('Spilled', 'offset length nrows')
+
+
+def compact(values):
+    """Return a column of values in as little memory as possible."""
+    kinds = set(type(value) for value in values)
+    if kinds == set([int]):
+        try:
+            return array('q', values)
+        except OverflowError:
+            pass
+    elif kinds == set([float]):
+        return array('d', values)
+    return tuple(values)
+
+
+def column_bytes(column):
+    """Return an estimate of the memory used by a column."""
+    if isinstance(column, array):
+        return len(column) * column.itemsize
+    if not column:
+        return sys.getsizeof(column)
+    step = max(1, len(column) // SAMPLE_VALUES)
+    sample = column[::step]
+    return sys.getsizeof(column) + sum(
+        sys.getsizeof(value) for value in sample) * len(column) // len(sample)
+
+
+def draw(cursor, paginate=True, **options):
+    asciitable.draw(cursor, out=sys.stdout, paginate=paginate)
+
+
+class ResultSet(object):
+    """Rows of a result set, fetched lazily and kept for re-reading.
+
+    Iterating over a ResultSet always starts at the first row. Indexing
+    and slicing fetch as far as they need to, except that negative
+    indexes need every row. len() is only known once every row has been
+    read.
+    """
+
+    returns_rows = True
+
+    def __init__(self, cursor, query=None, types=None, render=None,
+                 max_bytes=MAX_BYTES, chunk_rows=CHUNK_ROWS):
+        """Constructor.
+
+        Args:
+            cursor: iterable of rows with a keys() method.
+            query: the SQL statement which cursor is the result of.
+            types: export type of each column, see export.sql_type().
+            render: function(cursor, query=query, **options) which draws a
+                    result set, default: asciitable.draw() to stdout.
+            max_bytes: memory to keep rows in, the rest are written to a
+                       temporary file.
+            chunk_rows: rows to fetch and store at a time.
+        """
+        self.cursor = cursor
+        self.query = query
+        self.headings = list(cursor.keys())
+        self.types = types
+        self.renderer = render
+        self.max_bytes = max_bytes
+        self.chunk_rows = chunk_rows
+        self.row_class = row_class(self.headings)
+        self.chunks = []  # tuples of columns, or Spilled
+        self.fetched = 0
+        self.nbytes = 0
+        self.exhausted = False
+        self.spill = None
+        self._rows = None
+        self._read = (None, None)  # the last spilled chunk read back
+        self._pos = 0  # for fetchone() and friends
+
+    def keys(self):
+        return self.headings
+
+    @property
+    def rowcount(self):
+        return self.fetched if self.exhausted else -1
+
+    @property
+    def spilled(self):
+        """Number of rows in the temporary file."""
+        return sum(chunk.nrows for chunk in self.chunks
+                   if isinstance(chunk, Spilled))
+
+    def fetch_chunk(self):
+        """Fetch and store the next chunk of rows from the cursor.
+
+        Returns:
+            False if there were no more rows.
+        """
+        if self.exhausted:
+            return False
+        if self._rows is None:
+            self._rows = iter(self.cursor)
+        rows = list(itertools.islice(self._rows, self.chunk_rows))
+        if len(rows) < self.chunk_rows:
+            self.exhausted = True
+        if not rows:
+            return False
+        nrows = len(rows)
+        columns = tuple(compact(column) for column in zip(*rows))
+        del rows
+        size = sum(column_bytes(column) for column in columns)
+        if self.spill is None and self.nbytes + size <= self.max_bytes:
+            self.chunks.append(columns)
+            self.nbytes += size
+        else:
+            self.chunks.append(self.write_chunk(columns, nrows))
+        self.fetched += nrows
+        return True
+
+    def write_chunk(self, columns, nrows):
+        if self.spill is None:
+            self.spill = tempfile.TemporaryFile(prefix='ipydb-')
+        data = pickle.dumps(columns, pickle.HIGHEST_PROTOCOL)
+        self.spill.seek(0, 2)
+        offset = self.spill.tell()
+        self.spill.write(data)
+        return Spilled(offset, len(data), nrows)
+
+    def chunk_columns(self, idx):
+        chunk = self.chunks[idx]
+        if not isinstance(chunk, Spilled):
+            return chunk
+        if self._read[0] != idx:
+            self.spill.seek(chunk.offset)
+            self._read = (idx, pickle.loads(self.spill.read(chunk.length)))
+        return self._read[1]
+
+    def iter_chunk(self, idx):
+        """Yield the rows of chunk idx."""
+        cls = self.row_class
+        for row in zip(*self.chunk_columns(idx)):
+            yield cls(row)
+
+    def fetch_to(self, count):
+        """Fetch until count rows, or all of them if count is None, have
+        been read."""
+        while (count is None or self.fetched < count) and \
+                self.fetch_chunk():
+            pass
+
+    def __iter__(self):
+        idx = 0
+        while idx < len(self.chunks) or self.fetch_chunk():
+            for row in self.iter_chunk(idx):
+                yield row
+            idx += 1
+
+    def row(self, idx):
+        columns = self.chunk_columns(idx // self.chunk_rows)
+        offset = idx % self.chunk_rows
+        return self.row_class(column[offset] for column in columns)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop = key.start, key.stop
+            if stop is None or (start or 0) < 0 or stop < 0:
+                self.fetch_to(None)
+            else:
+                self.fetch_to(stop)
+            return [self.row(idx)
+                    for idx in range(*key.indices(self.fetched))]
+        if key < 0:
+            self.fetch_to(None)
+            key += self.fetched
+        else:
+            self.fetch_to(key + 1)
+        if not 0 <= key < self.fetched:
+            raise IndexError('ResultSet index out of range')
+        return self.row(key)
+
+    def __len__(self):
+        if not self.exhausted:
+            raise TypeError('The length of a ResultSet is only known once '
+                            'every row has been read, eg. by fetchall()')
+        return self.fetched
+
+    def __bool__(self):
+        return True
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        if self.exhausted:
+            rows = '%i rows' % self.fetched
+        else:
+            rows = '%i+ rows' % self.fetched
+        return '<ResultSet %s x %i columns>' % (rows, len(self.headings))
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=1):
+        rows = self[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        """Return the rows which fetchone() and fetchmany() haven't."""
+        rows = self[self._pos:]
+        self._pos += len(rows)
+        return rows
+
+    def render(self, **options):
+        """Draw the rows as a table, or in the current %sqlformat.
+
+        Args:
+            options: passed to the render function, eg. for
+                     SqlPlugin.render_result(): sqlformat='csv'.
+        """
+        (self.renderer or draw)(self, query=self.query, **options)
+
+    def pivot(self, **options):
+        """Draw each row as a table of field names and values, like
+        %sql -p."""
+        (self.renderer or draw)(PivotResultSet(self), paginate=False,
+                                query=self.query, **options)
+
+    def to_csv(self, path, **options):
+        """Write the rows to a CSV file.
+
+        Args:
+            path: file to write, compressed if its extension is one of
+                  export.COMPRESSORS, eg. .csv.gz.
+            options: passed to export.export(), eg. quoting='all',
+                     null='NULL', or fmt='tsv' for tab separated values.
+        """
+        options.setdefault('fmt', 'csv')
+        export.export(self, path, types=self.types, **options)
+
+    def to_dataframe(self, arrow=False):
+        """Return the rows as a pandas DataFrame, see
+        dataframe.FrameBuilder.
+
+        Args:
+            arrow: back the frame with pyarrow arrays, if pyarrow is
+                   installed.
+        """
+        if not dataframe._has_pandas:
+            print("Warning: Pandas support not installed."
+                  "Please use `pip install 'ipydb[notebook]'` "
+                  "to add support for pandas dataframes in ipydb.")
+            return None
+        builder_class = dataframe.FrameBuilder
+        if arrow and dataframe._has_pyarrow:
+            builder_class = dataframe.ArrowFrameBuilder
+        # every row, which fetchmany() would start after those read
+        rows = asciitable.FakedResult(self, self.headings)
+        return builder_class(rows, types=self.types).build()
+
+    def close(self):
+        """Drop the stored rows and close the cursor."""
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+        self.chunks = []
+        self._read = (None, None)
+        self.fetched = 0
+        self.exhausted = True
+        if hasattr(self._rows, 'close'):
+            self._rows.close()  # eg. a generator which wraps the cursor
+        if hasattr(self.cursor, 'close'):
+            self.cursor.close()
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+
+"""
+Read and run SQL scripts, one statement at a time.
+
+Scripts are streamed line by line, so memory use depends on the size of
+the largest statement in the script rather than on the size of the file.
+This makes it possible to run multi-gigabyte dump files.
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from __future__ import print_function
+import heapq
+from multiprocessing.pool import ThreadPool
+import re
+import sys
+import threading
+import time
+
+from future.utils import text_type
+from sqlparse import lexer
+from sqlparse import tokens as T
+from sqlparse.engine.statement_splitter import StatementSplitter
+from sqlparse.sql import Statement
+
+# Matches the bits of SQL which matter when splitting on semicolons.
+# Quoted strings and comments are matched whole, so that semicolons
+# inside them are skipped over. An opening quote or comment which isn't
+# closed means that the statement continues on the next line.
+SPLIT_TOKENS = re.compile(r"""
+    '(?:''|\\.|[^'\\])*'
+  | "(?:""|[^"])*"
+  | `[^`]*`
+  | \$(?P<tag>\w*)\$.*?\$(?P=tag)\$
+  | --[^\n]*
+  | /\*.*?\*/
+  | (?P<unclosed>['"`]|\$\w*\$|/\*)
+  | (?P<begin>\bBEGIN\b)
+  | (?P<semicolon>;)
+""", re.S | re.I | re.X)
+COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+# The rest of a quoted string or comment which SPLIT_TOKENS found unclosed,
+# by its opening token. Dollar quotes are closed by their own tag.
+CLOSERS = {
+    "'": re.compile(r"(?:''|\\.|[^'\\])*'", re.S),
+    '"': re.compile(r'(?:""|[^"])*"'),
+    '`': re.compile(r'[^`]*`'),
+    '/*': re.compile(r'.*?\*/', re.S),
+}
+
+# A line in a script which separates statements that can run in parallel
+# from those that must wait for them to finish.
+BARRIER_MARKER = '-- @barrier'
+BARRIER = object()
+
+
+class EndOfChunk(Exception):
+    """Raised by StatementScanner's token stream to stop sqlparse's
+    splitter at the end of the text it has been given so far."""
+
+
+def closer(token):
+    """Return a regex matching the rest of a string or comment which
+    starts with token."""
+    if token in CLOSERS:
+        return CLOSERS[token]
+    return re.compile(r'.*?%s' % re.escape(token), re.S)
+
+
+def chunk_tokens(text):
+    for token in lexer.tokenize(text):
+        yield token
+    raise EndOfChunk()
+
+
+class StatementScanner(object):
+    """Splits SQL into semicolon terminated statements, a line at a time.
+
+    Uses a fast regular expression scan where possible. Once a statement
+    contains a BEGIN keyword it is split with sqlparse instead, as the
+    semicolons inside BEGIN ... END blocks (eg. triggers and procedures)
+    don't end the statement.
+
+    The scan's state (an unclosed string or comment, and sqlparse's split
+    level) is kept from one line to the next, so each line is only
+    scanned once however long the statement it belongs to.
+
+    Usage:
+        scanner = StatementScanner()
+        for line in fin:
+            for statement in scanner.feed(line):
+                run(statement)
+        for statement in scanner.finish():
+            run(statement)
+    """
+
+    def __init__(self):
+        self.parts = []  # text of the current statement, not yet split
+        self.closer = None  # matches the end of an unclosed string/comment
+        self.splitter = None  # sqlparse's splitter, once BEGIN is seen
+
+    def tokens(self, line):
+        """Yield SPLIT_TOKENS matches in line which aren't inside a
+        string or comment, noting whether line ends inside one."""
+        pos = 0
+        if self.closer is not None:
+            match = self.closer.match(line)
+            if match is None:
+                return
+            self.closer = None
+            pos = match.end()
+        for match in SPLIT_TOKENS.finditer(line, pos):
+            if match.group('unclosed'):
+                self.closer = closer(match.group('unclosed'))
+                return
+            yield match
+
+    def feed(self, line):
+        """Scan the next line of SQL.
+
+        Args:
+            line: a line of SQL, including its newline.
+        Returns:
+            list of the statements which line completes, without their
+            terminating semicolons.
+        """
+        statements = []
+        start = 0
+        for match in self.tokens(line):
+            if self.splitter is not None:
+                continue  # still need to know if line ends in a string
+            if match.group('begin'):
+                self.splitter = StatementSplitter()
+            elif match.group('semicolon'):
+                self.parts.append(line[start:match.start()])
+                statement = ''.join(self.parts)
+                if not is_blank(statement):
+                    statements.append(statement)
+                self.parts = []
+                start = match.end()
+        if not start or line[start:].strip():
+            self.parts.append(line[start:])
+        if self.splitter is not None and self.closer is None and \
+                line.rstrip().endswith(';'):
+            statements.extend(self.split())
+        return statements
+
+    def split(self):
+        """Pass the text scanned since the last split() to sqlparse,
+        returning the statements it completes."""
+        text = ''.join(self.parts)
+        self.parts = []
+        splitter = self.splitter
+        stmts = []
+        try:
+            # sqlparse's splitter keeps its state when the stream ends
+            # early, so that the next chunk carries on from here.
+            for stmt in splitter.process(chunk_tokens(text)):
+                stmts.append(stmt)
+        except EndOfChunk:
+            pass
+        if splitter.consume_ws:
+            stmt = Statement(splitter.tokens)
+            if any(tok.ttype in T.Error for tok in stmt.flatten()):
+                # sqlparse disagrees about where a string ends: go again
+                # from the start of the statement with more text.
+                self.parts = [text_type(stmt)]
+                self.splitter = StatementSplitter()
+            else:
+                stmts.append(stmt)
+                self.splitter = None
+        elif all(tok.is_whitespace for tok in splitter.tokens):
+            self.splitter = None
+        statements = []
+        for stmt in stmts:
+            sql = text_type(stmt).strip()
+            if sql.endswith(';'):
+                sql = sql[:-1]
+            if not is_blank(sql):
+                statements.append(sql)
+        return statements
+
+    def pending(self):
+        """Return the text of the statement which hasn't been completed
+        yet."""
+        text = ''.join(self.parts)
+        if self.splitter is not None:
+            text = ''.join(tok.value for tok in self.splitter.tokens) + text
+        return text
+
+    def finish(self):
+        """Return the statements left at the end of the SQL. The last
+        statement doesn't need a terminating semicolon."""
+        if self.closer is not None:
+            statements = []  # unclosed quote: let the db complain
+            remainder = self.pending()
+        else:
+            statements = self.feed('\n;')
+            remainder = self.pending()
+            if remainder.endswith('\n;'):
+                remainder = remainder[:-2]
+        self.parts = []
+        self.splitter = None
+        if not is_blank(remainder):
+            statements.append(remainder)
+        return statements
+
+
+def is_blank(statement):
+    """Return True if statement is only whitespace and comments."""
+    statement = statement.lstrip()
+    if statement.startswith('--') or statement.startswith('/*'):
+        statement = COMMENTS.sub('', statement).strip()
+    return not statement
+
+
+def iter_statements(fin, delimiter='/', barriers=False):
+    """Yield SQL statements read from fin, one at a time.
+
+    If delimiter is ';' then statements are terminated by semicolons
+    outside of strings, comments and BEGIN ... END blocks, see
+    StatementScanner. Otherwise statements are terminated by delimiter
+    on a line by itself.
+
+    Args:
+        fin: file-like object, read with fin.readline().
+        delimiter: statement delimiter.
+        barriers: if True, yield BARRIER for each BARRIER_MARKER line
+                  found between statements.
+    """
+    if delimiter == ';':
+        for statement in iter_semicolon_statements(fin, barriers):
+            yield statement
+        return
+    lines = []
+    while True:
+        line = fin.readline()
+        if not line:
+            break
+        if barriers and line.strip() == BARRIER_MARKER and \
+                is_blank(''.join(lines)):
+            yield BARRIER
+            lines = []
+        elif line.strip() == delimiter:
+            statement = ''.join(lines)
+            if not is_blank(statement):
+                yield statement
+            lines = []
+        else:
+            lines.append(line)
+    remainder = ''.join(lines)
+    if not is_blank(remainder):
+        yield remainder
+
+
+def iter_semicolon_statements(fin, barriers=False):
+    """iter_statements() for semicolon terminated statements."""
+    scanner = StatementScanner()
+    while True:
+        line = fin.readline()
+        if not line:
+            break
+        if barriers and line.strip() == BARRIER_MARKER and \
+                scanner.closer is None and is_blank(scanner.pending()):
+            yield BARRIER
+            scanner = StatementScanner()
+            continue
+        for statement in scanner.feed(line):
+            yield statement
+    for statement in scanner.finish():
+        yield statement
+
+
+def nbytes(text):
+    if isinstance(text, text_type):
+        return len(text.encode('utf-8'))
+    return len(text)
+
+
+def sizeof_fmt(num):
+    """Return a human readable byte count, eg. '3.2 MB'."""
+    for unit in ['bytes', 'KB', 'MB', 'GB']:
+        if abs(num) < 1024.0:
+            return "%3.1f %s" % (num, unit)
+        num /= 1024.0
+    return "%.1f %s" % (num, 'TB')
+
+
+class Progress(object):
+    """Tracks (and periodically reports) the throughput of a script.
+
+    Usage:
+        progress = Progress()
+        for statement in statements:
+            run(statement)
+            progress.update(statement)
+        print(progress.summary())
+    """
+
+    def __init__(self, report_interval=10, out=None):
+        self.report_interval = report_interval
+        self.out = out
+        self.statements = 0
+        self.bytes = 0
+        self.start = time.time()
+        self.last_report = self.start
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start
+
+    def update(self, statement):
+        self.statements += 1
+        self.bytes += nbytes(statement)
+        if self.report_interval:
+            now = time.time()
+            if now - self.last_report >= self.report_interval:
+                self.last_report = now
+                print(self.summary(), file=self.out or sys.stdout)
+
+    def summary(self):
+        elapsed = max(self.elapsed, 1e-6)
+        return "%i statements (%s) in %.1fs: %.1f statements/s, %s/s" % (
+            self.statements, sizeof_fmt(self.bytes), elapsed,
+            self.statements / elapsed, sizeof_fmt(self.bytes / elapsed))
+
+
+def first_line(statement, width=60):
+    """Return the first line of statement, shortened to width."""
+    line = statement.strip().split('\n', 1)[0]
+    if len(line) > width:
+        line = line[:width - 3] + '...'
+    return line
+
+
+class ParallelRunner(object):
+    """Runs SQL statements concurrently over pooled connections.
+
+    Statements are started in the order they are read, at most `workers`
+    at a time, each on its own connection and in its own transaction.
+    A BARRIER waits for all statements read before it to finish before
+    any more are started.
+
+    Usage:
+        runner = ParallelRunner(engine, workers=4)
+        runner.run(iter_statements(fin, barriers=True))
+        print(runner.summary())
+    """
+
+    def __init__(self, engine, workers, continue_on_error=False,
+                 error_log=None, slowest=10, out=None):
+        """Constructor.
+
+        Args:
+            engine: SqlAlchemy engine to run statements on.
+            workers: number of statements to run at once.
+            continue_on_error: keep starting statements after an error.
+            error_log: file-like object to write failed statements to.
+            slowest: number of slowest statements to keep for summary().
+            out: file-like object for timing output, default: sys.stdout.
+        """
+        self.engine = engine
+        self.workers = workers
+        self.continue_on_error = continue_on_error
+        self.error_log = error_log
+        self.nslowest = slowest
+        self.out = out
+        self.progress = Progress(report_interval=0)
+        self.slowest = []  # heap of (seconds, index, first line)
+        self.failed = []  # indexes of failed statements
+        self.commands = set()  # first words of successful statements
+        self.stopped = False
+        self.interrupted = False
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(workers)
+
+    def execute(self, index, statement):
+        """Run a single statement, runs in a worker thread."""
+        error = None
+        start = time.time()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(statement)
+        except Exception as e:
+            error = e
+        return index, statement, time.time() - start, error
+
+    def finished(self, result):
+        """Record the result of execute(), runs in the pool's thread."""
+        index, statement, seconds, error = result
+        with self._cond:
+            out = self.out or sys.stdout
+            if error is None:
+                status = ''
+                self.progress.update(statement)
+                bits = statement.split(None, 1)
+                if bits:
+                    self.commands.add(bits[0].lower())
+                item = (seconds, index, first_line(statement))
+                if len(self.slowest) < self.nslowest:
+                    heapq.heappush(self.slowest, item)
+                else:
+                    heapq.heappushpop(self.slowest, item)
+            else:
+                status = ' FAILED: %s' % str(error).split('\n')[0]
+                self.failed.append(index)
+                if self.error_log:
+                    self.error_log.write('-- statement %i: %s\n%s\n' % (
+                        index, str(error).replace('\n', ' '),
+                        statement.rstrip()))
+                if not self.continue_on_error:
+                    self.stopped = True
+            print('%8.3fs  #%-5i %s%s' % (
+                seconds, index, first_line(statement), status), file=out)
+            self._pending -= 1
+            self._cond.notify_all()
+        self._slots.release()
+
+    def wait(self):
+        """Wait for all running statements to finish."""
+        with self._cond:
+            while self._pending:
+                self._cond.wait(0.5)
+
+    def run(self, statements, start=0):
+        """Run statements, an iterable of sql strings and BARRIERs.
+
+        Args:
+            statements: eg. iter_statements(fin, barriers=True).
+            start: skip the first `start` statements.
+        """
+        pool = ThreadPool(self.workers)
+        index = -1
+        try:
+            for statement in statements:
+                if statement is BARRIER:
+                    self.wait()
+                    continue
+                index += 1
+                if index < start:
+                    continue
+                if self.stopped:
+                    break
+                if statement.strip().lower() in ('commit', 'rollback'):
+                    continue  # each statement has its own transaction
+                self._slots.acquire()
+                with self._cond:
+                    self._pending += 1
+                pool.apply_async(self.execute, (index, statement),
+                                 callback=self.finished)
+            self.wait()
+        except KeyboardInterrupt:
+            self.stopped = self.interrupted = True
+            print("Cancelled, waiting for running statements to finish",
+                  file=self.out or sys.stdout)
+            self.wait()
+        finally:
+            pool.close()
+            pool.join()
+
+    def summary(self):
+        """Return a summary of throughput and the slowest statements."""
+        lines = [self.progress.summary()]
+        if self.slowest:
+            lines.append('Slowest statements:')
+            for seconds, index, line in sorted(self.slowest, reverse=True):
+                lines.append('%8.3fs  #%-5i %s' % (seconds, index, line))
+        return '\n'.join(lines)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""
+Trace every DB-API statement which ipydb runs.
+
+While tracing is on, SqlAlchemy's cursor execute events on all engines
+record each statement with its duration, rowcount and the ipydb
+subsystem which ran it (user queries, schema reflection, the metadata
+cache, ...) in a bounded ring buffer. This shows, for example, how many
+catalog queries reflection makes.
+
+Code marks the subsystem it runs statements for with:
+
+    with trace.subsystem('reflection'):
+        metadata.reflect()
+
+or, for engines which only ipydb uses, with:
+
+    trace.label_engine(engine, 'metadata')
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from collections import deque
+import datetime as dt
+import threading
+import time
+import weakref
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+
+from ipydb.engine import engine_key
+
+DEFAULT_SUBSYSTEM = 'query'
+_local = threading.local()
+# engine -> subsystem for every statement run on it
+_engine_labels = weakref.WeakKeyDictionary()
+
+
+def label_engine(engine, name):
+    """Trace all statements run on engine as subsystem name."""
+    _engine_labels[engine] = name
+
+
+class subsystem(object):
+    """Context manager labelling statements run in this thread."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if not hasattr(_local, 'stack'):
+            _local.stack = []
+        _local.stack.append(self.name)
+        return self
+
+    def __exit__(self, ty, val, tb):
+        _local.stack.pop()
+        return False
+
+
+def current_subsystem():
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else DEFAULT_SUBSYSTEM
+
+
+class TracedStatement(object):
+    """One DB-API execute() or executemany()."""
+
+    __slots__ = ('started', 'ms', 'subsystem', 'database', 'statement',
+                 'rowcount', 'executemany', 'error', 'thread')
+
+    def __init__(self, subsystem, database, statement, executemany):
+        self.started = dt.datetime.now()
+        self.ms = None
+        self.subsystem = subsystem
+        self.database = database
+        self.statement = statement
+        self.rowcount = None
+        self.executemany = executemany
+        self.error = None
+        self.thread = threading.current_thread().name
+
+
+class StatementTracer(object):
+    """Records statements from SqlAlchemy events in a ring buffer.
+
+    Usage:
+        tracer = StatementTracer(maxlen=1000)
+        tracer.start()
+        engine.execute('select 1')
+        tracer.stop()
+        for stmt in tracer.statements():
+            print(stmt.ms, stmt.statement)
+    """
+
+    def __init__(self, maxlen=1000):
+        """Constructor.
+
+        Args:
+            maxlen: number of statements to keep, the oldest are dropped.
+        """
+        self.buffer = deque(maxlen=maxlen)
+        self.tracing = False
+        self._lock = threading.Lock()
+        self._databases = weakref.WeakKeyDictionary()
+
+    @property
+    def maxlen(self):
+        return self.buffer.maxlen
+
+    def resize(self, maxlen):
+        with self._lock:
+            self.buffer = deque(self.buffer, maxlen=maxlen)
+
+    def start(self):
+        """Start tracing statements on every engine."""
+        if not self.tracing:
+            sa.event.listen(Engine, 'before_cursor_execute', self.before)
+            sa.event.listen(Engine, 'after_cursor_execute', self.after)
+            sa.event.listen(Engine, 'handle_error', self.failed)
+            self.tracing = True
+
+    def stop(self):
+        if self.tracing:
+            sa.event.remove(Engine, 'before_cursor_execute', self.before)
+            sa.event.remove(Engine, 'after_cursor_execute', self.after)
+            sa.event.remove(Engine, 'handle_error', self.failed)
+            self.tracing = False
+
+    def clear(self):
+        with self._lock:
+            self.buffer.clear()
+
+    def before(self, conn, cursor, statement, parameters, context,
+               executemany):
+        database = self._databases.get(conn.engine)
+        if database is None:
+            database = self._databases[conn.engine] = \
+                engine_key(conn.engine.url)
+        label = _engine_labels.get(conn.engine) or current_subsystem()
+        traced = TracedStatement(label, database, statement, executemany)
+        conn.info.setdefault('ipydb_trace', []).append((time.time(), traced))
+
+    def pop(self, conn):
+        stack = conn.info.get('ipydb_trace')
+        if not stack:
+            return None
+        start, traced = stack.pop()
+        traced.ms = (time.time() - start) * 1000
+        with self._lock:
+            self.buffer.append(traced)
+        return traced
+
+    def after(self, conn, cursor, statement, parameters, context,
+              executemany):
+        traced = self.pop(conn)
+        if traced is not None:
+            traced.rowcount = getattr(cursor, 'rowcount', None)
+
+    def failed(self, context):
+        if context.connection is None:
+            return  # connecting failed, before any statement was run
+        traced = self.pop(context.connection)
+        if traced is not None:
+            traced.error = str(context.original_exception).strip() \
+                .split('\n')[0]
+
+    def statements(self, subsystem=None):
+        """Return traced statements, oldest first."""
+        with self._lock:
+            traced = list(self.buffer)
+        if subsystem:
+            traced = [t for t in traced if t.subsystem == subsystem]
+        return traced
+
+    def summary(self):
+        """Return (subsystem, statements, total ms) for each subsystem."""
+        totals = {}
+        for traced in self.statements():
+            count, ms = totals.get(traced.subsystem, (0, 0.0))
+            totals[traced.subsystem] = (count + 1, ms + traced.ms)
+        return [(name, count, ms)
+                for name, (count, ms) in sorted(totals.items())]
+
+
+tracer = StatementTracer()
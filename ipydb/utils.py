@@ -1,47 +1,107 @@
 """Helpers and utils."""
 
-import codecs
 import csv
-from io import BytesIO as StringIO
+import io
+import itertools
+import re
 import time
 
 from builtins import input
-from past.builtins import basestring
+import sqlparse
 
+from ipydb.metrics import registry
 
-class UnicodeWriter:
-    """
-    A CSV writer which will write rows to CSV file "f",
-    which is encoded in the given encoding.
+
+# names for the csv module's quoting styles
+QUOTING = {
+    'minimal': csv.QUOTE_MINIMAL,
+    'all': csv.QUOTE_ALL,
+    'nonnumeric': csv.QUOTE_NONNUMERIC,
+    'none': csv.QUOTE_NONE,
+}
+# rows encoded at a time when writing to a binary file
+CSV_BATCH_ROWS = 1000
+
+
+class CsvWriter(object):
+    """Stream rows to a file as CSV (or TSV) with the csv module.
+
+    Text files are written to directly. Rows for binary files, eg. the
+    pager's stdin, are formatted in batches which are encoded and
+    written in one go.
+
+    Usage:
+        with io.open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = CsvWriter(f, delimiter='\t', null='NULL')
+            writer.writerow(cursor.keys())
+            writer.writerows(cursor)
     """
 
-    def __init__(self, f, dialect=csv.excel, encoding="utf-8", **kwds):
-        # Redirect output to a queue
-        self.queue = StringIO()
-        self.writer = csv.writer(self.queue, dialect=dialect, **kwds)
+    def __init__(self, f, delimiter=',', quoting='minimal', null='',
+                 encoding='utf-8'):
+        """Constructor.
+
+        Args:
+            f: file-like object to write to.
+            delimiter: field separator, eg. '\t' for TSV.
+            quoting: one of QUOTING's keys.
+            null: what to write for None.
+            encoding: used when f is a binary file.
+        """
         self.stream = f
-        self.encoder = codecs.getincrementalencoder(encoding)()
+        self.null = null
+        self.encoding = encoding
+        self.binary = not isinstance(f, io.TextIOBase)
+        self.buffer = io.StringIO() if self.binary else None
+        self.writer = csv.writer(
+            self.buffer if self.binary else f, delimiter=delimiter,
+            quoting=QUOTING[quoting],
+            escapechar='\\' if quoting == 'none' else None)
+
+    def drain(self):
+        """Write out rows formatted for a binary file."""
+        self.stream.write(self.buffer.getvalue().encode(self.encoding))
+        self.buffer.seek(0)
+        self.buffer.truncate()
 
     def writerow(self, row):
-        try:
-            self.writer.writerow([s.decode('utf8').encode("utf-8") if isinstance(s, basestring)
-                                  else s for s in row])
-        except:
-            self.writer.writerow([s.encode("utf-8") if isinstance(s, basestring)
-                                  else s for s in row])
-        # Fetch UTF-8 output from the queue ...
-        data = self.queue.getvalue()
-        data = data.decode("utf-8")
-        # ... and reencode it into the target encoding
-        data = self.encoder.encode(data)
-        # write to the target stream
-        self.stream.write(data)
-        # empty queue
-        self.queue.truncate(0)
+        self.writerows([row])
 
     def writerows(self, rows):
-        for row in rows:
-            self.writerow(row)
+        if self.null != '':  # the csv module writes None as ''
+            null = self.null
+            rows = ([null if value is None else value for value in row]
+                    for row in rows)
+        if not self.binary:
+            self.writer.writerows(rows)
+            return
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, CSV_BATCH_ROWS))
+            if not batch:
+                break
+            self.writer.writerows(batch)
+            self.drain()
+
+
+def normalize_sql(sql):
+    """Return sql with comments removed, whitespace collapsed and
+    keywords in lower case, so that trivially different statements
+    compare equal."""
+    return sqlparse.format(sql.strip().rstrip(';'), strip_comments=True,
+                           strip_whitespace=True, keyword_case='lower')
+
+
+LITERALS = re.compile(r"'(?:''|[^'])*'|\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b",
+                      re.I)
+IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+def parameterize_sql(sql):
+    """Return normalize_sql(sql) with literal values replaced by '?', so
+    that statements which only differ in their values compare equal."""
+    sql = LITERALS.sub('?', normalize_sql(sql))
+    return IN_LISTS.sub('(?)', sql)
 
 
 def multi_choice_prompt(prompt, choices, default=None):
@@ -67,19 +127,36 @@ class timer(object):
     """Timer Context Manager.
 
     Usage:
-        with(timer("doing something")):
+        with(timer("doing something")) as t:
             time.sleep(10)
+        t.ms  # milliseconds elapsed
+
+    If metric is given, the duration is also recorded in that histogram
+    of the ipydb.metrics registry, with any other keyword arguments as
+    its labels. For per-query execute/fetch/render timings, see
+    ipydb.history.
     """
-    def __init__(self, name='timer', log=None):
+    def __init__(self, name='timer', log=None, quiet=False, metric=None,
+                 **labels):
         self.name = name
         self.log = log
+        self.quiet = quiet
+        self.metric = metric
+        self.labels = labels
+        self.ms = None
 
     def __enter__(self):
         self.start = time.time()
+        return self
 
     def __exit__(self, ty, val, tb):
         end = time.time()
-        msg = "%s : %0.3f ms" % (self.name, (end - self.start) * 1000)
+        self.ms = (end - self.start) * 1000
+        if self.metric:
+            registry.histogram(self.metric, **self.labels).observe(self.ms)
+        if self.quiet:
+            return False
+        msg = "%s : %0.3f ms" % (self.name, self.ms)
         if self.log and hasattr(self.log, 'debug'):
             self.log.debug(msg)
         else:
@@ -87,6 +164,23 @@ class timer(object):
         return False
 
 
+SIZE = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*([kmgt]?)i?b?\s*$', re.I)
+
+
+def parse_size(text):
+    """Return a number of bytes from eg. '500', '64k', '1.5G' or '2GB'.
+
+    Raises:
+        ValueError: if text isn't a size.
+    """
+    match = SIZE.match(text)
+    if not match:
+        raise ValueError('invalid size: %r' % text)
+    number, unit = match.groups()
+    power = ' kmgt'.index(unit.lower()) if unit else 0
+    return int(float(number) * 1024 ** power)
+
+
 def termsize():
     """Try to figure out the size of the current terminal.
 
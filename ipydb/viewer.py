@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""
+A full screen result viewer which runs in-process, using prompt_toolkit.
+
+Unlike piping a rendered table into less, rows are only fetched and
+formatted as they are scrolled into view: the viewer asks its source for
+blocks of rows around the visible window, keeps at most MAX_BLOCKS of
+them formatted, and draws only the rows and columns which fit on the
+screen, under a header which doesn't scroll away. So the cost of viewing
+a result depends on how much of it is looked at, not on its size.
+
+Sources are ResultSetRows, which reads a cursor lazily through a
+resultset.ResultSet, and BufferRows, which reads the current view of a
+buffer.ResultBuffer:
+
+    Viewer(ResultSetRows(ResultSet(cursor))).run()
+
+:copyright: (c) 2012 by Jay Sweeney.
+:license: see LICENSE for more details.
+"""
+from collections import OrderedDict
+
+from ipydb.asciitable import cell_values
+
+# prompt_toolkit comes with IPython, but check for it anyway
+_has_prompt_toolkit = False
+try:
+    from prompt_toolkit.application import Application
+    from prompt_toolkit.key_binding import KeyBindings
+    from prompt_toolkit.layout import FormattedTextControl, HSplit, Layout, \
+        Window
+    _has_prompt_toolkit = True
+except ImportError:
+    pass
+
+# rows fetched and formatted at a time
+BLOCK_ROWS = 200
+# most blocks of formatted rows to keep
+MAX_BLOCKS = 10
+# columns moved by one horizontal scroll
+SCROLL_COLUMNS = 8
+# lines taken by the header and the status line
+HEADER_LINES = 3
+STATUS_LINES = 1
+
+HELP = 'j/k, space/b: scroll  h/l: left/right  g/G: first/last  q: quit'
+
+
+class ResultSetRows(object):
+    """Rows of a resultset.ResultSet, which fetches them from its
+    cursor as they are asked for."""
+
+    def __init__(self, result_set):
+        self.result_set = result_set
+
+    def keys(self):
+        return self.result_set.keys()
+
+    def rows(self, start, stop):
+        return self.result_set[start:stop]
+
+    def count(self):
+        """Return (rows read so far, True if that is all of them)."""
+        return self.result_set.fetched, self.result_set.exhausted
+
+    def total(self):
+        """Return the number of rows, reading all of them."""
+        self.result_set.fetch_to(None)
+        return self.result_set.fetched
+
+    def close(self):
+        self.result_set.close()
+
+
+class BufferRows(object):
+    """Rows of the current view (see sort() and grep()) of a
+    buffer.ResultBuffer."""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.rows_in_view = buf.count()
+
+    def keys(self):
+        return self.buf.headings
+
+    def rows(self, start, stop):
+        return list(self.buf.fetch(start, stop - start))
+
+    def count(self):
+        return self.rows_in_view, True
+
+    def total(self):
+        return self.rows_in_view
+
+    def close(self):
+        pass
+
+
+class WindowCache(object):
+    """Formatted rows of a source, a block of block_rows at a time.
+
+    Only the blocks most recently asked for are kept. Column widths are
+    the widest heading or value formatted so far.
+    """
+
+    def __init__(self, source, max_fieldsize=100, block_rows=BLOCK_ROWS,
+                 max_blocks=MAX_BLOCKS):
+        self.source = source
+        self.headings = [str(heading) for heading in source.keys()]
+        self.sizes = [max_fieldsize] * len(self.headings)
+        self.widths = [len(heading) for heading in self.headings]
+        self.block_rows = block_rows
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()
+        self.fetched = 0  # blocks read from the source, for testing
+
+    def block(self, idx):
+        cells = self.blocks.get(idx)
+        if cells is not None:
+            self.blocks.pop(idx)
+            self.blocks[idx] = cells  # most recently used
+            return cells
+        start = idx * self.block_rows
+        cells = cell_values(self.source.rows(start, start + self.block_rows),
+                            self.sizes)
+        self.fetched += 1
+        for values in cells:
+            self.widths = [max(width, len(value)) for width, value
+                           in zip(self.widths, values)]
+        self.blocks[idx] = cells
+        while len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+        return cells
+
+    def rows(self, start, stop):
+        """Return the formatted cells of rows start to stop, fewer if the
+        result ends before stop."""
+        cells = []
+        for idx in range(start // self.block_rows,
+                         (stop - 1) // self.block_rows + 1):
+            block = self.block(idx)
+            offset = idx * self.block_rows
+            cells.extend(block[max(start - offset, 0):stop - offset])
+            if len(block) < self.block_rows:
+                break
+        return cells
+
+
+class Viewer(object):
+    """Scrolls through a source of rows in a full screen application.
+    """
+
+    def __init__(self, source, max_fieldsize=100, title=None, input=None,
+                 output=None):
+        """Constructor.
+
+        Args:
+            source: ResultSetRows or BufferRows.
+            max_fieldsize: longest value to show, longer ones are cut.
+            title: shown in the status line, eg. the SQL statement.
+            input, output: prompt_toolkit Input and Output, default: the
+                           terminal.
+        """
+        self.source = source
+        self.cache = WindowCache(source, max_fieldsize)
+        self.title = title
+        self.top = 0
+        self.left = 0
+        self.app = Application(
+            layout=Layout(HSplit([
+                Window(FormattedTextControl(self.header_text),
+                       height=HEADER_LINES),
+                Window(FormattedTextControl(self.body_text)),
+                Window(FormattedTextControl(self.status_text),
+                       height=STATUS_LINES, style='reverse'),
+            ])),
+            key_bindings=self.key_bindings(), full_screen=True,
+            input=input, output=output)
+
+    def screen_size(self):
+        """Return (rows of the result which fit, columns)."""
+        size = self.app.output.get_size()
+        return (max(1, size.rows - HEADER_LINES - STATUS_LINES),
+                size.columns)
+
+    def visible(self):
+        height = self.screen_size()[0]
+        return self.cache.rows(self.top, self.top + height)
+
+    def clip(self, line):
+        return line[self.left:self.left + self.screen_size()[1]]
+
+    def header_text(self):
+        widths = self.cache.widths
+        rule = ''.join('+' + '-' * (width + 2) for width in widths) + '+'
+        fmt = ''.join('| %%-%is ' % width for width in widths) + '|'
+        return [('bold', '\n'.join(self.clip(line) for line in (
+            rule, fmt % tuple(self.cache.headings), rule)))]
+
+    def body_text(self):
+        rows = self.visible()
+        fmt = ''.join('| %%-%is ' % width for width in self.cache.widths) \
+            + '|'
+        return '\n'.join(self.clip(fmt % tuple(values)) for values in rows)
+
+    def status_text(self):
+        shown = len(self.visible())
+        count, complete = self.source.count()
+        bits = ['rows %i-%i of %i%s' % (
+            self.top + 1 if shown else 0, self.top + shown, count,
+            '' if complete else '+')]
+        if self.title:
+            bits.append(' '.join(self.title.split())[:60])
+        bits.append(HELP)
+        return ' | '.join(bits)
+
+    def scroll(self, rows):
+        """Move the window down by rows, up if rows is negative, keeping
+        it on the result."""
+        height = self.screen_size()[0]
+        self.top = max(0, self.top + rows)
+        # read as far as the window, to tell if the result ends before it
+        self.cache.rows(self.top, self.top + height)
+        count, complete = self.source.count()
+        if complete:
+            self.top = max(0, min(self.top, count - height))
+
+    def scroll_to_end(self):
+        height = self.screen_size()[0]
+        self.top = max(0, self.source.total() - height)
+
+    def scroll_right(self, columns):
+        width = sum(self.cache.widths) + 3 * len(self.cache.widths) + 1
+        self.left = max(0, min(self.left + columns,
+                               width - self.screen_size()[1]))
+
+    def key_bindings(self):
+        kb = KeyBindings()
+
+        def bind(keys, action):
+            for key in keys:
+                kb.add(key)(lambda event: action())
+
+        def page():
+            return self.screen_size()[0]
+        bind(['q', 'escape', 'c-c'], lambda: self.app.exit())
+        bind(['down', 'j', 'enter'], lambda: self.scroll(1))
+        bind(['up', 'k'], lambda: self.scroll(-1))
+        bind(['pagedown', 'space', 'f', 'c-f'],
+             lambda: self.scroll(page()))
+        bind(['pageup', 'b', 'c-b'], lambda: self.scroll(-page()))
+        bind(['home', 'g'], lambda: self.scroll(-self.top))
+        bind(['end', 'G'], self.scroll_to_end)
+        bind(['right', 'l'], lambda: self.scroll_right(SCROLL_COLUMNS))
+        bind(['left', 'h'], lambda: self.scroll_right(-SCROLL_COLUMNS))
+        bind(['0'], lambda: self.scroll_right(-self.left))
+        bind(['$'], lambda: self.scroll_right(sum(self.cache.widths) * 4))
+        return kb
+
+    def run(self):
+        self.app.run()
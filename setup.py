@@ -8,7 +8,8 @@ requires = ['SQLAlchemy', 'ipython>=1.0', 'python-dateutil', 'sqlparse',
             'future']
 tests_require = ['nose', 'mock==1.0.1']
 extras_require = {'doc': ['Sphinx==1.2.3', 'sphinx-rtd-theme==0.1.6'],
-                  'notebook': ['pandas>=0.16.2']
+                  'notebook': ['pandas>=0.16.2'],
+                  'arrow': ['pyarrow'],
                   }
 description = "An IPython extension to help you write and run SQL statements"
 
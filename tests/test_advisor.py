@@ -0,0 +1,73 @@
+import unittest
+
+import nose.tools as nt
+
+from ipydb import advisor
+from ipydb.metadata import model as m
+
+
+def stat(statement, total_ms, count=1):
+    return {'statement': statement, 'total_ms': total_ms, 'count': count}
+
+
+class AdvisorTest(unittest.TestCase):
+
+    def setUp(self):
+        person = m.Table(id=1, name='person')
+        person.columns = [
+            m.Column(id=1, name='id', type='INTEGER', primary_key=True),
+            m.Column(id=2, name='name', type='TEXT', primary_key=False),
+            m.Column(id=3, name='city', type='TEXT', primary_key=False),
+            m.Column(id=4, name='born', type='DATE', primary_key=False),
+        ]
+        person.indexes = [m.Index(id=1, name='person_name', table=person,
+                                  columns=[person.columns[1]])]
+        pet = m.Table(id=2, name='pet')
+        pet.columns = [
+            m.Column(id=5, name='id', type='INTEGER', primary_key=True),
+            m.Column(id=6, name='person_id', type='INTEGER',
+                     primary_key=False),
+            m.Column(id=7, name='species', type='TEXT', primary_key=False),
+        ]
+        pet.indexes = []
+        self.db = m.Database([person, pet])
+
+    def test_used_columns(self):
+        used = advisor.used_columns(
+            "select * from person p inner join pet on pet.person_id = p.id "
+            "where p.born > '2000-01-01' and p.city = 'Paris' "
+            "and species in ('cat', 'dog') order by p.name desc", self.db)
+        nt.assert_equal(['city', 'id', 'born', 'name'], used['person'][1])
+        nt.assert_equal(['species', 'person_id'], used['pet'][1])
+
+    def test_range_columns(self):
+        used = advisor.used_columns(
+            "select * from person where born > '2000-01-01' and id < 10",
+            self.db)
+        nt.assert_equal(['born'], used['person'][1])
+
+    def test_is_covered(self):
+        person = self.db.tables['person']
+        nt.assert_true(advisor.is_covered(self.db, person, ['id']))
+        nt.assert_true(advisor.is_covered(self.db, person, ['Name']))
+        nt.assert_false(advisor.is_covered(self.db, person,
+                                           ['name', 'city']))
+
+    def test_advise(self):
+        stats = [
+            stat("select * from person where city = 'Paris'", 500, 10),
+            stat("select * from person where city = 'Rome' "
+                 "order by born", 300, 2),
+            stat("select * from pet where species = 'cat'", 100),
+            stat("select * from person where name = 'Bob'", 10000),
+            stat("select * from person where id = 1", 10000),
+            stat("select * from pet where species = 'dog'", 0),
+        ]
+        candidates = advisor.advise(stats, self.db)
+        nt.assert_equal(['create index ix_person_city_born on person '
+                         '(city, born)',
+                         'create index ix_pet_species on pet (species)'],
+                        [c.create_statement() for c in candidates])
+        nt.assert_equal(800, candidates[0].total_ms)
+        nt.assert_equal(12, candidates[0].count)
+        nt.assert_equal(1, len(advisor.advise(stats, self.db, limit=1)))
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from io import BytesIO
+import unittest
+
+import mock
+import nose.tools as nt
+
+from ipydb import asciitable
+from ipydb.asciitable import FakedResult, PivotResultSet, row_class
+
+
+class DrawTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('ipydb.asciitable.termsize',
+                             return_value=(80, 6))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def draw(self, rows, headings, **kw):
+        out = BytesIO()
+        asciitable.draw(FakedResult(rows, headings), out=out, **kw)
+        return out.getvalue().decode('utf8')
+
+    def test_draw(self):
+        text = self.draw([(1, 'one'), (22, None)], ['id', 'name'])
+        nt.assert_equal(
+            '+----+------+\n'
+            '| id | name |\n'
+            '+----+------+\n'
+            '| 1  | one  |\n'
+            '| 22 | None |\n', text)
+
+    def test_sanitize(self):
+        text = self.draw([('a\nb\r\tc' + 'x' * 20,)], ['v'],
+                         max_fieldsize=10)
+        nt.assert_in('| a^b^ [...] |\n', text)
+
+    def test_unicode(self):
+        text = self.draw([(u'caf\xe9',)], ['v'])
+        nt.assert_in(u'| caf\xe9 |\n', text)
+
+    def test_paginate(self):
+        # 6 lines leaves two rows per page, widths grow page by page
+        rows = [(1,), (2,), (333,)]
+        text = self.draw(rows, ['n'])
+        nt.assert_equal(
+            '+---+\n| n |\n+---+\n| 1 |\n| 2 |\n'
+            '+-----+\n| n   |\n+-----+\n| 333 |\n', text)
+
+    def test_flushes_first_page(self):
+        out = mock.MagicMock()
+        rows = [(i,) for i in range(5)]
+        asciitable.draw(FakedResult(rows, ['n']), out=out)
+        # first page straight away, the rest together at the end
+        nt.assert_equal(2, out.write.call_count)
+
+    def test_pivot(self):
+        Row = row_class(['id', 'name'])
+        text = self.draw(PivotResultSet([Row((1, 'one'))]), ['Field', 'Value'],
+                         paginate=False)
+        nt.assert_equal(
+            '+-------+-------+\n'
+            '| Field | Value |\n'
+            '+-------+-------+\n'
+            '| id    | 1     |\n'
+            '| name  | one   |\n'
+            '+-------+-------+\n\n', text)
+
+
+class DrawStreamTest(unittest.TestCase):
+
+    def draw(self, rows, headings, **kw):
+        out = BytesIO()
+        asciitable.draw_stream(FakedResult(rows, headings), out=out, **kw)
+        return out.getvalue().decode('utf8')
+
+    def test_sampled_widths(self):
+        rows = [(1, 'ab'), (2, 'abcdefghijkl'), (3, 'abc')]
+        text = self.draw(rows, ['id', 'name'], sample_size=1,
+                         widths=[None, 8])
+        nt.assert_equal(
+            '+----+----------+\n'
+            '| id | name     |\n'
+            '+----+----------+\n'
+            '| 1  | ab       |\n'
+            '| 2  | abc[...] |\n'
+            '| 3  | abc      |\n'
+            '+----+----------+\n', text)
+
+    def test_empty(self):
+        nt.assert_equal('+----+\n| id |\n+----+\n+----+\n',
+                        self.draw([], ['id'], widths=[10]))
+
+    def test_all_sampled(self):
+        # declared widths aren't needed when every row has been measured
+        text = self.draw([(1, 'ab')], ['id', 'name'], widths=[11, 40])
+        nt.assert_in('| 1  | ab   |\n', text)
+
+    def test_type_width(self):
+        nt.assert_equal(40, asciitable.type_width('VARCHAR(40)'))
+        nt.assert_equal(12, asciitable.type_width('NUMERIC(10, 2)'))
+        nt.assert_equal(11, asciitable.type_width('INTEGER'))
+        nt.assert_equal(32, asciitable.type_width(
+            'TIMESTAMP WITH TIME ZONE'))
+        nt.assert_is_none(asciitable.type_width('TEXT'))
+        nt.assert_is_none(asciitable.type_width(''))
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+from decimal import Decimal
+from io import BytesIO
+import os
+import re
+import unittest
+
+from IPython.terminal.interactiveshell import TerminalInteractiveShell
+import mock
+import nose.tools as nt
+
+from ipydb import buffer, plugin
+from ipydb.asciitable import FakedResult
+from ipydb.buffer import BufferingResult, ResultBuffer
+from ipydb.resultset import ResultSet
+
+
+class ResultBufferTest(unittest.TestCase):
+
+    headings = ['id', 'city', 'total', 'day']
+
+    def setUp(self):
+        self.rows = [
+            (1, u'Berlin', Decimal('10.5'), dt.date(2015, 1, 2)),
+            (2, u'Paris', Decimal('9.25'), None),
+            (3, u'berne', Decimal('100'), dt.date(2015, 1, 1)),
+        ]
+        self.buf = ResultBuffer(self.headings,
+                                types=['integer', 'string', 'decimal(10,2)',
+                                       'date'])
+
+    def tearDown(self):
+        self.buf.close()
+
+    def fill(self):
+        result = BufferingResult(FakedResult(self.rows, self.headings),
+                                 self.buf)
+        nt.assert_equal(self.rows, list(result))
+        nt.assert_true(self.buf.complete)
+
+    def test_fetch(self):
+        self.fill()
+        nt.assert_equal([(1, u'Berlin', u'10.5', u'2015-01-02'),
+                         (2, u'Paris', u'9.25', None)],
+                        list(self.buf.fetch(limit=2)))
+        nt.assert_equal([3], [r[0] for r in self.buf.fetch(offset=2)])
+
+    def test_sort(self):
+        self.fill()
+        self.buf.sort('TOTAL')  # as numbers, not strings
+        nt.assert_equal([2, 1, 3], [r[0] for r in self.buf.fetch()])
+        self.buf.sort('day', descending=True)
+        nt.assert_equal([1, 3, 2], [r[0] for r in self.buf.fetch()])
+        self.buf.sort()
+        nt.assert_equal([1, 2, 3], [r[0] for r in self.buf.fetch()])
+        with nt.assert_raises(KeyError):
+            self.buf.sort('nothing')
+
+    def test_grep(self):
+        self.fill()
+        self.buf.grep('^BER')
+        nt.assert_equal([], list(self.buf.fetch()))
+        self.buf.grep('^BER', ignore_case=True)
+        nt.assert_equal([1, 3], [r[0] for r in self.buf.fetch()])
+        nt.assert_equal(2, self.buf.count())
+        self.buf.grep(r'\.25')
+        nt.assert_equal([2], [r[0] for r in self.buf.fetch()])
+        self.buf.grep()
+        nt.assert_equal(3, self.buf.count())
+        with nt.assert_raises(re.error):
+            self.buf.grep('(')
+
+    def test_stopped_early(self):
+        buffer.BATCH_ROWS, batch = 2, buffer.BATCH_ROWS
+        try:
+            rows = iter(BufferingResult(FakedResult(self.rows, self.headings),
+                                        self.buf))
+            next(rows)
+            rows.close()
+        finally:
+            buffer.BATCH_ROWS = batch
+        nt.assert_false(self.buf.complete)
+        nt.assert_equal(1, self.buf.rows)
+        nt.assert_equal([1], [r[0] for r in self.buf.fetch()])
+
+    def test_close(self):
+        path = self.buf.path
+        nt.assert_true(os.path.exists(path))
+        self.buf.close()
+        nt.assert_false(os.path.exists(path))
+
+
+class PluginBufferTest(unittest.TestCase):
+    """%page, %sort and %grep, through SqlPlugin."""
+
+    def setUp(self):
+        patchers = [
+            mock.patch('ipydb.plugin.engine.getconfigs',
+                       return_value=(None, {})),
+            mock.patch('ipydb.plugin.pager'),
+            mock.patch('ipydb.plugin.termsize', return_value=(80, 6)),
+        ]
+        mocks = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        self.out = BytesIO()
+        mocks[1].return_value.__enter__.return_value = self.out
+        ipython = mock.MagicMock(spec=TerminalInteractiveShell)
+        ipython.config = None
+        ipython.register_magics = mock.MagicMock()
+        ipython.Completer = mock.MagicMock()
+        self.ip = plugin.SqlPlugin(shell=ipython)
+        self.addCleanup(self.ip.close_result_buffer)
+        self.result = FakedResult([(1, 'b'), (2, 'a'), (3, 'c')],
+                                  ['id', 'x'])
+
+    def drawn_ids(self):
+        ids = [int(line.split(b'|')[1]) for line
+               in self.out.getvalue().splitlines()
+               if line.startswith(b'| ') and b'id' not in line]
+        self.out.seek(0)
+        self.out.truncate()
+        return ids
+
+    def test_off_until_used(self):
+        self.ip.render_result(self.result, query='select * from t')
+        nt.assert_is_none(self.ip.result_buffer)
+        with mock.patch('ipydb.plugin.print', create=True) as mprint:
+            self.ip.show_page()
+        nt.assert_in('now on', mprint.call_args[0][0])
+        nt.assert_true(self.ip.buffer_results)
+
+    def test_result_buffer(self):
+        self.ip.buffer_results = True
+        self.ip.render_result(self.result, query='select * from t')
+        buf = self.ip.result_buffer
+        nt.assert_equal(3, buf.rows)
+        self.drawn_ids()
+        with mock.patch('ipydb.plugin.print', create=True) as mprint:
+            self.ip.sort_result('x', descending=True)
+            self.ip.show_page(2)
+        # the sorted result, then its second page
+        nt.assert_equal([3, 1, 2, 2], self.drawn_ids())
+        mprint.assert_called_with('Page 2 of 2, 3 rows')
+        self.ip.close_result_buffer()
+        nt.assert_false(os.path.exists(buf.path))
+        with mock.patch('ipydb.plugin.print', create=True) as mprint:
+            self.ip.grep_result('a')
+        nt.assert_true(mprint.called)
+
+    def test_pivot_is_not_buffered(self):
+        self.ip.buffer_results = True
+        rs = ResultSet(self.result, query='select * from t',
+                       render=self.ip.render_result)
+        rs.pivot()
+        nt.assert_in(b'| id    | 3     |', self.out.getvalue())
+        nt.assert_is_none(self.ip.result_buffer)
@@ -0,0 +1,103 @@
+import time
+import unittest
+
+import nose.tools as nt
+import sqlalchemy as sa
+
+from ipydb import cache
+from ipydb.asciitable import PivotResultSet
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        self.engine.execute('create table person (id integer, name text)')
+        self.engine.execute("insert into person values (1, 'Bob')")
+        self.cache = cache.ResultCache(max_bytes=10000, ttl=60)
+
+    def run_select(self, key='k', sql='select * from person'):
+        result = self.cache.get(key)
+        if result is None:
+            result = self.cache.wrap(key, sql, self.engine.execute(sql))
+        return list(result)
+
+    def test_referenced_names(self):
+        nt.assert_equal(set(['select', 'x', 'from', 's', 'person',
+                             'where', 'y']),
+                        cache.referenced_names(
+                            "select x from s.Person where y = 'Other'"))
+
+    def test_modified_table(self):
+        nt.assert_equal('person', cache.modified_table(
+            'insert ignore into "S".Person values (1)'))
+        nt.assert_equal('person', cache.modified_table(
+            'update only person set x = 1'))
+        nt.assert_equal('person', cache.modified_table(
+            'DELETE FROM person'))
+        nt.assert_is_none(cache.modified_table('drop table person'))
+
+    def test_hit_and_miss(self):
+        nt.assert_equal([(1, 'Bob')], self.run_select())
+        rows = self.run_select()
+        nt.assert_equal([(1, 'Bob')], rows)
+        nt.assert_equal(['id', 'name'], rows[0].keys())
+        nt.assert_equal([[('id', 1), ('name', 'Bob')]],
+                        [list(r) for r in PivotResultSet(rows)])
+        stats = self.cache.stats()
+        nt.assert_equal((1, 1, 1), (stats['hits'], stats['misses'],
+                                    stats['entries']))
+
+    def test_invalidation(self):
+        self.run_select()
+        self.cache.invalidate_for("update other set x = 1", 'update')
+        nt.assert_equal(1, len(self.cache.entries))
+        self.cache.invalidate_for("delete from Person", 'delete')
+        nt.assert_equal(0, len(self.cache.entries))
+        self.run_select()
+        self.cache.invalidate_for("alter table other add y int", 'alter')
+        nt.assert_equal(0, len(self.cache.entries))
+        nt.assert_equal(2, self.cache.stats()['invalidations'])
+
+    def test_ttl(self):
+        self.cache.ttl = 0.01
+        self.run_select()
+        time.sleep(0.02)
+        nt.assert_is_none(self.cache.get('k'))
+
+    def test_lru_eviction(self):
+        self.run_select('a')
+        nbytes = self.cache.nbytes
+        self.cache.max_bytes = nbytes * 2
+        self.run_select('b')
+        self.cache.get('a')  # b is now least recently used
+        self.run_select('c')
+        nt.assert_equal(['a', 'c'], list(self.cache.entries))
+        nt.assert_equal(1, self.cache.stats()['evictions'])
+
+    def test_big_results_not_cached(self):
+        self.engine.execute('insert into person values (?, ?)',
+                            [(i, 'x' * 100) for i in range(500)])
+        nt.assert_equal(501, len(self.run_select()))
+        nt.assert_equal(0, len(self.cache.entries))
+
+    def test_partly_read_results_not_cached(self):
+        result = self.cache.wrap('k', 'select 1', self.engine.execute(
+            'select 1'))
+        result.fetchone()
+        nt.assert_equal(0, len(self.cache.entries))
+
+    def test_fetch_methods_feed_the_cache(self):
+        self.engine.execute("insert into person values (2, 'Jo')")
+        self.engine.execute("insert into person values (3, 'Al')")
+        sql = 'select * from person'
+        result = self.cache.wrap('k', sql, self.engine.execute(sql))
+        nt.assert_equal((1, 'Bob'), tuple(result.fetchone()))
+        nt.assert_equal([(2, 'Jo')], [tuple(r) for r in result.fetchmany(1)])
+        nt.assert_equal([(3, 'Al')], [tuple(r) for r in result.fetchall()])
+        nt.assert_equal([(1, 'Bob'), (2, 'Jo'), (3, 'Al')],
+                        [tuple(r) for r in self.cache.get('k')])
+        result = self.cache.wrap('j', sql, self.engine.execute(sql))
+        while result.fetchone() is not None:
+            pass
+        nt.assert_equal(3, len(list(self.cache.get('j'))))
@@ -0,0 +1,76 @@
+import os
+import signal
+import threading
+import time
+import unittest
+
+import mock
+import nose.tools as nt
+import sqlalchemy as sa
+
+from ipydb import cancel, engine
+
+# counts to a large number, slowly.
+SLOW_SQL = ('with recursive c(x) as (select 1 union all select x + 1 '
+            'from c where x < 1000000000) select count(*) from c')
+
+
+def send_sigint(delay=0.2):
+    timer = threading.Timer(delay, os.kill, (os.getpid(), signal.SIGINT))
+    timer.start()
+    return timer
+
+
+class StatementGuardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = engine.from_url('sqlite://')
+
+    def test_cancels_slow_sqlite_statement(self):
+        guard = cancel.StatementGuard(self.engine)
+        send_sigint()
+        start = time.time()
+        with nt.assert_raises((KeyboardInterrupt, sa.exc.OperationalError)):
+            with guard:
+                nt.assert_true(guard.armed)
+                self.engine.execute(SLOW_SQL).fetchall()
+        nt.assert_true(guard.cancelled)
+        nt.assert_less(time.time() - start, 10)
+        nt.assert_false(guard.armed)
+        nt.assert_equal(-1, signal.set_wakeup_fd(-1))
+        # the engine is still usable
+        nt.assert_equal([(1,)], self.engine.execute('select 1').fetchall())
+
+    def test_not_armed_for_non_engines(self):
+        with cancel.StatementGuard(mock.MagicMock()) as guard:
+            nt.assert_false(guard.armed)
+        nt.assert_false(guard.cancelled)
+
+    def test_not_armed_outside_main_thread(self):
+        guards = []
+
+        def run():
+            with cancel.StatementGuard(self.engine) as guard:
+                guards.append(guard.armed)
+        t = threading.Thread(target=run)
+        t.start()
+        t.join()
+        nt.assert_equal([False], guards)
+
+    def test_cancel_dispatches_on_dialect(self):
+        mengine = mock.MagicMock()
+        mengine.dialect.name = 'oracle'
+        guard = cancel.StatementGuard(mengine)
+        dbapi_conn = mock.MagicMock()
+        guard.current = (dbapi_conn, mock.MagicMock())
+        guard.cancel()
+        nt.assert_true(guard.cancelled)
+        dbapi_conn.cancel.assert_called_once_with()
+
+    def test_cancel_mysql_uses_side_connection(self):
+        mengine = mock.MagicMock()
+        dbapi_conn = mock.MagicMock()
+        dbapi_conn.thread_id.return_value = 42
+        cancel.cancel_mysql(mengine, dbapi_conn, None)
+        side = mengine.connect.return_value.__enter__.return_value
+        side.execute.assert_called_once_with('KILL QUERY 42')
@@ -0,0 +1,77 @@
+import unittest
+
+import nose.tools as nt
+import sqlalchemy as sa
+
+from ipydb import chunk
+from ipydb.metadata import model as m
+
+
+class ChunkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        self.engine.execute('create table events (id integer primary key, '
+                            'kind text)')
+        self.engine.execute(
+            'insert into events (id, kind) values (?, ?)',
+            [(i, 'a' if i % 2 else 'b') for i in range(1, 26)])
+
+    def count(self):
+        return self.engine.execute('select count(*) from events').scalar()
+
+    def test_target_table(self):
+        nt.assert_equal('events', chunk.target_table(
+            'DELETE FROM events where x = 1'))
+        nt.assert_equal('s.events', chunk.target_table(
+            'update only s.events set x = 1'))
+        nt.assert_equal('"my table"', chunk.target_table(
+            'update "my table" set x = 1'))
+        nt.assert_is_none(chunk.target_table('select 1'))
+
+    def test_primary_key(self):
+        table = m.Table(name='events', columns=[
+            m.Column(name='id', primary_key=True),
+            m.Column(name='kind', primary_key=False)])
+        nt.assert_equal('id', chunk.primary_key(table))
+        table.columns[1].primary_key = True
+        nt.assert_is_none(chunk.primary_key(table))
+        nt.assert_is_none(chunk.primary_key(None))
+
+    def test_chunk_statement(self):
+        stmt = chunk.chunk_statement(
+            "delete from events where kind = 'a' -- old\n"
+            "order by id limit 5;", 'id')
+        nt.assert_equal("delete from events where (kind = 'a') and "
+                        "id >= 1 and id < 11 order by id limit 5",
+                        stmt(1, 11))
+        stmt = chunk.chunk_statement("update events set kind = 'c'", 'id')
+        nt.assert_equal("update events set kind = 'c' where "
+                        "id >= 0 and id < 5", stmt(0, 5))
+
+    def test_run(self):
+        chunked = chunk.ChunkedStatement(
+            self.engine, "delete from events where kind = 'a'", 'id', 10,
+            report_interval=0)
+        chunked.run()
+        nt.assert_equal(3, chunked.batches)
+        nt.assert_equal(13, chunked.rows)
+        nt.assert_equal(12, self.count())
+        nt.assert_in('3/3 batches, 13 rows affected', chunked.summary())
+
+    def test_resume(self):
+        chunked = chunk.ChunkedStatement(
+            self.engine, "delete from events", 'id', 10, report_interval=0)
+
+        def fail(sql):
+            if 'id >= 11' in sql:
+                raise KeyboardInterrupt()
+            return chunk.ChunkedStatement.execute(chunked, sql)
+        chunked.execute = fail
+        with nt.assert_raises(KeyboardInterrupt):
+            chunked.run()
+        nt.assert_equal(11, chunked.next_start)
+        nt.assert_equal(15, self.count())
+        del chunked.execute
+        chunked.run(start=chunked.next_start)
+        nt.assert_equal(0, self.count())
@@ -155,7 +155,7 @@ class CompleterTest(unittest.TestCase):
 
     def test_sql_format(self):
         expectations = {
-            '': ['csv', 'table'],
+            '': ['csv', 'table', 'tsv'],
             'cs': ['csv'],
             'ta': ['table']
         }
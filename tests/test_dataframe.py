@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+import os
+import unittest
+
+import nose.tools as nt
+from nose.plugins.skip import SkipTest
+import sqlalchemy as sa
+
+from ipydb import cache
+from ipydb import dataframe
+from ipydb.asciitable import FakedResult
+from ipydb.utils import parse_size
+
+
+class FrameBuilderTest(unittest.TestCase):
+
+    headings = ['id', 'name', 'price', 'created', 'qty']
+    types = ['integer', 'string', 'float', 'datetime', 'integer']
+
+    def setUp(self):
+        if not dataframe._has_pandas:
+            raise SkipTest('pandas is not installed')
+        self.rows = [(i, 'name %i' % i, i * 1.5,
+                      '2015-01-%02i 00:00:00' % (i + 1),
+                      None if i % 2 else i) for i in range(5)]
+
+    def builder(self, **kw):
+        return dataframe.FrameBuilder(FakedResult(self.rows, self.headings),
+                                      types=self.types, batch_size=2, **kw)
+
+    def test_build(self):
+        frame = self.builder().build()
+        nt.assert_equal(self.headings, list(frame.columns))
+        nt.assert_equal(list(range(5)), list(frame.index))
+        nt.assert_equal('int64', str(frame['id'].dtype))
+        nt.assert_equal('float64', str(frame['price'].dtype))
+        nt.assert_true(str(frame['created'].dtype).startswith('datetime64'))
+        nt.assert_equal('Int64', str(frame['qty'].dtype))
+        nt.assert_equal(dt.datetime(2015, 1, 3), frame['created'][2])
+        nt.assert_equal(5, len(frame))
+
+    def test_inferred(self):
+        self.types = None
+        frame = self.builder().build()
+        nt.assert_equal('int64', str(frame['id'].dtype))
+        nt.assert_equal('2015-01-01 00:00:00', frame['created'][0])
+
+    def test_wrong_type(self):
+        # sqlite lets an integer column hold anything
+        self.rows[0] = ('x',) + self.rows[0][1:]
+        frame = self.builder().build()
+        nt.assert_equal(['x', 1, 2, 3, 4], list(frame['id']))
+
+    def test_empty(self):
+        self.rows = []
+        frame = self.builder().build()
+        nt.assert_equal(0, len(frame))
+        nt.assert_equal(self.headings, list(frame.columns))
+
+    def test_chunks(self):
+        builder = self.builder()
+        nt.assert_equal([2, 2, 1], [len(f) for f in builder])
+        nt.assert_false(builder.truncated)
+
+    def test_max_rows(self):
+        builder = self.builder(max_rows=3)
+        nt.assert_equal(3, len(builder.build()))
+        nt.assert_true(builder.truncated)
+        builder = self.builder(max_rows=5)
+        nt.assert_equal(5, len(builder.build()))
+        nt.assert_false(builder.truncated)
+
+    def test_max_bytes(self):
+        builder = self.builder(max_bytes=1)
+        nt.assert_equal(2, len(builder.build()))
+        nt.assert_true(builder.truncated)
+
+    def test_fetchmany(self):
+        cursor = cache.CachedResult(self.headings, self.rows)
+        builder = dataframe.FrameBuilder(cursor, types=self.types,
+                                         batch_size=2, max_rows=3)
+        frame = builder.build()
+        nt.assert_equal(list(range(3)), list(frame['id']))
+        nt.assert_equal('Int64', str(frame['qty'].dtype))
+        nt.assert_true(builder.truncated)
+        # the extra row fetched to check for more
+        nt.assert_equal([self.rows[4]], cursor.fetchall())
+
+
+class ArrowFrameBuilderTest(FrameBuilderTest):
+
+    def setUp(self):
+        super(ArrowFrameBuilderTest, self).setUp()
+        if not dataframe._has_pyarrow:
+            raise SkipTest('pyarrow is not installed')
+
+    def builder(self, **kw):
+        return dataframe.ArrowFrameBuilder(
+            FakedResult(self.rows, self.headings), types=self.types,
+            batch_size=2, **kw)
+
+    def test_build(self):
+        frame = self.builder().build()
+        nt.assert_equal(self.headings, list(frame.columns))
+        nt.assert_equal(list(range(5)), list(frame.index))
+        nt.assert_equal('int64[pyarrow]', str(frame['id'].dtype))
+        nt.assert_equal('double[pyarrow]', str(frame['price'].dtype))
+        nt.assert_equal('timestamp[us][pyarrow]', str(frame['created'].dtype))
+        nt.assert_equal('int64[pyarrow]', str(frame['qty'].dtype))
+        nt.assert_equal(dt.datetime(2015, 1, 3), frame['created'][2])
+        nt.assert_equal(3, frame['qty'].count())
+
+    def test_inferred(self):
+        self.types = None
+        frame = self.builder().build()
+        nt.assert_equal('int64[pyarrow]', str(frame['id'].dtype))
+        nt.assert_equal('2015-01-01 00:00:00', frame['created'][0])
+
+    def test_wrong_type(self):
+        self.rows[0] = ('x',) + self.rows[0][1:]
+        frame = self.builder().build()
+        nt.assert_equal(['x', '1', '2', '3', '4'], list(frame['id']))
+
+    def test_empty(self):
+        super(ArrowFrameBuilderTest, self).test_empty()
+        frame = self.builder().build()
+        nt.assert_equal('int64[pyarrow]', str(frame['id'].dtype))
+
+    def test_max_bytes(self):
+        builder = self.builder(max_bytes=1)
+        nt.assert_equal(2, len(builder.build()))
+        nt.assert_true(builder.truncated)
+
+
+class AdbcTest(unittest.TestCase):
+
+    url = 'sqlite:///' + os.path.join(os.path.dirname(__file__), 'dbs',
+                                      'chinook.sqlite')
+
+    def setUp(self):
+        if not dataframe._has_pandas:
+            raise SkipTest('pandas is not installed')
+        self.connection = dataframe.adbc_connect(sa.engine.url.make_url(
+            self.url))
+        if self.connection is None:
+            raise SkipTest('adbc_driver_sqlite is not installed')
+
+    def test_result(self):
+        result = dataframe.AdbcResult(self.connection,
+                                      'select * from Invoice')
+        builder = dataframe.ArrowFrameBuilder(
+            result, types=[None, None, 'datetime'] + [None] * 6,
+            max_rows=10)
+        frame = builder.build()
+        result.close()
+        nt.assert_equal(10, len(frame))
+        nt.assert_true(builder.truncated)
+        nt.assert_equal('InvoiceDate', frame.columns[2])
+        nt.assert_equal('timestamp[us][pyarrow]',
+                        str(frame['InvoiceDate'].dtype))
+        nt.assert_equal(dt.datetime(2009, 1, 1),
+                        frame['InvoiceDate'][0])
+
+    def test_empty(self):
+        result = dataframe.AdbcResult(
+            self.connection, 'select InvoiceId, BillingCity from Invoice '
+                             'where 1 = 0')
+        frame = dataframe.ArrowFrameBuilder(
+            result, types=['integer', 'string']).build()
+        result.close()
+        nt.assert_equal(0, len(frame))
+        nt.assert_equal('string[pyarrow]', str(frame['BillingCity'].dtype))
+
+    def test_memory_database(self):
+        self.connection.close()
+        nt.assert_is_none(dataframe.adbc_connect(
+            sa.engine.url.make_url('sqlite://')))
+
+
+def test_parse_size():
+    nt.assert_equal(500, parse_size('500'))
+    nt.assert_equal(64 * 1024, parse_size('64k'))
+    nt.assert_equal(int(1.5 * 1024 ** 3), parse_size('1.5GB'))
+    with nt.assert_raises(ValueError):
+        parse_size('lots')
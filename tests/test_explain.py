@@ -0,0 +1,140 @@
+import unittest
+
+import mock
+import nose.tools as nt
+import sqlalchemy as sa
+
+from ipydb import explain
+from ipydb.metadata import model as m
+
+
+class ExplainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        self.engine.execute('create table person (id integer primary key, '
+                            'name text, city text)')
+        self.engine.execute('create index person_name on person (name)')
+        self.engine.execute('create table pet (id integer primary key, '
+                            'person_id integer, species text)')
+        person = m.Table(id=1, name='person')
+        person.columns = [
+            m.Column(id=1, name='id', type='INTEGER', primary_key=True),
+            m.Column(id=2, name='name', type='TEXT', primary_key=False),
+            m.Column(id=3, name='city', type='TEXT', primary_key=False),
+        ]
+        person.indexes = [m.Index(id=1, name='person_name', table=person,
+                                  columns=[person.columns[1]])]
+        pet = m.Table(id=2, name='pet')
+        pet.columns = [
+            m.Column(id=4, name='id', type='INTEGER', primary_key=True),
+            m.Column(id=5, name='person_id', type='INTEGER',
+                     primary_key=False),
+            m.Column(id=6, name='species', type='TEXT', primary_key=False),
+        ]
+        pet.indexes = []
+        self.db = m.Database([person, pet])
+
+    def explain(self, sql, analyze=False):
+        with self.engine.connect() as conn:
+            return explain.explain(conn, sql, analyze)
+
+    def test_sqlite_index(self):
+        sql = "select * from person where name = 'Bob'"
+        plan = self.explain(sql)
+        nt.assert_equal(1, len(plan.roots))
+        nt.assert_in('person_name', plan.roots[0].label)
+        nt.assert_false(plan.roots[0].full_scan)
+        nt.assert_equal([], explain.warnings(plan, sql, self.db))
+
+    def test_sqlite_scan(self):
+        sql = ("select * from person p join pet on pet.person_id = p.id "
+               "where p.city = 'Paris' and species like 'cat%'")
+        plan = self.explain(sql + ';')
+        scans = [n.table for n in plan.nodes() if n.full_scan]
+        nt.assert_true(scans)
+        warnings = explain.warnings(plan, sql, self.db)
+        nt.assert_in('No index on person.city, which is used in a WHERE '
+                     'clause', warnings)
+        nt.assert_in('No index on pet.species, which is used in a WHERE '
+                     'clause', warnings)
+        nt.assert_true(any(w in ('Full scan of person', 'Full scan of pet')
+                           for w in warnings))
+
+    def test_analyze(self):
+        self.engine.execute("insert into person values (1, 'Bob', 'Paris')")
+        plan = self.explain('select * from person', analyze=True)
+        nt.assert_true(plan.notes[0].startswith('Actual: '))
+        nt.assert_true(plan.notes[0].endswith(' 1 rows'))
+
+    def test_analyze_rolls_back(self):
+        self.engine.execute("insert into person values (1, 'Bob', 'Paris')")
+        for sql in ('drop table pet', 'delete from person',
+                    'create table other (x integer)'):
+            self.explain(sql, analyze=True)
+            with self.engine.connect() as conn:
+                trans = conn.begin()
+                explain.explain(conn, sql, analyze=True)
+                nt.assert_true(trans.is_active)
+                trans.rollback()
+        nt.assert_equal(['person', 'pet'],
+                        sorted(sa.inspect(self.engine).get_table_names()))
+        nt.assert_equal(1, self.engine.execute(
+            'select count(*) from person').scalar())
+
+    def test_unsupported(self):
+        conn = mock.MagicMock()
+        conn.dialect.name = 'oracle'
+        with nt.assert_raises(explain.ExplainError):
+            explain.explain(conn, 'select 1 from dual')
+
+    def test_postgres(self):
+        conn = mock.MagicMock()
+        conn.dialect.name = 'postgresql'
+        conn.execute.return_value.scalar.return_value = [{
+            'Plan': {
+                'Node Type': 'Hash Join', 'Startup Cost': 1,
+                'Total Cost': 100, 'Plan Rows': 50000,
+                'Plans': [
+                    {'Node Type': 'Seq Scan', 'Relation Name': 'pet',
+                     'Alias': 'pet', 'Startup Cost': 0, 'Total Cost': 80,
+                     'Plan Rows': 50000},
+                    {'Node Type': 'Index Scan', 'Relation Name': 'person',
+                     'Alias': 'p', 'Index Name': 'person_pkey',
+                     'Startup Cost': 0, 'Total Cost': 8,
+                     'Plan Rows': 1},
+                ]}}]
+        plan = explain.explain(conn, 'select ...')
+        conn.execute.assert_called_with('EXPLAIN (FORMAT JSON) select ...')
+        nt.assert_equal([
+            'Hash Join (cost=1..100 rows=50000)',
+            '-> Seq Scan on pet (cost=0..80 rows=50000)',
+            '-> Index Scan on person p using person_pkey '
+            '(cost=0..8 rows=1)'], plan.lines())
+        nt.assert_equal(['Full scan of pet (~50000 rows)'],
+                        explain.warnings(plan, 'select ...', self.db))
+        plan.roots[0].children[0].rows = 10
+        nt.assert_equal([], explain.warnings(plan, 'select ...', self.db))
+
+    def test_mysql(self):
+        conn = mock.MagicMock()
+        conn.dialect.name = 'mysql'
+        result = conn.execute.return_value
+        result.keys.return_value = ['id', 'select_type', 'table', 'type',
+                                    'key', 'rows', 'Extra']
+        result.__iter__.return_value = iter([
+            (1, 'SIMPLE', 'pet', 'ALL', None, 20000, 'Using where')])
+        plan = explain.explain(conn, 'select * from pet')
+        nt.assert_equal(['SIMPLE pet: ALL access (rows=20000) Using where'],
+                        plan.lines())
+        nt.assert_true(plan.roots[0].full_scan)
+
+    def test_predicate_columns(self):
+        nt.assert_equal(
+            [('p', 'city'), (None, 'species'), (None, 'id')],
+            explain.predicate_columns(
+                "select * from person p where p.city = 'a = b' and "
+                "species in ('cat') and id between 1 and 2"))
+        nt.assert_equal({'person': 'person', 'p': 'person', 'pet': 'pet'},
+                        explain.table_aliases(
+                            'select * from person p inner join pet where 1'))
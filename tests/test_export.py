@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+import bz2
+import datetime as dt
+import decimal
+import gzip
+import io
+import json
+import lzma
+import os
+import tempfile
+import unittest
+
+import mock
+import nose.tools as nt
+from nose.plugins.skip import SkipTest
+
+from ipydb import export
+from ipydb.asciitable import FakedResult
+
+
+class FakeDbapi(object):
+    STRING = 1
+    BINARY = 2
+    NUMBER = 3
+
+
+class TypesTest(unittest.TestCase):
+
+    def test_sql_type(self):
+        expected = {
+            'INTEGER': 'integer',
+            'BIGINT UNSIGNED': 'integer',
+            'NUMBER(10)': 'integer',
+            'NUMERIC(10, 2)': 'decimal(10,2)',
+            'DOUBLE PRECISION': 'float',
+            'TIMESTAMP WITHOUT TIME ZONE': 'datetime',
+            'DATE': 'date',
+            'NVARCHAR(40)': 'string',
+            'BYTEA': 'binary',
+            'INTERVAL': None,
+            None: None,
+        }
+        for typename, name in expected.items():
+            nt.assert_equal(name, export.sql_type(typename))
+
+    def test_dbapi_type(self):
+        nt.assert_equal('string', export.dbapi_type(1, FakeDbapi))
+        nt.assert_equal('binary', export.dbapi_type(2, FakeDbapi))
+        nt.assert_is_none(export.dbapi_type(3, FakeDbapi))
+        nt.assert_is_none(export.dbapi_type(None, FakeDbapi))
+
+    def test_format_for(self):
+        nt.assert_equal('parquet', export.format_for('/tmp/OUT.Parquet'))
+        nt.assert_equal('jsonl', export.format_for('out.jsonl'))
+        nt.assert_is_none(export.format_for('out.txt'))
+
+
+class ExportTest(unittest.TestCase):
+
+    rows = [(1, u'caf\xe9', decimal.Decimal('1.50'),
+             dt.datetime(2015, 1, 2, 3, 4, 5)),
+            (2, None, None, None)]
+    headings = ['id', 'name', 'price', 'created']
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def export(self, fmt, **kw):
+        export.export(FakedResult(self.rows, self.headings), self.path,
+                      fmt, batch_size=1, **kw)
+
+    def read(self):
+        with io.open(self.path, encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def test_csv(self):
+        self.export('csv', null='NULL')
+        nt.assert_equal(u'id,name,price,created\r\n'
+                        u'1,caf\xe9,1.50,2015-01-02 03:04:05\r\n'
+                        u'2,NULL,NULL,NULL\r\n', self.read())
+
+    def test_jsonl(self):
+        self.export('jsonl', quoting='all')  # ignored
+        lines = [json.loads(line) for line in self.read().splitlines()]
+        nt.assert_equal([
+            {'id': 1, 'name': u'caf\xe9', 'price': '1.50',
+             'created': '2015-01-02T03:04:05'},
+            {'id': 2, 'name': None, 'price': None, 'created': None},
+        ], lines)
+
+    def test_unknown_format(self):
+        with nt.assert_raises(export.ExportError):
+            self.export('xls')
+
+    def test_unavailable(self):
+        with mock.patch.object(export.ParquetExporter, 'available', False):
+            with nt.assert_raises(export.ExportError):
+                self.export('parquet')
+
+    def test_register(self):
+
+        class Lines(export.Exporter):
+
+            def write_batch(self, rows):
+                self.f.write(u''.join(u'%s\n' % (row,) for row in rows))
+
+        export.register('lines', Lines, ['.lines'])
+        try:
+            nt.assert_equal('lines', export.format_for('x.lines'))
+            self.export('lines')
+            nt.assert_equal(2, len(self.read().splitlines()))
+        finally:
+            del export.FORMATS['lines']
+            del export.EXTENSIONS['.lines']
+
+    def arrow_table(self, fmt, types):
+        if not export._has_pyarrow:
+            raise SkipTest('pyarrow is not installed')
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.export(fmt, types=types)
+        if fmt == 'parquet':
+            return pq.read_table(self.path)
+        return pa.ipc.open_file(self.path).read_all()
+
+    def test_parquet(self):
+        table = self.arrow_table(
+            'parquet', ['integer', 'string', 'decimal(10,2)', 'datetime'])
+        nt.assert_equal(['int64', 'string', 'decimal128(10, 2)',
+                         'timestamp[us]'],
+                        [str(t) for t in table.schema.types])
+        nt.assert_equal(self.rows[0], tuple(table.to_pylist()[0].values()))
+
+    def test_arrow_inferred(self):
+        # the sqlite driver returns dates as strings
+        self.rows = [(1, u'2015-01-02 03:04:05')]
+        self.headings = ['id', 'created']
+        table = self.arrow_table('arrow', [None, 'datetime'])
+        nt.assert_equal(dt.datetime(2015, 1, 2, 3, 4, 5),
+                        table.column('created')[0].as_py())
+        nt.assert_equal('int64', str(table.schema.types[0]))
+
+    def test_float_decimals(self):
+        # sqlite returns NUMERIC(10, 2) values as floats, or integers
+        self.rows = [(1.5,), (0.1 + 0.2,), (3,)]
+        self.headings = ['price']
+        table = self.arrow_table('parquet', ['decimal(10,2)'])
+        nt.assert_equal('decimal128(10, 2)', str(table.schema.types[0]))
+        nt.assert_equal([decimal.Decimal(v) for v in ('1.50', '0.30', '3')],
+                        table.column('price').to_pylist())
+
+    def test_later_batch_type_mismatch(self):
+        # sqlite columns can hold any type
+        self.rows = [(1, u'a'), (u'n/a', 2), (3, u'c')]
+        self.headings = ['id', 'name']
+        with nt.assert_raises(export.ExportError) as cm:
+            self.arrow_table('arrow', ['integer', 'string'])
+        nt.assert_in('1 id values written as nulls', str(cm.exception))
+        import pyarrow as pa
+        table = pa.ipc.open_file(self.path).read_all()
+        nt.assert_equal([1, None, 3], table.column('id').to_pylist())
+        nt.assert_equal([u'a', u'2', u'c'], table.column('name').to_pylist())
+
+    def test_feather_empty(self):
+        self.rows = []
+        table = self.arrow_table('feather', ['integer', None, None, None])
+        nt.assert_equal(0, table.num_rows)
+        nt.assert_equal(['int64', 'string', 'string', 'string'],
+                        [str(t) for t in table.schema.types])
+
+
+class CompressionTest(unittest.TestCase):
+
+    rows = [(i, u'caf\xe9 %i' % i) for i in range(1000)]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.dir):
+            os.remove(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def export(self, name, **kw):
+        path = os.path.join(self.dir, name)
+        export.export(FakedResult(self.rows, ['id', 'name']), path, **kw)
+        return path
+
+    def test_compression_for(self):
+        nt.assert_equal('.gz', export.compression_for('OUT.CSV.GZ'))
+        nt.assert_is_none(export.compression_for('out.csv'))
+        nt.assert_equal('tsv', export.format_for('out.tsv.bz2'))
+
+    def test_compressed(self):
+        expected = io.open(self.export('out.csv'), 'rb').read()
+        for name, module in (('out.csv.gz', gzip), ('out.csv.bz2', bz2),
+                             ('out.csv.xz', lzma)):
+            path = self.export(name, compresslevel=1)
+            with module.open(path) as f:
+                nt.assert_equal(expected, f.read())
+
+    def test_bad_level(self):
+        for name, level in (('out.csv.gz', 20), ('out.csv.bz2', 0),
+                            ('out.csv.xz', 12), ('out.csv.zst', 23)):
+            with nt.assert_raises(export.ExportError) as cm:
+                self.export(name, compresslevel=level)
+            nt.assert_in('must be from', str(cm.exception))
+            nt.assert_false(os.path.exists(os.path.join(self.dir, name)))
+        # plain files aren't compressed, so any level will do
+        nt.assert_true(os.path.exists(self.export('out.csv',
+                                                  compresslevel=20)))
+
+    def test_error(self):
+        compressor = mock.MagicMock()
+        compressor.compress.side_effect = ValueError('boom')
+        out = io.BytesIO()
+        writer = export.CompressedWriter(out, compressor, queue_size=1)
+        writer.write(b'x')
+        with nt.assert_raises(ValueError):
+            writer.close()
+        nt.assert_true(out.closed)
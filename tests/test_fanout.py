@@ -0,0 +1,71 @@
+import unittest
+
+import mock
+import nose.tools as nt
+import sqlalchemy as sa
+
+from ipydb import fanout
+from ipydb.asciitable import PivotResultSet
+
+
+class FanOutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engines = {}
+        for name in ('shard1', 'shard2', 'shard3'):
+            eng = self.memory_engine()
+            eng.execute('create table t (x integer)')
+            eng.execute('insert into t values (?)', [(i,) for i in range(3)])
+            self.engines[name] = eng
+        self.engines['shard3'].execute('drop table t')
+        self.engines['other'] = self.memory_engine()
+        patcher = mock.patch.multiple(
+            'ipydb.fanout.engine',
+            get_nicknames=lambda: sorted(self.engines),
+            from_config=lambda name: self.engines[name])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def memory_engine(self):
+        return sa.create_engine('sqlite://', poolclass=sa.pool.StaticPool,
+                                connect_args={'check_same_thread': False})
+
+    def test_matching_nicknames(self):
+        nt.assert_equal(['shard1', 'shard2', 'shard3'],
+                        fanout.matching_nicknames('shard*'))
+        nt.assert_equal(['other', 'shard2'],
+                        fanout.matching_nicknames('shard2, oth*'))
+        nt.assert_equal([], fanout.matching_nicknames('nope'))
+
+    def test_rows_and_errors(self):
+        result = fanout.FanOutResult(fanout.matching_nicknames('shard*'),
+                                     'select x from t', workers=2,
+                                     buffer_rows=2)
+        nt.assert_equal(['_source', 'x'], result.keys())
+        rows = sorted(result)
+        nt.assert_equal(6, len(rows))
+        nt.assert_equal(('shard1', 0), rows[0])
+        nt.assert_equal(['_source', 'x'], rows[0].keys())
+        nt.assert_equal([('_source', 'shard1'), ('x', 0)],
+                        list(list(PivotResultSet(rows[:1]))[0]))
+        nt.assert_equal(3, result.sources['shard2'].rows)
+        nt.assert_in('no such table', result.sources['shard3'].error)
+        summary = result.summary()
+        nt.assert_in('shard3', summary)
+        nt.assert_in('FAILED: ', summary)
+        nt.assert_in('1 of 3 databases failed', summary)
+
+    def test_dml(self):
+        result = fanout.FanOutResult(['shard1', 'shard2'],
+                                     'delete from t where x > :x',
+                                     params={'x': 0})
+        result.keys()
+        nt.assert_false(result.returns_rows)
+        nt.assert_equal(4, result.rowcount)
+
+    def test_close(self):
+        result = fanout.FanOutResult(['shard1', 'shard2'], 'select x from t',
+                                     buffer_rows=1)
+        for row in result:
+            break
+        nt.assert_true(result.closed)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import nose.tools as nt
+
+from ipydb import cache
+from ipydb import history
+from ipydb.utils import parameterize_sql
+
+
+class HistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.history = history.QueryHistory(
+            os.path.join(self.tmpdir, 'history.sqlite'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def entry(self, sql, execute_ms, connection='db', error=None):
+        entry = history.HistoryEntry(connection, sql)
+        entry.execute_ms = execute_ms
+        entry.error = error
+        return entry
+
+    def test_parameterize_sql(self):
+        nt.assert_equal('select * from t where a = ? and b in (?)',
+                        parameterize_sql("SELECT *\nFROM t WHERE a = 'x' "
+                                         "AND b IN (1, 2.5, 3)"))
+        nt.assert_equal('select t1.a from t1', parameterize_sql(
+            'select t1.a from t1'))
+
+    def test_fingerprint(self):
+        nt.assert_equal(history.fingerprint('select * from t where a = 1'),
+                        history.fingerprint("select * FROM t where a = 22"))
+        nt.assert_not_equal(history.fingerprint('select * from t'),
+                            history.fingerprint('select * from u'))
+
+    def test_percentile(self):
+        nt.assert_is_none(history.percentile([], 50))
+        values = list(range(1, 101))
+        nt.assert_equal(51, history.percentile(values, 50))
+        nt.assert_equal(95, history.percentile(values, 95))
+        nt.assert_equal(100, history.percentile(values, 100))
+
+    def test_record(self):
+        for ms in (10, 20, 30):
+            self.history.record(self.entry('select * from t where a = %i' %
+                                           ms, ms))
+        self.history.record(self.entry('select 1', 500, error='boom'))
+        self.history.record(self.entry('select 2', 5, connection='other'))
+        recent = self.history.recent(connection='db')
+        nt.assert_equal(4, len(recent))
+        nt.assert_equal('select 1', recent[0].statement)
+        nt.assert_equal('boom', recent[0].error)
+        nt.assert_equal(5, len(self.history.recent()))
+        frequent = self.history.most_frequent(connection='db')
+        nt.assert_equal(3, frequent[0]['count'])
+        nt.assert_equal(20, frequent[0]['p50_ms'])
+        nt.assert_equal(30, frequent[0]['max_ms'])
+        slowest = self.history.slowest(connection='db')
+        # errors don't count towards latency
+        nt.assert_equal('select * from t where a = 30',
+                        slowest[0]['statement'])
+        nt.assert_equal(1, slowest[1]['errors'])
+        nt.assert_is_none(slowest[1]['p95_ms'])
+
+    def test_max_rows(self):
+        self.history.max_rows = 3
+        for ms in range(5):
+            self.history.record(self.entry('select %i' % ms, ms))
+        nt.assert_equal(['select 4', 'select 3', 'select 2'],
+                        [r.statement for r in self.history.recent()])
+        nt.assert_equal(3, sum(s['count'] for s in self.history.stats()))
+
+    def test_stats(self):
+        for ms in (40, 10, 30, 20):
+            self.history.record(self.entry('select * from t where a = %i' %
+                                           ms, ms))
+        cached = self.entry('select * from t where a = 1', 1)
+        cached.cached = True
+        self.history.record(cached)
+        self.history.record(self.entry('select * from t where a = 2', 900,
+                                       error='boom'))
+        self.history.record(self.entry('select 1', 5, connection='other'))
+        stats = self.history.stats(connection='db')
+        nt.assert_equal(1, len(stats))
+        stat = stats[0]
+        nt.assert_equal('select * from t where a = 2', stat['statement'])
+        nt.assert_equal(6, stat['count'])
+        nt.assert_equal(1, stat['errors'])
+        nt.assert_equal(100, stat['total_ms'])
+        nt.assert_equal(30, stat['p50_ms'])
+        nt.assert_equal(40, stat['p95_ms'])
+        nt.assert_equal(40, stat['max_ms'])
+        nt.assert_equal(2, len(self.history.stats()))
+
+    def test_timed_result(self):
+        done = []
+        entry = self.entry('select 1', 1)
+        result = history.TimedResult([(1,), (2,), (3,)], entry, done.append)
+        nt.assert_equal([(1,), (2,), (3,)], list(result))
+        nt.assert_equal([entry], done)
+        nt.assert_equal(3, entry.rows)
+        result.finish()
+        nt.assert_equal(1, len(done))
+
+    def test_timed_result_fetchmany(self):
+        done = []
+        entry = self.entry('select 1', 1)
+        result = history.TimedResult(
+            cache.CachedResult(['a'], [(1,), (2,), (3,)]), entry,
+            done.append)
+        nt.assert_equal([(1,), (2,)], result.fetchmany(2))
+        nt.assert_equal([], done)
+        nt.assert_equal([(3,)], result.fetchmany(2))
+        nt.assert_equal([], result.fetchmany(2))
+        nt.assert_equal([entry], done)
+        nt.assert_equal(3, entry.rows)
+        nt.assert_true(entry.fetched)
+
+    def test_timed_result_deferred(self):
+        done = []
+        entry = self.entry('select 1', 1)
+        result = history.TimedResult([(1,)], entry, done.append)
+        result.defer_finish = True
+        list(result)
+        nt.assert_equal([], done)
+        result.finish()
+        nt.assert_equal([entry], done)
+        nt.assert_true(entry.render_ms >= 0)
+
+    def test_summary(self):
+        entry = self.entry('select 1', 120)
+        entry.fetched = True
+        entry.fetch_ms = 3400
+        entry.rows = 1200000
+        entry.render_ms = 800
+        nt.assert_equal(u'exec 120ms · fetch 3.4s/1.2M rows '
+                        u'· render 800ms', entry.summary())
+        entry = self.entry('update t set a = 1', 5)
+        entry.rows = 1
+        nt.assert_equal(u'exec 5ms · 1 row affected', entry.summary())
+        entry.error = 'boom'
+        nt.assert_equal(u'exec 5ms · failed', entry.summary())
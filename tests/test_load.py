@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+import mock
+import nose.tools as nt
+import sqlalchemy as sa
+
+from ipydb import load
+from ipydb.metadata import model as m
+
+
+class LoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        self.engine.execute('create table person '
+                            '(id integer, name text, score numeric)')
+        self.table = m.Table(name='person', columns=[
+            m.Column(name='id', type='INTEGER'),
+            m.Column(name='name', type='TEXT'),
+            m.Column(name='score', type='NUMERIC')])
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, text):
+        with open(self.path, 'w') as fout:
+            fout.write(text)
+
+    def rows(self):
+        return self.engine.execute(
+            'select id, name, score from person order by id').fetchall()
+
+    def test_converter(self):
+        nt.assert_equal(3, load.converter('INTEGER')('3'))
+        nt.assert_equal('1.5', load.converter('NUMERIC(5, 2)')('1.5'))
+        with nt.assert_raises(Exception):
+            load.converter('NUMERIC(5, 2)')('1.x')
+        nt.assert_equal('2015-01-01', load.converter('DATE')('2015-01-01'))
+        nt.assert_is_none(load.converter('INTEGER')(''))
+        nt.assert_equal(3, load.converter('bigint')('3'))
+        nt.assert_equal('1,2', load.converter('POINT')('1,2'))
+        nt.assert_equal('1 day', load.converter('INTERVAL')('1 day'))
+
+    def test_load_csv(self):
+        self.write('id,name,score\n1,"Bob, Jr",1.5\n2,,\n3,Sue,2\n')
+        loader = load.BulkLoader(self.engine, 'person', self.table,
+                                 batch_size=2, commit_every=2,
+                                 report_interval=0)
+        loader.load_csv(self.path)
+        nt.assert_equal(3, loader.progress.rows)
+        nt.assert_equal([(1, 'Bob, Jr', 1.5), (2, None, None),
+                         (3, 'Sue', 2)], self.rows())
+
+    def test_load_csv_without_header(self):
+        self.write('7;Al\n')
+        loader = load.BulkLoader(self.engine, 'person', None,
+                                 report_interval=0)
+        loader.load_csv(self.path, delimiter=';', header=False,
+                        columns=['id', 'name'])
+        nt.assert_equal([(7, 'Al', None)], self.rows())
+
+    def test_unknown_column(self):
+        self.write('id,nmae\n1,Bob\n')
+        loader = load.BulkLoader(self.engine, 'person', self.table)
+        with nt.assert_raises(load.LoadError) as cm:
+            loader.load_csv(self.path)
+        nt.assert_in('nmae', str(cm.exception))
+
+    def test_bad_value_rolls_back(self):
+        self.write('id,name\n1,Bob\nxx,Sue\n')
+        loader = load.BulkLoader(self.engine, 'person', self.table,
+                                 batch_size=1, report_interval=0)
+        with nt.assert_raises(load.LoadError) as cm:
+            loader.load_csv(self.path)
+        nt.assert_equal("line 3: 'xx' is not a valid INTEGER",
+                        str(cm.exception))
+        nt.assert_equal([], self.rows())
+
+    def test_postgresql_copy(self):
+        self.write('id,name\n1,Bob\n')
+        engine = mock.MagicMock()
+        engine.dialect.name = 'postgresql'
+        engine.dialect.identifier_preparer.quote.side_effect = lambda n: n
+        loader = load.BulkLoader(engine, 'public.person', self.table,
+                                 report_interval=0)
+        conn = engine.connect.return_value.__enter__.return_value
+        cursor = conn.connection.cursor.return_value
+        copied = []
+        cursor.copy_expert.side_effect = \
+            lambda sql, fin, size: copied.append((sql, fin.read()))
+        loader.load_csv(self.path)
+        nt.assert_equal([("COPY public.person (id, name) FROM STDIN "
+                          "WITH CSV DELIMITER ','", '1,Bob\n')], copied)
+        conn.begin.return_value.commit.assert_called_once_with()
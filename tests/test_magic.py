@@ -82,7 +82,7 @@ class ModelTest(unittest.TestCase):
         self.magics.sql('-a zzz -m yyy select * from foo')
         self.ipydb.execute.assert_called_with(
             'select * from foo',
-            params=d, multiparams=lst)
+            params=d, multiparams=lst, cache=True, refresh=False)
 
         ret.returns_rows = False
         ret.rowount = 2
@@ -90,3 +90,172 @@ class ModelTest(unittest.TestCase):
 
         r = self.magics.sql('-r select * from foo')
         nt.assert_equal(ret, r)
+
+    def test_load_csv(self):
+        self.magics.load_csv('-d ; -C id,name --no-header -c 10 f.csv person')
+        self.ipydb.load_csv.assert_called_with(
+            'f.csv', 'person', delimiter=';', header=False,
+            columns=['id', 'name'], batch_size=1000, commit_every=10,
+            fast=True)
+
+    def test_load_df(self):
+        self.ipython.user_ns = {'df': 'a dataframe'}
+        self.magics.load_df('--no-fast df person')
+        self.ipydb.load_dataframe.assert_called_with(
+            'a dataframe', 'person', batch_size=1000, commit_every=None,
+            fast=False)
+
+    def test_sql_chunked(self):
+        self.magics.sql('--chunk-size 500 --chunk-start 1000 '
+                        'delete from foo where x = 1')
+        self.ipydb.execute_chunked.assert_called_with(
+            'delete from foo where x = 1', chunk_by=None, chunk_size=500,
+            start=1000, sleep=0)
+        self.magics.sql('--chunk-start 0 delete from foo')
+        self.ipydb.execute_chunked.assert_called_with(
+            'delete from foo', chunk_by=None, chunk_size=10000, start=0,
+            sleep=0)
+        self.magics.sql('--chunk-sleep 0.5 delete from foo')
+        self.ipydb.execute_chunked.assert_called_with(
+            'delete from foo', chunk_by=None, chunk_size=10000, start=None,
+            sleep=0.5)
+
+    def test_sql_dataframe_options(self):
+        for option in ('--max-rows 10', '--max-bytes 1M', '--chunks',
+                       '--arrow'):
+            with mock.patch('ipydb.magic.print', create=True) as mprint:
+                nt.assert_is_none(self.magics.sql(option + ' select 1'))
+            nt.assert_in('use them with -P', mprint.call_args[0][0])
+        nt.assert_false(self.ipydb.execute.called)
+
+    def test_sql_on(self):
+        result = self.ipydb.execute_on.return_value
+        result.returns_rows = True
+        self.magics.sql('--on shard* select 1')
+        self.ipydb.execute_on.assert_called_with(
+            'shard*', 'select 1', params=None, multiparams=None, workers=8)
+        self.ipydb.render_result.assert_called_with(
+            result, paginate=True, filepath=None, stream=False,
+            query='select 1', quoting='minimal', null='')
+        result.summary.assert_called_with()
+
+    def test_sql_stream(self):
+        result = self.ipydb.execute.return_value
+        result.returns_rows = True
+        self.magics.sql('-s select * from person')
+        self.ipydb.render_result.assert_called_with(
+            result, paginate=True, filepath=None, stream=True,
+            query='select * from person', quoting='minimal', null='')
+
+    def test_sql_output(self):
+        result = self.ipydb.execute.return_value
+        result.returns_rows = True
+        self.magics.sql('-o out.txt --tsv --quoting all --null NULL '
+                        'select * from person')
+        self.ipydb.render_result.assert_called_with(
+            result, paginate=False, filepath='out.txt', stream=False,
+            query='select * from person', quoting='all', null='NULL',
+            sqlformat='tsv')
+        self.magics.sql('-o out.csv.gz --compress-level 1 select 1')
+        self.ipydb.render_result.assert_called_with(
+            result, paginate=False, filepath='out.csv.gz', stream=False,
+            query='select 1', quoting='minimal', null='', compresslevel=1)
+
+    def test_sql_pandas(self):
+        cursor = self.ipydb.execute.return_value
+        self.magics.sql('-P --max-rows 10 --max-bytes 1k select 1')
+        self.ipydb.build_dataframe.assert_called_with(
+            cursor, query='select 1', max_rows=10, max_bytes=1024,
+            chunks=False, arrow=False)
+
+    def test_sql_return(self):
+        cursor = self.ipydb.execute.return_value
+        cursor.returns_rows = True
+        rs = self.magics.sql('-r select 1')
+        nt.assert_equal(self.ipydb.result_set.return_value, rs)
+        self.ipydb.result_set.assert_called_with(cursor, 'select 1')
+        cursor.returns_rows = False
+        nt.assert_equal(cursor, self.magics.sql('-r delete from foo'))
+
+    def test_sql_pandas_arrow(self):
+        frame = self.ipydb.adbc_dataframe.return_value
+        nt.assert_equal(frame, self.magics.sql('-P --arrow select 1'))
+        self.ipydb.adbc_dataframe.assert_called_with(
+            'select 1', max_rows=None, max_bytes=None, chunks=False)
+        nt.assert_false(self.ipydb.execute.called)
+        # no ADBC driver: fall back to the cursor
+        self.ipydb.adbc_dataframe.return_value = None
+        self.magics.sql('-P --arrow select 1')
+        self.ipydb.build_dataframe.assert_called_with(
+            self.ipydb.execute.return_value, query='select 1',
+            max_rows=None, max_bytes=None, chunks=False, arrow=True)
+
+    def test_sqlhistory(self):
+        self.magics.sqlhistory('--slowest -n 5 -d 7')
+        self.ipydb.show_history.assert_called_with(
+            'slowest', limit=5, all_connections=False, days=7.0)
+        self.magics.sqlhistory('-a')
+        self.ipydb.show_history.assert_called_with(
+            'recent', limit=20, all_connections=True, days=None)
+
+    def test_sql_view(self):
+        cursor = self.ipydb.execute.return_value
+        cursor.returns_rows = True
+        self.magics.sql('-v select 1')
+        self.ipydb.view_result.assert_called_with(cursor, query='select 1')
+        self.magics.view()
+        nt.assert_true(self.ipydb.view_last_result.called)
+
+    def test_page_sort_grep(self):
+        self.magics.page('3')
+        self.ipydb.show_page.assert_called_with(3)
+        self.magics.page('')
+        self.ipydb.show_page.assert_called_with(1)
+        self.magics.sort('--desc total')
+        self.ipydb.sort_result.assert_called_with('total', descending=True)
+        self.magics.sort('')
+        self.ipydb.sort_result.assert_called_with(None, descending=False)
+        self.magics.grep('-i ^ber')
+        self.ipydb.grep_result.assert_called_with('^ber', ignore_case=True)
+
+    def test_showtimings(self):
+        self.ipydb.show_timings = False
+        self.magics.showtimings()
+        nt.assert_true(self.ipydb.show_timings)
+        self.ipydb.last_query.summary.return_value = 'exec 1ms'
+        cursor = self.ipydb.execute.return_value
+        cursor.returns_rows = False
+        cursor.rowcount = 1
+        with mock.patch('ipydb.magic.print', create=True) as mprint:
+            self.magics.sql('update foo set a = 1')
+        mprint.assert_called_with('exec 1ms')
+        self.magics.showtimings()
+        nt.assert_false(self.ipydb.show_timings)
+
+    def test_ipydb_stats(self):
+        self.magics.ipydb_stats('--prometheus --reset -o m.prom')
+        self.ipydb.show_stats.assert_called_with(
+            'prometheus', reset=True, filepath='m.prom')
+        self.magics.ipydb_stats('')
+        self.ipydb.show_stats.assert_called_with(
+            'table', reset=False, filepath=None)
+
+    @mock.patch('ipydb.magic.trace')
+    def test_sqltrace(self, mtrace):
+        self.magics.sqltrace('on --size 10')
+        mtrace.tracer.resize.assert_called_with(10)
+        mtrace.tracer.start.assert_called_with()
+        self.magics.sqltrace('-s reflection -n 5')
+        self.ipydb.show_trace.assert_called_with(
+            5, subsystem='reflection', summary=False)
+        self.magics.sqltrace('off')
+        mtrace.tracer.stop.assert_called_with()
+
+    def test_explain(self):
+        self.magics.explain("--analyze select * from foo where a = 'b'")
+        self.ipydb.explain.assert_called_with(
+            "select * from foo where a = 'b'", analyze=True)
+
+    def test_index_advice(self):
+        self.magics.index_advice('-n 3 --min-ms 50')
+        self.ipydb.index_advice.assert_called_with(3, days=None, min_ms=50)
@@ -0,0 +1,73 @@
+import json
+import unittest
+
+import nose.tools as nt
+
+from ipydb import metrics
+from ipydb.utils import timer
+
+
+class RegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_counter(self):
+        self.registry.counter('queries').inc()
+        self.registry.counter('queries').inc(2)
+        nt.assert_equal(3, self.registry.counter('queries').value)
+        with nt.assert_raises(ValueError):
+            self.registry.histogram('queries')
+
+    def test_histogram(self):
+        hist = self.registry.histogram('completion_ms', completer='sql')
+        nt.assert_is_none(hist.percentile(50))
+        for ms in (0.5, 3, 3, 40, 7000):
+            hist.observe(ms)
+        nt.assert_equal(5, hist.count)
+        nt.assert_equal(0.5, hist.min)
+        nt.assert_equal(7000, hist.max)
+        nt.assert_equal(5, hist.percentile(50))
+        nt.assert_equal(7000, hist.percentile(95))
+        nt.assert_is_not(hist, self.registry.histogram('completion_ms'))
+
+    def test_timed(self):
+        with self.registry.timed('reflection_ms', phase='reflect'):
+            pass
+        hist = self.registry.histogram('reflection_ms', phase='reflect')
+        nt.assert_equal(1, hist.count)
+        with timer('x', quiet=True, metric='timer_test_ms') as t:
+            pass
+        hist = metrics.registry.histogram('timer_test_ms')
+        nt.assert_equal(t.ms, hist.max)
+
+    def test_reset(self):
+        self.registry.counter('queries').inc()
+        self.registry.reset()
+        nt.assert_equal([], self.registry.collect())
+
+    def test_json(self):
+        self.registry.counter('queries').inc()
+        self.registry.histogram('query_fetch_ms').observe(12)
+        data = json.loads(self.registry.json())['metrics']
+        nt.assert_equal(['queries', 'query_fetch_ms'],
+                        [m['name'] for m in data])
+        nt.assert_equal(1, data[0]['value'])
+        nt.assert_equal(1, data[1]['buckets']['25'])
+
+    def test_prometheus(self):
+        self.registry.counter('queries').inc(4)
+        hist = self.registry.histogram('completion_ms', completer='sql')
+        hist.observe(2)
+        hist.observe(20)
+        text = self.registry.prometheus()
+        nt.assert_in('# TYPE ipydb_queries counter\nipydb_queries 4\n', text)
+        nt.assert_in('# TYPE ipydb_completion_ms histogram\n', text)
+        nt.assert_in('ipydb_completion_ms_bucket{completer="sql",le="1"} 0',
+                     text)
+        nt.assert_in('ipydb_completion_ms_bucket{completer="sql",le="5"} 1',
+                     text)
+        nt.assert_in(
+            'ipydb_completion_ms_bucket{completer="sql",le="+Inf"} 2', text)
+        nt.assert_in('ipydb_completion_ms_sum{completer="sql"} 22.0', text)
+        nt.assert_in('ipydb_completion_ms_count{completer="sql"} 2', text)
@@ -1,5 +1,8 @@
 from configparser import DuplicateSectionError
+import io
+import os
 import re
+import tempfile
 from io import BytesIO, StringIO
 
 from IPython.terminal.interactiveshell import TerminalInteractiveShell
@@ -9,6 +12,7 @@ import mock
 from ipydb import plugin
 from ipydb.metadata import model as m
 from ipydb.metadata.model import Database
+from ipydb.metrics import registry
 
 
 class TestSqlPlugin(object):
@@ -42,6 +46,7 @@ class TestSqlPlugin(object):
         self.ipython.register_magics = mock.MagicMock()
         self.ipython.Completer = mock.MagicMock()
         self.ip = plugin.SqlPlugin(shell=self.ipython)
+        self.ip.history = mock.MagicMock()
 
     def setup_run_sql(self, runsetup=False):
         if runsetup:
@@ -84,6 +89,57 @@ class TestSqlPlugin(object):
         for keypress in 'ynqa':
                 yield self.run_sql_check, keypress
 
+    def test_run_sql_script_start(self):
+        self.setup_run_sql()
+        with mock.patch('ipydb.plugin.open', self.mock_open, create=True):
+            self.ip.run_sql_script('something', start=1)
+            nt.assert_equal(1, self.ip.engine.execute.call_count)
+            self.ip.engine.execute.assert_called_with(self.s2)
+
+    def test_run_sql_script_errors(self):
+        self.setup_run_sql()
+        self.ip.engine.execute.side_effect = Exception('boom')
+        with mock.patch('ipydb.plugin.open', self.mock_open, create=True):
+            self.ip.run_sql_script('something')
+            nt.assert_equal(1, self.ip.engine.execute.call_count)
+        self.ip.engine.execute.reset_mock()
+        self.setup_run_sql()
+        with mock.patch('ipydb.plugin.open', self.mock_open, create=True):
+            self.ip.run_sql_script('something', continue_on_error=True)
+            nt.assert_equal(2, self.ip.engine.execute.call_count)
+
+    def test_run_sql_script_savepoints(self):
+        self.setup_run_sql()
+        self.ip.engine.execute.side_effect = [Exception('boom'), None]
+        savepoint = self.ip.engine.begin_nested.return_value
+        with mock.patch('ipydb.plugin.open', self.mock_open, create=True):
+            self.ip.run_sql_script('something', continue_on_error=True)
+        nt.assert_equal(2, self.ip.engine.execute.call_count)
+        nt.assert_equal(1, savepoint.rollback.call_count)
+        nt.assert_equal(1, savepoint.commit.call_count)
+
+    def test_run_sql_script_resume(self):
+        self.setup_run_sql()
+        self.ip.engine.execute.side_effect = [None, Exception('boom')]
+        with mock.patch('ipydb.plugin.open', self.mock_open, create=True), \
+                mock.patch('ipydb.plugin.print', create=True) as mprint:
+            self.ip.run_sql_script('something', commit_every=5,
+                                   error_log=os.devnull)
+        # statement 0 ran in the transaction, which isn't committed
+        printed = '\n'.join(str(c[0][0]) for c in mprint.call_args_list)
+        nt.assert_in("resume with: %runsql --commit-every 5 -e /dev/null "
+                     "--start 0 something", printed)
+
+    def test_explain_unsupported(self):
+        self.ip.engine = self.sa_engine
+        conn = self.sa_engine.connect.return_value.__enter__.return_value
+        conn.dialect.name = 'oracle'
+        self.ip.debug = True  # not re-raised
+        with mock.patch('ipydb.plugin.print', create=True) as mprint:
+            self.ip.explain('select 1 from dual')
+        nt.assert_equal("%explain doesn't support oracle, only mysql, "
+                        "postgresql, sqlite", str(mprint.call_args[0][0]))
+
     def test_rollback(self):
         self.ip.connected = False
         self.ip.rollback()
@@ -270,6 +326,58 @@ class TestSqlPlugin(object):
         expected = b'customer(company_id) references company(id)\n'
         nt.assert_equal(expected, output)
 
+    @mock.patch('ipydb.plugin.pager')
+    def test_render_stream(self, pager):
+        self.setup_mock_describe_db(pager)
+        nt.assert_equal([11, None], self.ip.declared_widths(
+            'select c.id, x from company c', ['ID', 'x']))
+        result = plugin.FakedResult([(1, 'a')], ['id', 'x'])
+        with mock.patch('ipydb.asciitable.SAMPLE_ROWS', 1):
+            self.ip.render_result(result, stream=True,
+                                  query='select * from company')
+        nt.assert_equal(
+            b'+-------------+---+\n'
+            b'| id          | x |\n'
+            b'+-------------+---+\n'
+            b'| 1           | a |\n'
+            b'+-------------+---+\n', self.pagerio.getvalue())
+
+    @mock.patch('ipydb.viewer.Viewer')
+    @mock.patch('ipydb.plugin.sys')
+    def test_view_result(self, msys, Viewer):
+        msys.stdout.isatty.return_value = True
+        result = plugin.FakedResult([(1, 'b'), (2, 'a')], ['id', 'x'])
+        self.ip.view_result(result, query='select 1')
+        source = Viewer.call_args[0][0]
+        nt.assert_equal(['id', 'x'], source.keys())
+        nt.assert_equal('select 1', Viewer.call_args[1]['title'])
+        nt.assert_true(Viewer.return_value.run.called)
+        msys.stdout.isatty.return_value = False
+        with mock.patch.object(self.ip, 'render_result') as render:
+            self.ip.view_result(result, query='select 1')
+        render.assert_called_with(result, query='select 1')
+        self.ip.close_result_buffer()
+
+    def test_render_file(self):
+        path = tempfile.mktemp(suffix='.tsv')
+        result = plugin.FakedResult([(1, None), (2, u'caf\xe9')],
+                                    ['id', 'name'])
+        try:
+            self.ip.render_result(result, filepath=path, null='\\N')
+            with io.open(path, encoding='utf-8', newline='') as f:
+                nt.assert_equal(u'id\tname\r\n1\t\\N\r\n2\tcaf\xe9\r\n',
+                                f.read())
+        finally:
+            os.remove(path)
+
+    @mock.patch('ipydb.plugin.pager')
+    def test_column_types(self, pager):
+        self.setup_mock_describe_db(pager)
+        result = plugin.FakedResult([], ['ID', 'name', 'other'])
+        nt.assert_equal(['integer', 'integer', None], self.ip.column_types(
+            result, 'select * from customer c'))
+        nt.assert_equal([None, None, None], self.ip.column_types(result))
+
     @mock.patch('ipydb.plugin.pager')
     def test_get_columns_glob(self, pager):
         self.setup_mock_describe_db(pager)
@@ -278,6 +386,52 @@ class TestSqlPlugin(object):
         myre = re.compile(r'customer\n\-+\s+name\s+INTEGER NOT NULL')
         nt.assert_regexp_matches(output.decode('utf8'), myre)
 
+    def test_result_cache(self):
+        self.ip.cache_results = True
+        result = self.ip.engine.execute.return_value
+        result.keys.return_value = ['a']
+        result.__iter__.side_effect = lambda: iter([(1,)])
+        nt.assert_equal([(1,)], list(self.ip.execute('select a from t')))
+        nt.assert_equal([(1,)], list(self.ip.execute('SELECT a\nFROM t;')))
+        nt.assert_equal(1, self.ip.engine.execute.call_count)
+        list(self.ip.execute('select a from t', refresh=True))
+        nt.assert_equal(2, self.ip.engine.execute.call_count)
+        list(self.ip.execute('select a from t', cache=False))
+        nt.assert_equal(3, self.ip.engine.execute.call_count)
+        nt.assert_equal(1, len(self.ip.result_cache.entries))
+        self.ip.execute('update t set a = 2')
+        nt.assert_equal(0, len(self.ip.result_cache.entries))
+        nt.assert_equal(1, self.ip.result_cache.hits)
+
+    def test_history(self):
+        registry.reset()
+        result = self.ip.engine.execute.return_value
+        result.returns_rows = True
+        result.keys.return_value = ['a']
+        result.__iter__.side_effect = lambda: iter([(1,), (2,)])
+        cursor = self.ip.execute('select a from t where a = 1')
+        nt.assert_equal(0, self.ip.history.record.call_count)
+        nt.assert_equal([(1,), (2,)], list(cursor))
+        entry = self.ip.history.record.call_args[0][0]
+        nt.assert_equal('select a from t where a = 1', entry.statement)
+        nt.assert_equal(2, entry.rows)
+        nt.assert_equal(1, registry.histogram('query_fetch_ms').count)
+        nt.assert_equal(2, registry.counter('rows_fetched').value)
+        nt.assert_is_none(entry.error)
+        result.returns_rows = False
+        result.rowcount = 3
+        self.ip.autocommit = True
+        self.ip.execute('update t set a = 2')
+        entry = self.ip.history.record.call_args[0][0]
+        nt.assert_equal(3, entry.rows)
+        self.ip.save_history = False
+        hook = mock.MagicMock()
+        self.ip.timing_hooks.append(hook)
+        self.ip.execute('update t set a = 3')
+        nt.assert_equal(2, self.ip.history.record.call_count)
+        hook.assert_called_with(self.ip.last_query)
+        nt.assert_equal('update t set a = 3', self.ip.last_query.statement)
+
     def teardown(self):
         self.pmeta.stop()
         self.pengine.stop()
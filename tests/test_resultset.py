@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import nose.tools as nt
+from nose.plugins.skip import SkipTest
+
+from ipydb import dataframe
+from ipydb.asciitable import FakedResult, PivotResultSet
+from ipydb.resultset import ResultSet, compact
+
+
+class Cursor(FakedResult):
+    """Counts how many rows have been read."""
+
+    def __init__(self, items, headings):
+        super(Cursor, self).__init__(items, headings)
+        self.read = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.read += 1
+            yield item
+
+
+class ResultSetTest(unittest.TestCase):
+
+    headings = ['id', 'name', 'price']
+
+    def setUp(self):
+        self.rows = [(i, u'name %i' % i, i * 1.5) for i in range(25)]
+        self.cursor = Cursor(self.rows, self.headings)
+
+    def result_set(self, **kw):
+        kw.setdefault('chunk_rows', 10)
+        return ResultSet(self.cursor, **kw)
+
+    def test_iterate_twice(self):
+        rs = self.result_set()
+        nt.assert_equal(self.rows, [tuple(row) for row in rs])
+        nt.assert_equal(self.rows, [tuple(row) for row in rs])
+        nt.assert_equal(25, self.cursor.read)
+        nt.assert_equal(25, len(rs))
+        nt.assert_equal(25, rs.rowcount)
+
+    def test_rows(self):
+        row = next(iter(self.result_set()))
+        nt.assert_equal(self.headings, row.keys())
+        nt.assert_equal(u'name 0', row.name)
+        nt.assert_equal(u'name 0', row[1])
+        with nt.assert_raises(AttributeError):
+            row.nothing
+
+    def test_lazy(self):
+        rs = self.result_set()
+        nt.assert_equal((3, u'name 3', 4.5), tuple(rs[3]))
+        nt.assert_equal(10, self.cursor.read)
+        nt.assert_equal(self.rows[8:12], [tuple(row) for row in rs[8:12]])
+        nt.assert_equal(20, self.cursor.read)
+        with nt.assert_raises(TypeError):
+            len(rs)
+        nt.assert_true(rs)
+        nt.assert_equal('<ResultSet 20+ rows x 3 columns>', repr(rs))
+
+    def test_slicing(self):
+        rs = self.result_set()
+        nt.assert_equal(self.rows[-1], tuple(rs[-1]))
+        nt.assert_equal(self.rows[20:], [tuple(row) for row in rs[20:]])
+        nt.assert_equal(self.rows[::7], [tuple(row) for row in rs[::7]])
+        nt.assert_equal([], rs[30:40])
+        with nt.assert_raises(IndexError):
+            rs[25]
+
+    def test_fetch(self):
+        rs = self.result_set()
+        nt.assert_equal(self.rows[0], tuple(rs.fetchone()))
+        nt.assert_equal(self.rows[1:3], [tuple(r) for r in rs.fetchmany(2)])
+        nt.assert_equal(22, len(rs.fetchall()))
+        nt.assert_is_none(rs.fetchone())
+
+    def test_compact(self):
+        nt.assert_equal('q', compact([1, 2]).typecode)
+        nt.assert_equal('d', compact([1.5, 2.0]).typecode)
+        nt.assert_equal((1, None), compact([1, None]))
+        nt.assert_equal((2 ** 70,), compact([2 ** 70]))
+
+    def test_spill(self):
+        rs = self.result_set(max_bytes=1)
+        nt.assert_equal(self.rows, [tuple(row) for row in rs])
+        nt.assert_equal(25, rs.spilled)
+        nt.assert_equal(self.rows[5], tuple(rs[5]))
+        nt.assert_equal(self.rows[19:21], [tuple(row) for row in rs[19:21]])
+        spill = rs.spill
+        rs.close()
+        nt.assert_true(spill.closed)
+
+    def test_render(self):
+        render = mock.Mock()
+        rs = self.result_set(render=render, query='select 1')
+        rs.render(sqlformat='csv')
+        render.assert_called_with(rs, query='select 1', sqlformat='csv')
+        rs.pivot()
+        pivot = render.call_args[0][0]
+        nt.assert_true(isinstance(pivot, PivotResultSet))
+        nt.assert_equal(('id', 0), list(pivot)[0][0])
+
+    def test_to_csv(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'out.csv')
+            rs = self.result_set()
+            rs.to_csv(path)
+            rs.to_csv(path + '2', null='NULL')
+            with io.open(path, newline='') as f:
+                lines = f.read().splitlines()
+        finally:
+            shutil.rmtree(tmpdir)
+        nt.assert_equal(26, len(lines))
+        nt.assert_equal(u'1,name 1,1.5', lines[2])
+        nt.assert_equal(25, self.cursor.read)
+
+    def test_to_dataframe(self):
+        if not dataframe._has_pandas:
+            raise SkipTest('pandas is not installed')
+        rs = self.result_set(types=['integer', 'string', 'float'])
+        rs[0]
+        frame = rs.to_dataframe()
+        nt.assert_equal(self.headings, list(frame.columns))
+        nt.assert_equal(25, len(frame))
+        nt.assert_equal('int64', str(frame['id'].dtype))
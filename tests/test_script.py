@@ -0,0 +1,121 @@
+from io import StringIO
+import unittest
+
+import nose.tools as nt
+import sqlalchemy as sa
+
+from ipydb import script
+
+
+class ScriptTest(unittest.TestCase):
+
+    def statements(self, text, delimiter=';'):
+        return list(script.iter_statements(StringIO(text), delimiter))
+
+    def test_slash_delimiter(self):
+        text = u"select 1\nfrom foo\n/\n\n/\nselect 2\n"
+        nt.assert_equal([u'select 1\nfrom foo\n', u'select 2\n'],
+                        self.statements(text, '/'))
+
+    def test_semicolons(self):
+        text = (u"insert into t values (1, 'a;b');\n"
+                u"insert into t values (2, 'it''s;\nstill; going');"
+                u" select 3;\n"
+                u"-- comment;\n"
+                u"select 4 /* ; */\n")
+        nt.assert_equal([
+            u"insert into t values (1, 'a;b')",
+            u"insert into t values (2, 'it''s;\nstill; going')",
+            u" select 3",
+            u"-- comment;\nselect 4 /* ; */\n\n",
+        ], self.statements(text))
+
+    def test_begin_end_blocks(self):
+        text = (u"create trigger tr after insert on t begin\n"
+                u"  update t set x = 1;\n"
+                u"  update t set y = 1;\n"
+                u"end;\n"
+                u"select 1;\n")
+        statements = self.statements(text)
+        nt.assert_equal(2, len(statements))
+        nt.assert_true(statements[0].startswith(u'create trigger'))
+        nt.assert_true(statements[0].endswith(u'end'))
+        nt.assert_equal(u'select 1', statements[1])
+
+    def test_unclosed_quote_is_returned(self):
+        nt.assert_equal([u"select 'oops\n"],
+                        self.statements(u"select 'oops\n"))
+
+    def test_scanner_keeps_state_between_lines(self):
+        scanner = script.StatementScanner()
+        nt.assert_equal([], scanner.feed(u"select 'a;\n"))
+        nt.assert_equal([u"select 'a;\nb'"], scanner.feed(u"b'; select\n"))
+        nt.assert_equal([u' select\n2'],
+                        scanner.feed(u"2; create trigger t begin\n"))
+        for _ in range(3):
+            nt.assert_equal([], scanner.feed(u"  update t set x = 1;\n"))
+        statements = scanner.feed(u"end; select 3;\n")
+        nt.assert_equal(2, len(statements))
+        nt.assert_true(statements[0].endswith(u'end'))
+        nt.assert_equal(u'select 3', statements[1])
+        nt.assert_equal([u'select 4'], scanner.feed(u'select 4;\n'))
+        nt.assert_equal([], scanner.finish())
+
+    def test_comments_only(self):
+        nt.assert_equal([], self.statements(u"-- nothing to see;\n"))
+
+    def test_progress(self):
+        progress = script.Progress(report_interval=0)
+        progress.update(u'select 1')
+        progress.update(u'select é')
+        nt.assert_equal(2, progress.statements)
+        nt.assert_equal(17, progress.bytes)
+        nt.assert_in(u'2 statements (17.0 bytes)', progress.summary())
+
+    def test_barriers(self):
+        text = (u"create table a (x int);\n"
+                u"-- @barrier\n"
+                u"insert into a values (1);\n"
+                u"insert into a values (2);\n")
+        statements = list(script.iter_statements(
+            StringIO(text), ';', barriers=True))
+        nt.assert_equal([u"create table a (x int)", script.BARRIER,
+                         u"insert into a values (1)",
+                         u"insert into a values (2)"], statements)
+        # without barriers=True the marker is just a comment
+        nt.assert_equal(3, len(self.statements(text)))
+
+
+class ParallelRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine(
+            'sqlite://', poolclass=sa.pool.StaticPool,
+            connect_args={'check_same_thread': False})
+        self.out = StringIO()
+
+    def test_run(self):
+        text = (u"create table a (x int);\n"
+                u"-- @barrier\n"
+                u"insert into a values (1);\n"
+                u"insert into a values (2);\n"
+                u"insert into nonexistent values (3);\n")
+        error_log = StringIO()
+        runner = script.ParallelRunner(self.engine, 2, continue_on_error=True,
+                                       error_log=error_log, out=self.out)
+        runner.run(script.iter_statements(StringIO(text), ';', barriers=True))
+        nt.assert_equal([3], runner.failed)
+        nt.assert_equal(set(['create', 'insert']), runner.commands)
+        nt.assert_equal(2, self.engine.execute(
+            'select count(*) from a').scalar())
+        nt.assert_in(u'-- statement 3:', error_log.getvalue())
+        summary = runner.summary()
+        nt.assert_in(u'3 statements', summary)
+        nt.assert_in(u'Slowest statements:', summary)
+
+    def test_start(self):
+        text = u"select 1;\nselect 2;\nselect 3;\n"
+        runner = script.ParallelRunner(self.engine, 2, out=self.out)
+        runner.run(script.iter_statements(StringIO(text), ';'), start=2)
+        nt.assert_equal(1, runner.progress.statements)
+        nt.assert_in(u'#2', self.out.getvalue())
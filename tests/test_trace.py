@@ -0,0 +1,66 @@
+import unittest
+
+import nose.tools as nt
+import sqlalchemy as sa
+
+from ipydb import trace
+
+
+class StatementTracerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        self.tracer = trace.StatementTracer(maxlen=3)
+        self.tracer.start()
+
+    def tearDown(self):
+        self.tracer.stop()
+
+    def test_trace(self):
+        self.engine.execute('create table t (a integer)')
+        self.engine.execute('insert into t values (1)')
+        with trace.subsystem('reflection'):
+            self.engine.execute('select * from t')
+        traced = self.tracer.statements()
+        nt.assert_equal(['query', 'query', 'reflection'],
+                        [t.subsystem for t in traced])
+        nt.assert_equal('insert into t values (1)', traced[1].statement)
+        nt.assert_equal(1, traced[1].rowcount)
+        nt.assert_equal('sqlite://', traced[1].database)
+        nt.assert_true(traced[2].ms >= 0)
+        nt.assert_equal([('query', 2, traced[0].ms + traced[1].ms),
+                         ('reflection', 1, traced[2].ms)],
+                        self.tracer.summary())
+
+    def test_ring_buffer(self):
+        for i in range(5):
+            self.engine.execute('select %i' % i)
+        nt.assert_equal(['select 2', 'select 3', 'select 4'],
+                        [t.statement for t in self.tracer.statements()])
+        self.tracer.resize(2)
+        nt.assert_equal(2, len(self.tracer.statements()))
+        self.tracer.clear()
+        nt.assert_equal([], self.tracer.statements())
+
+    def test_error(self):
+        with nt.assert_raises(sa.exc.OperationalError):
+            self.engine.execute('select * from nosuch')
+        traced = self.tracer.statements()[0]
+        nt.assert_in('no such table', traced.error)
+
+    def test_failed_connect(self):
+        engine = sa.create_engine('sqlite:////no/such/dir/x.sqlite')
+        with nt.assert_raises(sa.exc.OperationalError):
+            engine.execute('select 1')
+        nt.assert_equal([], self.tracer.statements())
+
+    def test_label_engine(self):
+        other = sa.create_engine('sqlite://')
+        trace.label_engine(other, 'metadata')
+        other.execute('select 1')
+        nt.assert_equal('metadata', self.tracer.statements()[0].subsystem)
+
+    def test_stop(self):
+        self.tracer.stop()
+        self.engine.execute('select 1')
+        nt.assert_equal([], self.tracer.statements())
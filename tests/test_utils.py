@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import io
+import unittest
+
+import nose.tools as nt
+
+from ipydb import utils
+from ipydb.utils import CsvWriter
+
+
+class CsvWriterTest(unittest.TestCase):
+
+    rows = [(1, u'caf\xe9', None), (2, u'a, "b"', 1.5)]
+
+    def test_text(self):
+        out = io.StringIO()
+        writer = CsvWriter(out)
+        writer.writerow(['id', 'name', 'x'])
+        writer.writerows(self.rows)
+        nt.assert_equal(u'id,name,x\r\n1,caf\xe9,\r\n2,"a, ""b""",1.5\r\n',
+                        out.getvalue())
+
+    def test_binary(self):
+        out = io.BytesIO()
+        writer = CsvWriter(out, delimiter='\t', null='NULL')
+        writer.writerows(self.rows)
+        nt.assert_equal(u'1\tcaf\xe9\tNULL\r\n2\t"a, ""b"""\t1.5\r\n'
+                        .encode('utf-8'), out.getvalue())
+
+    def test_batches(self):
+        out = io.BytesIO()
+        utils.CSV_BATCH_ROWS, batch = 2, utils.CSV_BATCH_ROWS
+        try:
+            CsvWriter(out).writerows([(i,) for i in range(5)])
+        finally:
+            utils.CSV_BATCH_ROWS = batch
+        nt.assert_equal(b'0\r\n1\r\n2\r\n3\r\n4\r\n', out.getvalue())
+
+    def test_quoting(self):
+        out = io.StringIO()
+        CsvWriter(out, quoting='all').writerows(self.rows[:1])
+        nt.assert_equal(u'"1","caf\xe9",""\r\n', out.getvalue())
+        out = io.StringIO()
+        CsvWriter(out, quoting='none').writerows([(u'a,b',)])
+        nt.assert_equal(u'a\\,b\r\n', out.getvalue())
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import nose.tools as nt
+from nose.plugins.skip import SkipTest
+
+from ipydb import viewer
+from ipydb.asciitable import FakedResult
+from ipydb.buffer import BufferingResult, ResultBuffer
+from ipydb.resultset import ResultSet
+
+
+class Cursor(FakedResult):
+    """Counts how many rows have been read."""
+
+    def __init__(self, items, headings):
+        super(Cursor, self).__init__(items, headings)
+        self.read = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.read += 1
+            yield item
+
+
+class ViewerTest(unittest.TestCase):
+
+    headings = ['id', 'name']
+
+    def setUp(self):
+        if not viewer._has_prompt_toolkit:
+            raise SkipTest('prompt_toolkit is not installed')
+        self.rows = [(i, u'name %i' % i) for i in range(1000)]
+        self.cursor = Cursor(self.rows, self.headings)
+        self.source = viewer.ResultSetRows(ResultSet(self.cursor,
+                                                     chunk_rows=100))
+
+    def run_viewer(self, keys):
+        from prompt_toolkit.input import create_pipe_input
+        from prompt_toolkit.output import DummyOutput
+        with create_pipe_input() as pipe:
+            pipe.send_text(keys)
+            view = viewer.Viewer(self.source, input=pipe,
+                                 output=DummyOutput())
+            view.run()
+        return view
+
+    def test_lazy(self):
+        view = self.run_viewer('jjq')
+        nt.assert_equal(2, view.top)
+        nt.assert_equal(1, view.cache.fetched)
+        nt.assert_equal(200, self.cursor.read)  # the first block
+        lines = view.body_text().splitlines()
+        nt.assert_equal(view.screen_size()[0], len(lines))
+        nt.assert_equal(u'| 2   | name 2   |', lines[0])
+        nt.assert_equal(
+            u'+-----+----------+\n| id  | name     |\n+-----+----------+',
+            view.header_text()[0][1])
+        nt.assert_true(view.status_text().startswith('rows 3-38 of 200+'))
+
+    def test_end(self):
+        view = self.run_viewer('G q')
+        nt.assert_equal(1000 - view.screen_size()[0], view.top)
+        # space read past the end, to find that the result ends there
+        nt.assert_equal([0, 4, 5], sorted(view.cache.blocks))
+        nt.assert_true(view.status_text().startswith('rows 965-1000 of '
+                                                     '1000 |'))
+        view.scroll(-1000)
+        nt.assert_equal(0, view.top)
+
+    def test_window_cache(self):
+        cache = viewer.WindowCache(self.source, max_fieldsize=6,
+                                   block_rows=10, max_blocks=2)
+        nt.assert_equal([[u'15', u'n[...]'], [u'16', u'n[...]']],
+                        cache.rows(15, 17))
+        cache.rows(0, 25)
+        nt.assert_equal([1, 2], list(cache.blocks))
+        nt.assert_equal(3, cache.fetched)
+        nt.assert_equal([2, 6], cache.widths)
+        nt.assert_equal([], cache.rows(2000, 2010))
+
+    def test_scroll_right(self):
+        self.rows[0] = (0, u'x' * 90)
+        view = self.run_viewer('lq')
+        nt.assert_equal(8, view.left)
+        nt.assert_equal(u'x' * 80, view.body_text().splitlines()[0])
+        view.scroll_right(1000)  # as far as the right edge of the table
+        nt.assert_equal(20, view.left)
+        nt.assert_equal(u'x' * 78 + u' |', view.body_text().splitlines()[0])
+
+    def test_buffer_rows(self):
+        buf = ResultBuffer(self.headings)
+        try:
+            list(BufferingResult(self.cursor, buf))
+            buf.sort('id', descending=True)
+            self.source = viewer.BufferRows(buf)
+            view = self.run_viewer('jq')
+            nt.assert_equal(u'| 998 | name 998 |',
+                            view.body_text().splitlines()[0])
+            nt.assert_true(view.status_text().startswith('rows 2-37 of '
+                                                         '1000 |'))
+        finally:
+            buf.close()